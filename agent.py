@@ -10,7 +10,10 @@ from toolkit.tools import (set_appointment,
                          reschedule_appointment,
                          cancel_appointment,
                          check_availability_by_specialization,
-                         check_availability_by_doctor
+                         check_availability_by_doctor,
+                         find_earliest_available_slots,
+                         find_doctors_free_at,
+                         get_patient_appointments
                          )
 from utils.helper import (
                         create_entry_node,
@@ -21,54 +24,76 @@ from utils.helper import (
                         route_primary_assistant
                         
 )
+from utils.intent_router import (
+                        create_info_shortcut_entry_node,
+                        fast_router,
+                        fast_router_enabled,
+                        handoff_shortcut_mode,
+                        route_fast_router,
+                        route_info_shortcut,
+                        route_to_workflow_with_fast_path
+)
 from utils.llm_manager import LLMModel
-from langgraph.checkpoint.memory import InMemorySaver
+from utils.checkpointer import get_checkpointer
 
 load_dotenv()
 
-memory = InMemorySaver()
-
-llm = LLMModel().get_model()
+info_tools = [check_availability_by_specialization,check_availability_by_doctor,find_earliest_available_slots,find_doctors_free_at]
+booking_tools = [get_patient_appointments,set_appointment,reschedule_appointment,cancel_appointment]
+primary_tools = [ToAppointmentBookingAssistant,ToGetInfo,ToPrimaryBookingAssistant,CompleteOrEscalate]
 
 
-info_tools = [check_availability_by_specialization,check_availability_by_doctor]
-info_runnable = get_runnable(
-                llm=llm,
-                tools= info_tools + [CompleteOrEscalate],
-                agent_prompt=info_agent_prompt
-)
-
-booking_tools = [set_appointment,reschedule_appointment,cancel_appointment]
-booking_runnable = get_runnable(
-                llm=llm,
-                tools= booking_tools + [CompleteOrEscalate],
-                agent_prompt=booking_agent_prompt
-)
+def build_runnables(llm):
+    """Bind the three assistants' prompts and tools to a chat model"""
+    info_runnable = get_runnable(
+                    llm=llm,
+                    tools= info_tools + [CompleteOrEscalate],
+                    agent_prompt=info_agent_prompt
+    )
+    booking_runnable = get_runnable(
+                    llm=llm,
+                    tools= booking_tools + [CompleteOrEscalate],
+                    agent_prompt=booking_agent_prompt
+    )
+    primary_runnable = get_runnable(
+                                    llm=llm,
+                                    tools= primary_tools,
+                                    agent_prompt=primary_agent_prompt
+    )
+    return primary_runnable, info_runnable, booking_runnable
 
-primary_tools = [ToAppointmentBookingAssistant,ToGetInfo,ToPrimaryBookingAssistant,CompleteOrEscalate]
-primary_runnable = get_runnable(
-                                llm=llm,
-                                tools= primary_tools,
-                                agent_prompt=primary_agent_prompt
-)
 
+def build_graph(llm=None, checkpointer=None):
+    """
+    Build the assistant graph. By default it uses the configured Gemini model
+    and checkpointer; benchmarks pass a scripted model and their own checkpointer.
+    """
+    if llm is None:
+        llm = LLMModel().get_model()
+    if checkpointer is None:
+        checkpointer = get_checkpointer()
+    primary, info, booking = build_runnables(llm)
 
-def build_graph():
     builder = StateGraph(State)
 
-    builder.add_node("primary_assistant", Assistant(primary_runnable))
+    builder.add_node("primary_assistant", Assistant(primary))
 
-    builder.add_node(
-        "enter_get_info",
-        create_entry_node("Get Information Assistant", "get_info"),
-    )
+    shortcut_mode = handoff_shortcut_mode()
+    if shortcut_mode != "off":
+        # Fully specified availability handoffs run the tool without the info assistant's first LLM call
+        builder.add_node("enter_get_info", create_info_shortcut_entry_node(shortcut_mode))
+    else:
+        builder.add_node(
+            "enter_get_info",
+            create_entry_node("Get Information Assistant", "get_info"),
+        )
     builder.add_node(
         "enter_appointment_info",
         create_entry_node("Appointment Assistant", "appointment_info"),
     )
     
-    builder.add_node("get_info", Assistant(info_runnable))
-    builder.add_node("appointment_info", Assistant(booking_runnable))
+    builder.add_node("get_info", Assistant(info))
+    builder.add_node("appointment_info", Assistant(booking))
 
     builder.add_node(
         "update_info_tools",
@@ -82,7 +107,17 @@ def build_graph():
     
     builder.add_node("leave_skill", pop_dialog_state)
     
-    builder.add_conditional_edges(START,route_to_workflow)
+    if fast_router_enabled():
+        # Plain availability questions skip the primary assistant's LLM call
+        builder.add_node("fast_router", fast_router)
+        builder.add_conditional_edges(START,route_to_workflow_with_fast_path)
+        builder.add_conditional_edges(
+            "fast_router",
+            route_fast_router,
+            ["enter_get_info", "primary_assistant"],
+        )
+    else:
+        builder.add_conditional_edges(START,route_to_workflow)
 
     builder.add_conditional_edges(
         "primary_assistant",
@@ -94,7 +129,10 @@ def build_graph():
         ],
     )
 
-    builder.add_edge("enter_get_info","get_info")
+    if shortcut_mode != "off":
+        builder.add_conditional_edges("enter_get_info", route_info_shortcut, ["get_info", END])
+    else:
+        builder.add_edge("enter_get_info","get_info")
     
     builder.add_edge("update_info_tools", "get_info")
     builder.add_conditional_edges(
@@ -118,7 +156,7 @@ def build_graph():
 
 
     graph = builder.compile(
-        checkpointer=memory,
+        checkpointer=checkpointer,
         # # Let the user approve or deny the use of sensitive tools
         # interrupt_before=[
         #     "update_appointment_tools"
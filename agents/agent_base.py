@@ -1,8 +1,17 @@
+import logging
+import os
+from langchain_core.messages import AIMessage
 from langchain_core.runnables import Runnable, RunnableConfig
 from typing import Annotated, Literal, Optional
 from typing_extensions import TypedDict
 from langgraph.graph.message import AnyMessage, add_messages
 from langchain_core.prompts.chat import ChatPromptTemplate
+from utils.compaction import compact_messages
+from utils.llm_cache import cache_probe
+from utils.llm_governor import LLMUnavailableError, get_llm_governor
+from utils.metrics import ASSISTANT_FALLBACKS, ASSISTANT_RETRIES
+
+FALLBACK_ANSWER = "I'm sorry, I can't process your request right now. Please try again in a moment."
 
 def update_dialog_stack(left: list[str], right: Optional[str]) -> list[str]:
     """Push or pop the state."""
@@ -26,24 +35,79 @@ class State(TypedDict):
         update_dialog_stack,
     ]
 
-class Assistant:
-    def __init__(self, runnable: Runnable):
+class Assistant(Runnable):
+    """
+    Graph node that calls an agent runnable until it returns a usable answer.
+
+    Being a Runnable, the graph uses `invoke` for sync runs and `ainvoke` for
+    async runs, so the async path never blocks the event loop on the LLM call.
+    An empty answer is retried at most `max_empty_retries` times; after that,
+    or when the LLM governor gives up, the user gets a short fallback answer.
+    """
+
+    def __init__(self, runnable: Runnable, max_empty_retries: Optional[int] = None):
         self.runnable = runnable
+        if max_empty_retries is None:
+            max_empty_retries = int(os.getenv("ASSISTANT_MAX_EMPTY_RETRIES", 2))
+        self.max_empty_retries = max_empty_retries
 
-    def __call__(self, state: State, config: RunnableConfig):
-        while True:
-            result = self.runnable.invoke(state)
+    @staticmethod
+    def _is_empty(result) -> bool:
+        return not result.tool_calls and (
+            not result.content
+            or isinstance(result.content, list)
+            and not result.content[0].get("text")
+        )
+
+    @staticmethod
+    def _compact(state: State) -> State:
+        # Only the prompt is compacted; the checkpointed history keeps every message
+        return {**state, "messages": compact_messages(state["messages"])}
+
+    @staticmethod
+    def _ask_for_real_output(state: State, config: Optional[RunnableConfig]) -> State:
+        node = ((config or {}).get("metadata") or {}).get("langgraph_node", "assistant")
+        ASSISTANT_RETRIES.labels(node=node).inc()
+        messages = state["messages"] + [("user", "Respond with a real output.")]
+        return {**state, "messages": messages}
 
-            if not result.tool_calls and (
-                not result.content
-                or isinstance(result.content, list)
-                and not result.content[0].get("text")
-            ):
-                messages = state["messages"] + [("user", "Respond with a real output.")]
-                state = {**state, "messages": messages}
-            else:
-                break
-        return {"messages": result}
+    @staticmethod
+    def _fallback(config: Optional[RunnableConfig], reason: str) -> dict:
+        node = ((config or {}).get("metadata") or {}).get("langgraph_node", "assistant")
+        ASSISTANT_FALLBACKS.labels(node=node, reason=reason).inc()
+        logging.warning(f"{node} answered with the fallback message ({reason})")
+        return {"messages": AIMessage(content=FALLBACK_ANSWER)}
+
+    def invoke(self, state: State, config: Optional[RunnableConfig] = None, **kwargs):
+        state = self._compact(state)
+        for attempt in range(self.max_empty_retries + 1):
+            try:
+                result = self.runnable.invoke(state, config)
+            except LLMUnavailableError as e:
+                return self._fallback(config, e.reason)
+
+            if not self._is_empty(result):
+                return {"messages": result}
+            if attempt < self.max_empty_retries:
+                state = self._ask_for_real_output(state, config)
+        return self._fallback(config, "empty_response")
+
+    async def ainvoke(self, state: State, config: Optional[RunnableConfig] = None, **kwargs):
+        state = self._compact(state)
+        for attempt in range(self.max_empty_retries + 1):
+            try:
+                result = await self.runnable.ainvoke(state, config)
+            except LLMUnavailableError as e:
+                return self._fallback(config, e.reason)
+
+            if not self._is_empty(result):
+                return {"messages": result}
+            if attempt < self.max_empty_retries:
+                state = self._ask_for_real_output(state, config)
+        return self._fallback(config, "empty_response")
+
+    def __call__(self, state: State, config: RunnableConfig):
+        return self.invoke(state, config)
 
 
 
@@ -58,8 +122,13 @@ def get_runnable(llm,tools,agent_prompt):
         ]
     )
 
-    agent_runnable = prompt_template | llm.bind_tools(tools)
-    return agent_runnable
+    model = llm.bind_tools(tools)
+    agent_runnable = prompt_template | model
+    # Every model call shares the process-wide concurrency, rate and retry budget;
+    # responses replayed from the LLM cache never reach the provider, so they skip it
+    provider = getattr(llm, "_llm_type", type(llm).__name__)
+    probe = cache_probe(prompt_template, llm, getattr(model, "kwargs", {}))
+    return get_llm_governor().wrap(agent_runnable, provider=provider, cache_probe=probe)
 
 
     
\ No newline at end of file
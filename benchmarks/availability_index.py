@@ -0,0 +1,248 @@
+"""
+Equivalence check and micro-benchmark of the in-memory availability index.
+
+Generates a synthetic roster with `database/generate_db.py`, then runs random
+queries both through the index and the SQL they replace (earliest free slots,
+doctors free at one time, a doctor's next free slot and one day's schedules),
+booking and cancelling random slots in between the way the booking engine does.
+Finally slots are deleted and inserted inside the indexed dates and more dates
+are generated, all outside the app, which must be picked up on the next query.
+Fails if any answer differs:
+
+    python -m benchmarks.availability_index --doctors 1000 --days 90 --queries 500
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from database.generate_db import SPECIALIZATIONS, generate
+from toolkit.availability_index import get_availability_index, mark_slot
+from toolkit.tools import day_schedules, earliest_slots, free_at_slots
+
+QUERIES = ("earliest", "free_at", "next_free", "day")
+
+START = date(2025, 8, 4)
+
+
+def build_database(path, args, start, days):
+    generator_args = argparse.Namespace(
+        doctors=args.doctors, specializations=len(SPECIALIZATIONS), start=start, days=days, weekends=False,
+        day_start="09:00", day_end="17:00", slot_minutes=args.slot_minutes, booking_density=args.booking_density,
+        seed=args.seed, batch_rows=500_000, demo_roster=True,
+    )
+    conn = sqlite3.connect(path)
+    try:
+        generate(conn, generator_args)
+    finally:
+        conn.close()
+
+
+def random_search(rng, doctors, times, first_day, last_day):
+    """Keyword arguments of a search like the ones the info agent makes"""
+    start = first_day + timedelta(days=rng.randrange((last_day - first_day).days + 1))
+    # Windows may run past the last generated date, as the tool's 30-day default often does
+    end = start + timedelta(days=rng.choice([0, 1, 7, 30, 60]))
+    earliest, latest = sorted(rng.sample(times, 2)) if rng.random() < 0.3 else ("00:00", "23:59")
+    target = {"doctor_name": rng.choice(doctors)} if rng.random() < 0.5 else {"specialization": rng.choice(SPECIALIZATIONS)}
+    return dict(start_iso=start.isoformat(), end_iso=end.isoformat(), earliest=earliest, latest=latest,
+                limit=rng.choice([1, 5, 20]), **target)
+
+
+def check(name, from_index, from_sql, description, timings):
+    """Time one query both ways; returns True if the answers match"""
+    started = time.perf_counter()
+    index_answer = from_index()
+    timings[name]["index"].append(time.perf_counter() - started)
+    started = time.perf_counter()
+    sql_answer = from_sql()
+    timings[name]["sql"].append(time.perf_counter() - started)
+    if index_answer != sql_answer:
+        print(f"MISMATCH for {name} {description}:\n  index {index_answer}\n  sql   {sql_answer}")
+        return False
+    return True
+
+
+def compare(conn, rng, search, times, timings):
+    """Run one query of each kind both ways; returns the number of mismatches"""
+    index = get_availability_index(conn)
+    doctor, specialization = search.get("doctor_name"), search.get("specialization")
+    start_iso, end_iso = search["start_iso"], search["end_iso"]
+    mismatches = not check(
+        "earliest",
+        lambda: index.earliest_free(start_iso, end_iso, doctor, specialization, search["earliest"], search["latest"], search["limit"]),
+        lambda: [(row["date"], row["time_slot"], row["doctor_name"]) for row in earliest_slots(
+            conn, start_iso, end_iso, doctor, specialization, search["earliest"], search["latest"], search["limit"])],
+        search, timings,
+    )
+
+    time_slot = rng.choice(times)
+    weekdays = sorted(rng.sample(range(7), 3)) if rng.random() < 0.5 else None
+    mismatches += not check(
+        "free_at",
+        lambda: index.doctors_free_at(time_slot, start_iso, end_iso, specialization, weekdays),
+        lambda: free_at_slots(conn, time_slot, start_iso, end_iso, specialization, weekdays),
+        (time_slot, start_iso, end_iso, specialization, weekdays), timings,
+    )
+
+    if doctor:
+        def next_free_from_sql():
+            found = earliest_slots(conn, start_iso, "9999-12-31", doctor_name=doctor, limit=1)
+            return (found[0]["date"], found[0]["time_slot"]) if found else None
+
+        mismatches += not check("next_free", lambda: index.first_free_after(doctor, start_iso), next_free_from_sql,
+                                (doctor, start_iso), timings)
+
+    mismatches += not check(
+        "day",
+        lambda: index.day_schedules(start_iso, doctor, specialization),
+        lambda: day_schedules(conn, start_iso, doctor, specialization),
+        (start_iso, doctor, specialization), timings,
+    )
+    return mismatches
+
+
+def toggle_random_slot(conn, rng, doctors, first_day, days):
+    """Book or cancel one slot and apply it to the index, as the booking engine does after a commit"""
+    doctor = rng.choice(doctors)
+    day = (first_day + timedelta(days=rng.randrange(days))).isoformat()
+    row = conn.execute(
+        """SELECT s.time_slot, s.is_available FROM slots s JOIN doctors d ON d.id = s.doctor_id
+        WHERE d.name = ? AND s.date = ? ORDER BY random() LIMIT 1""", [doctor, day]
+    ).fetchone()
+    if row is None:
+        return
+    available = 0 if row["is_available"] else 1
+    with conn:
+        conn.execute(
+            """UPDATE slots SET is_available = ?, patient_id = ? WHERE date = ? AND time_slot = ?
+            AND doctor_id = (SELECT id FROM doctors WHERE name = ?)""",
+            [available, None if available else 1234567, day, row["time_slot"], doctor],
+        )
+    mark_slot(doctor, day, row["time_slot"], available=bool(available))
+
+
+def delete_slot_outside_app(conn, rng, doctors, first_day, days):
+    """Delete one slot inside the indexed dates, as a manual edit of the database would"""
+    doctor = rng.choice(doctors)
+    day = (first_day + timedelta(days=rng.randrange(days))).isoformat()
+    with conn:
+        conn.execute(
+            """DELETE FROM slots WHERE doctor_id = (SELECT id FROM doctors WHERE name = ?) AND date = ?
+            AND time_slot = (SELECT max(time_slot) FROM slots)""", [doctor, day]
+        )
+    return day
+
+
+def insert_slot_outside_app(conn, rng, doctors, first_day, days):
+    """Add a free slot at a new time inside the indexed dates"""
+    doctor = rng.choice(doctors)
+    day = (first_day + timedelta(days=rng.randrange(days))).isoformat()
+    with conn:
+        conn.execute(
+            """INSERT OR IGNORE INTO slots (doctor_id, date, time_slot, is_available)
+            SELECT id, ?, '07:00', 1 FROM doctors WHERE name = ?""", [day, doctor]
+        )
+    return day
+
+
+def percentiles_us(samples):
+    ordered = sorted(samples)
+    return {
+        "p50": statistics.median(ordered) * 1e6,
+        "p95": ordered[int(0.95 * (len(ordered) - 1))] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the availability index against SQL and time both.")
+    parser.add_argument("--doctors", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--slot-minutes", type=int, default=30)
+    parser.add_argument("--booking-density", type=float, default=0.7)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Compare the index with the database on every query instead of every few seconds
+    os.environ["AVAILABILITY_INDEX_CHECK_SECONDS"] = "0"
+    rng = random.Random(args.seed)
+    timings = {name: {"index": [], "sql": []} for name in QUERIES}
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "index_check.db")
+        build_database(path, args, START, args.days)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            doctors = [row[0] for row in conn.execute("SELECT name FROM doctors")]
+            times = [row[0] for row in conn.execute("SELECT DISTINCT time_slot FROM slots")]
+            started = time.perf_counter()
+            index = get_availability_index(conn)
+            load_seconds = time.perf_counter() - started
+            last_day = START + timedelta(days=args.days - 1)
+
+            for _ in range(args.queries):
+                toggle_random_slot(conn, rng, doctors, START, args.days)
+                mismatches += compare(conn, rng, random_search(rng, doctors, times, START, last_day), times, timings)
+
+            # Slots removed or added inside the indexed dates must show up in the next query
+            rebuilt_after_edit = True
+            for edit in (delete_slot_outside_app, insert_slot_outside_app):
+                day = edit(conn, rng, doctors, START, args.days)
+                search = {**random_search(rng, doctors, times, START, last_day), "start_iso": day}
+                mismatches += compare(conn, rng, search, times, timings)
+                rebuilt_after_edit &= get_availability_index(conn) is not index
+                index = get_availability_index(conn)
+
+            # So must dates generated after the index was loaded
+            conn.close()
+            build_database(path, args, last_day + timedelta(days=1), 14)
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            for _ in range(20):
+                mismatches += compare(conn, rng, random_search(rng, doctors, times, last_day, last_day + timedelta(days=14)), times, timings)
+            rebuilt_after_new_dates = get_availability_index(conn) is not index
+        finally:
+            conn.close()
+
+    summary = {
+        "doctors": args.doctors,
+        "days": args.days,
+        "queries": {name: len(timings[name]["index"]) for name in QUERIES},
+        "mismatches": mismatches,
+        "rebuilt_after_edit": rebuilt_after_edit,
+        "rebuilt_after_new_dates": rebuilt_after_new_dates,
+        "load_seconds": load_seconds,
+        "memory_bytes": get_availability_index().memory_bytes(),
+        "timings_us": {
+            name: {source: percentiles_us(samples) for source, samples in timings[name].items()} for name in QUERIES
+        },
+    }
+    print(f"{args.doctors} doctors x {args.days} days: index loaded in {load_seconds:.2f}s, "
+          f"{summary['memory_bytes'] / 2**20:.1f} MiB")
+    for name in QUERIES:
+        for source in ("index", "sql"):
+            p = summary["timings_us"][name][source]
+            print(f"  {name:<10} {source:<6} p50={p['p50']:>10.1f}  p95={p['p95']:>10.1f} us")
+    print(f"{sum(summary['queries'].values())} queries, {mismatches} mismatches; index rebuilt after an edit: "
+          f"{rebuilt_after_edit}, after new dates: {rebuilt_after_new_dates}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(1 if mismatches or not (rebuilt_after_edit and rebuilt_after_new_dates) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Offline benchmark of the assistant graph.
+
+Replays scripted conversations through `build_graph()` with a deterministic
+chat model instead of Gemini, against a scratch copy of the hospital
+database, and reports latency percentiles per turn, graph node, tool, LLM
+call, checkpointer operation and database connection. Results are written as JSON and can be
+compared against an earlier run to catch regressions:
+
+    python -m benchmarks.graph_benchmark --iterations 50 --output bench.json
+    python -m benchmarks.graph_benchmark --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SCENARIOS = Path(__file__).resolve().parent / "scenarios.json"
+
+# Compared between runs; the rest of the summary is informational
+COMPARED_SECTIONS = ("turns", "nodes", "tools", "checkpoint", "db")
+REPORTED_SECTIONS = ("turns", "nodes", "tools", "llm", "checkpoint", "db")
+COMPARED_PERCENTILES = ("p50", "p95")
+
+
+def summarize(samples):
+    """Latency summary in milliseconds with linearly interpolated percentiles"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        k = (len(ordered) - 1) * p / 100
+        low, high = math.floor(k), math.ceil(k)
+        return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(percentile(50), 3),
+        "p90": round(percentile(90), 3),
+        "p95": round(percentile(95), 3),
+        "p99": round(percentile(99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class Recorder:
+    """Thread-safe collection of latency samples, grouped by section and name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self.tool_outputs = []
+
+    def add(self, section, name, elapsed_ms):
+        with self._lock:
+            self.samples[section][name].append(elapsed_ms)
+
+    def summary(self):
+        with self._lock:
+            return {
+                section: {name: summarize(values) for name, values in sorted(names.items())}
+                for section, names in self.samples.items()
+            }
+
+
+class TimingCallback(BaseCallbackHandler):
+    """Times graph nodes, tools and chat model calls from the LangChain callback events"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, section, name):
+        with self._lock:
+            self._running[run_id] = (section, name, time.perf_counter())
+
+    def _finish(self, run_id):
+        with self._lock:
+            started = self._running.pop(run_id, None)
+        if started:
+            section, name, start = started
+            self.recorder.add(section, name, (time.perf_counter() - start) * 1000)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables nested inside it
+        if node and kwargs.get("name") == node:
+            self._start(run_id, "nodes", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tools", (serialized or {}).get("name") or kwargs.get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        with self._lock:
+            started = self._running.get(run_id)
+        if started:
+            self.recorder.tool_outputs.append((started[1], str(getattr(output, "content", output))))
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm", "chat_model")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+
+def instrument_checkpointer(saver, recorder, use_async):
+    """Wrap the checkpointer's read/write methods on the instance to time them"""
+    names = ("aget_tuple", "aput", "aput_writes") if use_async else ("get_tuple", "put", "put_writes")
+    for name in names:
+        method = getattr(saver, name)
+        label = name[1:] if use_async else name
+
+        if use_async:
+            async def timed(*args, _method=method, _label=label, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await _method(*args, **kwargs)
+                finally:
+                    recorder.add("checkpoint", _label, (time.perf_counter() - start) * 1000)
+        else:
+            def timed(*args, _method=method, _label=label, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    recorder.add("checkpoint", _label, (time.perf_counter() - start) * 1000)
+
+        setattr(saver, name, timed)
+    return saver
+
+
+class DBTimer:
+    """
+    Times every pooled connection the tools hold (queries and the writes'
+    transactions, see `toolkit.tools.get_db_connection`) and sums them per turn.
+    """
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self._lock = threading.Lock()
+        self._turn_ms = 0.0
+
+    def install(self):
+        import toolkit.tools as tools
+        connection = tools.get_db_connection
+
+        @contextmanager
+        def timed_connection():
+            with connection() as conn:
+                start = time.perf_counter()
+                try:
+                    yield conn
+                finally:
+                    elapsed = (time.perf_counter() - start) * 1000
+                    self.recorder.add("db", "connection_held", elapsed)
+                    with self._lock:
+                        self._turn_ms += elapsed
+
+        tools.get_db_connection = timed_connection
+
+    def end_turn(self, measured):
+        with self._lock:
+            elapsed, self._turn_ms = self._turn_ms, 0.0
+        if measured:
+            self.recorder.add("db", "per_turn", elapsed)
+
+
+def load_scenarios(path, names=None):
+    with open(path) as f:
+        scenarios = json.load(f)
+    if names:
+        scenarios = [s for s in scenarios if s["name"] in names]
+        missing = set(names) - {s["name"] for s in scenarios}
+        if missing:
+            raise SystemExit(f"Unknown scenario(s): {', '.join(sorted(missing))}")
+    return scenarios
+
+
+def prepare_environment(args, workdir):
+    """Point the app at scratch databases; must run before the app modules are imported"""
+    db_path = os.path.join(workdir, "hospital.db")
+    shutil.copy(args.db, db_path)
+    os.environ["HOSPITAL_DB_PATH"] = db_path
+    os.environ["CHECKPOINT_DB_PATH"] = os.path.join(workdir, "checkpoints.db")
+    os.environ["FAST_ROUTER_ENABLED"] = "false" if args.no_fast_router else "true"
+    os.environ["HANDOFF_SHORTCUT"] = args.handoff_shortcut
+    if args.no_cache:
+        os.environ["AVAILABILITY_CACHE_SIZE"] = "0"
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def make_checkpointer(kind, workdir):
+    if kind == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+    from utils.checkpointer import SqliteCheckpointSaver
+    return SqliteCheckpointSaver(db_path=os.path.join(workdir, "checkpoints.db"), vacuum_interval=0)
+
+
+def run_turn(graph, message, config, loop=None):
+    """Run one user turn, through `ainvoke` on `loop` when given"""
+    state = {"messages": [HumanMessage(content=message)]}
+    if loop is not None:
+        return loop.run_until_complete(graph.ainvoke(state, config))
+    return graph.invoke(state, config)
+
+
+def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix="graph-bench-")
+    loop = asyncio.new_event_loop() if args.use_async else None
+    try:
+        prepare_environment(args, workdir)
+        from agent import build_graph
+        from benchmarks.scripted_llm import Script, ScriptedChatModel
+        from toolkit.availability_cache import availability_cache
+        from utils.compaction import compaction_stats
+        from utils.db_pool import get_pool
+        from utils.intent_router import fast_router_stats, handoff_shortcut_stats
+
+        recorder = Recorder()
+        script = Script()
+        checkpointer = instrument_checkpointer(make_checkpointer(args.checkpointer, workdir), recorder, args.use_async)
+        graph = build_graph(llm=ScriptedChatModel(script=script, latency_ms=args.llm_latency_ms), checkpointer=checkpointer)
+        callback = TimingCallback(recorder)
+        db_timer = DBTimer(recorder)
+        db_timer.install()
+
+        scenarios = load_scenarios(args.scenarios, args.scenario)
+        errors = []
+        unused_steps = 0
+        for iteration in range(args.warmup + args.iterations):
+            measured = iteration >= args.warmup
+            for scenario in scenarios:
+                config = {
+                    "configurable": {"thread_id": f"bench-{uuid.uuid4().hex}"},
+                    "callbacks": [callback] if measured else [],
+                }
+                for number, turn in enumerate(scenario["turns"]):
+                    unused_steps += script.start_turn(turn["llm"])
+                    recorder.tool_outputs.clear()
+                    start = time.perf_counter()
+                    run_turn(graph, turn["user"], config, loop)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    db_timer.end_turn(measured)
+                    if measured:
+                        recorder.add("turns", scenario["name"], elapsed)
+                        recorder.add("turns", "all", elapsed)
+
+                    outputs = dict(recorder.tool_outputs)
+                    for tool_name, expected in turn.get("expect", {}).items():
+                        if measured and expected not in outputs.get(tool_name, ""):
+                            errors.append(f"{scenario['name']} turn {number + 1}: {tool_name} returned {outputs.get(tool_name)!r}")
+        unused_steps += script.start_turn([])
+
+        summary = recorder.summary()
+        return {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "iterations": args.iterations,
+                "warmup": args.warmup,
+                "scenarios": [s["name"] for s in scenarios],
+                "checkpointer": args.checkpointer,
+                "async": args.use_async,
+                "llm_latency_ms": args.llm_latency_ms,
+                "fast_router": not args.no_fast_router,
+                "handoff_shortcut": args.handoff_shortcut,
+                "availability_cache": not args.no_cache,
+            },
+            **{section: summary.get(section, {}) for section in REPORTED_SECTIONS},
+            "llm_calls": dict(script.calls),
+            "script": {"unused_steps": unused_steps, "skipped_steps": script.skipped, "unscripted_calls": script.unscripted},
+            "errors": errors,
+            "stats": {
+                "db_pool": get_pool().stats(),
+                "availability_cache": availability_cache.stats(),
+                "fast_router": fast_router_stats(),
+                "handoff_shortcut": handoff_shortcut_stats(),
+                "compaction": compaction_stats(),
+                **({"checkpointer": checkpointer.stats()} if hasattr(checkpointer, "stats") else {}),
+            },
+        }
+    finally:
+        if loop is not None:
+            loop.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """Return (report lines, regressions) for the percentiles both runs measured"""
+    lines, regressions = [], []
+    for section in COMPARED_SECTIONS:
+        for name, now in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before or not before.get("count") or not now.get("count"):
+                continue
+            for percentile in COMPARED_PERCENTILES:
+                old, new = before[percentile], now[percentile]
+                change = (new - old) / old if old else 0.0
+                flag = ""
+                if change > threshold and new - old > min_delta_ms:
+                    flag = "  REGRESSION"
+                    regressions.append(f"{section}.{name}.{percentile}")
+                lines.append(f"{section:<10} {name:<36} {percentile}  {old:>9.3f} -> {new:>9.3f} ms  {change:+7.1%}{flag}")
+    return lines, regressions
+
+
+def print_summary(results):
+    for section in REPORTED_SECTIONS:
+        if not results[section]:
+            continue
+        print(f"\n{section}")
+        for name, s in results[section].items():
+            print(f"  {name:<36} n={s['count']:<6} p50={s['p50']:>9.3f}  p95={s['p95']:>9.3f}  p99={s['p99']:>9.3f} ms")
+    print(f"\nLLM calls: {results['llm_calls']}  script: {results['script']}")
+    for error in results["errors"]:
+        print(f"ERROR {error}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the assistant graph offline with a scripted LLM.")
+    parser.add_argument("--scenarios", default=str(DEFAULT_SCENARIOS), help="JSON file with conversation scripts")
+    parser.add_argument("--scenario", action="append", help="Only run the named scenario (repeatable)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--db", default=str(REPO_ROOT / "database" / "hospital.db"), help="Database copied for the run")
+    parser.add_argument("--checkpointer", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Drive the graph with ainvoke like the API")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency of each LLM call")
+    parser.add_argument("--no-fast-router", action="store_true", help="Disable the rule-based availability router")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the availability lookup cache")
+    parser.add_argument("--handoff-shortcut", choices=("off", "info", "direct"), default="off",
+                        help="Run the availability tool straight from ToGetInfo handoffs")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore slowdowns smaller than this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+    print_summary(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    status = 1 if results["errors"] else 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(baseline, results, args.threshold, args.min_delta_ms)
+        print(f"\nCompared with {args.compare} ({baseline['meta'].get('commit')}):")
+        differing = [
+            key for key, value in results["meta"].items()
+            if key not in ("timestamp", "commit") and baseline["meta"].get(key) != value
+        ]
+        if differing:
+            print(f"Note: the baseline ran with different settings: {', '.join(differing)}")
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
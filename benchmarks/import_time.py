@@ -0,0 +1,106 @@
+"""
+Cold import benchmark for the API module.
+
+Imports `main` in fresh interpreters and reports the wall time, the slowest
+modules from `python -X importtime`, and whether any LLM provider package was
+imported (they should only load when the graph is built at startup):
+
+    python -m benchmarks.import_time --runs 5 --max-seconds 3
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PROVIDER_MODULES = ("langchain_google_genai", "langchain_groq", "langchain_openai")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+providers = sorted({{name.split('.')[0] for name in sys.modules if name.startswith({providers!r})}})
+print("RESULT", elapsed, ",".join(providers) or "-")
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\| ( *)(\S.*)")
+
+
+def run_probe(module, with_importtime=False):
+    command = [sys.executable]
+    if with_importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", PROBE.format(module=module, providers=PROVIDER_MODULES)]
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr}")
+    result = next(line for line in completed.stdout.splitlines() if line.startswith("RESULT"))
+    _, elapsed, providers = result.split(" ")
+    return float(elapsed), [p for p in providers.split(",") if p != "-"], completed.stderr
+
+
+def slowest_imports(importtime_output, top):
+    """Modules imported directly by the probed module, by cumulative import time (microseconds)"""
+    packages = {}
+    for line in importtime_output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # -X importtime indents nested imports by two spaces per level
+        if match and len(match.group(3)) == 2:
+            packages[match.group(4)] = int(match.group(2))
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the API module.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest direct imports to list")
+    parser.add_argument("--max-seconds", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    timings = []
+    providers = set()
+    for _ in range(args.runs):
+        elapsed, loaded, _ = run_probe(args.module)
+        timings.append(elapsed)
+        providers.update(loaded)
+    _, _, importtime_output = run_probe(args.module, with_importtime=True)
+    slowest = slowest_imports(importtime_output, args.top)
+
+    results = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "max_s": round(max(timings), 4),
+        "provider_modules_imported": sorted(providers),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+    print(f"import {args.module}: median {results['median_s']:.3f}s (min {results['min_s']:.3f}s, max {results['max_s']:.3f}s) over {args.runs} runs")
+    print(f"Slowest direct imports of {args.module}:")
+    for name, ms in results["slowest_imports_ms"].items():
+        print(f"  {name:<40} {ms:>8.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if providers:
+        print(f"FAIL: provider packages imported at import time: {', '.join(sorted(providers))}")
+        status = 1
+    if args.max_seconds is not None and results["median_s"] > args.max_seconds:
+        print(f"FAIL: median import time {results['median_s']:.3f}s exceeds {args.max_seconds:.3f}s")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
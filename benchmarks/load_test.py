@@ -0,0 +1,318 @@
+"""
+Multi-worker load test for the API.
+
+Starts the real app under `uvicorn --workers N` (a scripted model stands in
+for Gemini, so no API key or network is needed) against scratch copies of the
+databases, and drives it with concurrent virtual users from several client
+processes. Each user keeps its own conversation thread, whose turns land on
+whichever worker the OS hands the connection to, and mixes:
+
+- chat turns asking for one doctor's availability (rule-based router and
+  HANDOFF_SHORTCUT=direct, so the tool output is the answer and no model call
+  is made),
+- GET /availability,
+- book, re-check availability through the chat, cancel: the re-check must not
+  list the booked slot, whichever worker cached that doctor's day before
+  (reported as stale reads).
+
+Throughput is reported per worker count, with the scaling efficiency against
+one worker. Run it on a machine with more cores than workers plus clients:
+
+    python -m benchmarks.load_test --workers 1 2 4 --users 64 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DB = REPO_ROOT / "database" / "hospital.db"
+
+
+def create_app():
+    """uvicorn factory for the server under test: the real app with a scripted model in place of Gemini"""
+    sys.path.insert(0, str(REPO_ROOT))
+    import main
+    from agent import build_graph
+    from benchmarks.scripted_llm import Script, ScriptedChatModel
+
+    latency_ms = float(os.getenv("LOAD_TEST_LLM_LATENCY_MS", 0))
+    main.build_graph = lambda: build_graph(llm=ScriptedChatModel(script=Script(), latency_ms=latency_ms))
+    return main.app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def load_roster(db_path, days):
+    """(doctor names, DD-MM-YYYY dates) to query: every doctor, the first `days` dates with free slots"""
+    conn = sqlite3.connect(db_path)
+    try:
+        doctors = [row[0] for row in conn.execute("SELECT name FROM doctors ORDER BY name")]
+        dates = [row[0] for row in conn.execute(
+            "SELECT DISTINCT date FROM slots WHERE is_available = 1 ORDER BY date LIMIT ?", [days]
+        )]
+    finally:
+        conn.close()
+    return doctors, ["-".join(reversed(d.split("-"))) for d in dates]
+
+
+class Server:
+    """The app under `uvicorn --workers`, on scratch copies of the databases"""
+
+    def __init__(self, args, workers, workdir):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        db_path = os.path.join(workdir, "hospital.db")
+        shutil.copy(args.db, db_path)
+        env = {
+            **os.environ,
+            "HOSPITAL_DB_PATH": db_path,
+            "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db"),
+            "SHARED_STATE_DB_PATH": os.path.join(workdir, "shared_state.db"),
+            "CHECKPOINT_BACKEND": "sqlite",
+            "WEB_CONCURRENCY": str(workers),
+            # Also shared with one worker, so every run pays the same coordination costs
+            "SHARED_STATE": "true",
+            "FAST_ROUTER_ENABLED": "true",
+            "HANDOFF_SHORTCUT": "direct",
+            "TOOL_OUTPUT_FORMAT": "json",
+            "TOOL_OUTPUT_MAX_GROUPS": "0",
+            "LLM_CACHE_ENABLED": "false",
+            "LOAD_TEST_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        }
+        command = [sys.executable, "-m", "uvicorn", "benchmarks.load_test:create_app", "--factory",
+                   "--host", "127.0.0.1", "--port", str(self.port), "--workers", str(workers),
+                   "--log-level", "warning", "--no-access-log"]
+        self.log = open(os.path.join(workdir, "server.log"), "w")
+        self.process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self.log_path = self.log.name
+
+    def wait_ready(self, workers, timeout=120):
+        """Wait until /ready answers 200 repeatedly, so every worker has built its graph"""
+        import httpx
+
+        deadline = time.monotonic() + timeout
+        streak = 0
+        while streak < 10 * workers:
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                with open(self.log_path) as f:
+                    raise SystemExit(f"Server did not become ready:\n{f.read()[-3000:]}")
+            try:
+                ready = httpx.get(f"{self.url}/ready", timeout=2).status_code == 200
+            except httpx.HTTPError:
+                ready = False
+            streak = streak + 1 if ready else 0
+            time.sleep(0.01 if ready else 0.2)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def free_in(answer, time_slot):
+    """Whether a JSON availability answer lists `time_slot` (HH:MM) as free; None if it is not one"""
+    try:
+        result = json.loads(answer)
+    except (TypeError, ValueError):
+        return None
+    for group in result.get("available", []):
+        for entry in group["free"]:
+            first, _, last = entry.partition("-")
+            if first <= time_slot <= (last or first):
+                return True
+    return False
+
+
+async def run_user(client, fresh, user, args, doctors, dates, stop_at, stats):
+    import httpx
+
+    rng = random.Random(f"{args.seed}:{user}")
+    thread_id = f"load-{user}"
+    patient_id = 2000000 + user
+
+    async def call(kind, method, path, via=client, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await via.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            stats["errors"].append(f"{kind}: {type(e).__name__}")
+            return None
+        stats["latency"].setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+        stats["requests"] += 1
+        if response.status_code >= 500 or response.status_code in (408, 429):
+            stats["errors"].append(f"{kind}: HTTP {response.status_code}")
+        return response
+
+    async def ask(doctor, date, via=client, thread=thread_id):
+        response = await call("chat", "POST", "/generate-stream/", via=via, json={"query": f"Is Dr. {doctor.title()} available on {date}?"},
+                              headers={"X-THREAD-ID": thread})
+        return response.json()["answer"] if response is not None and response.status_code == 200 else None
+
+    while time.monotonic() < stop_at:
+        doctor, date = rng.choice(doctors), rng.choice(dates)
+        action = rng.choices(("chat", "availability", "booking"), weights=args.mix)[0]
+        if action == "chat":
+            await ask(doctor, date)
+        elif action == "availability":
+            await call("availability", "GET", "/availability", params={"date": date, "doctor_name": doctor})
+        else:
+            response = await call("availability", "GET", "/availability", params={"date": date, "doctor_name": doctor})
+            if response is None or response.status_code != 200 or not response.json()["slots"]:
+                continue
+            time_slot = rng.choice(response.json()["slots"])["time_slot"]
+            # Cache the doctor's day in one worker, then book and re-check on new connections,
+            # which the OS hands to any worker (a kept-alive connection stays with one). Each
+            # check starts a new conversation, so the question goes through the availability tool.
+            stats["checks_started"] += 1
+            await ask(doctor, date, thread=f"{thread_id}-check-{stats['checks_started']}")
+            appointment = {"doctor_name": doctor, "date": {"date": f"{date} {time_slot}"}, "id_number": {"id": patient_id}}
+            booked = await call("booking", "POST", "/appointments", via=fresh, json=appointment)
+            if booked is None or booked.status_code != 201:
+                continue
+            listed = free_in(await ask(doctor, date, via=fresh, thread=f"{thread_id}-recheck-{stats['checks_started']}"), time_slot)
+            if listed is not None:
+                stats["checks"] += 1
+                stats["stale_reads"] += listed
+            await call("booking", "DELETE", "/appointments",
+                       params={"doctor_name": doctor, "date": f"{date} {time_slot}", "patient_id": patient_id})
+
+
+async def run_clients(url, first_user, users, args, doctors, dates, stop_at):
+    import httpx
+
+    stats = {"requests": 0, "latency": {}, "errors": [], "checks_started": 0, "checks": 0, "stale_reads": 0}
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    no_keepalive = httpx.Limits(max_connections=users, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client, \
+            httpx.AsyncClient(base_url=url, timeout=60, limits=no_keepalive) as fresh:
+        await asyncio.gather(*(
+            run_user(client, fresh, user, args, doctors, dates, stop_at, stats)
+            for user in range(first_user, first_user + users)
+        ))
+    return stats
+
+
+def client_process(job):
+    url, first_user, users, args, doctors, dates, start_at = job
+    time.sleep(max(0.0, start_at - time.time()))
+    stop_at = time.monotonic() + args.duration
+    return asyncio.run(run_clients(url, first_user, users, args, doctors, dates, stop_at))
+
+
+def run_load(server, args, doctors, dates):
+    per_client = [args.users // args.clients + (1 if i < args.users % args.clients else 0) for i in range(args.clients)]
+    start_at = time.time() + 1
+    jobs, first_user = [], 0
+    for users in per_client:
+        jobs.append((server.url, first_user, users, args, doctors, dates, start_at))
+        first_user += users
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.map(client_process, jobs)
+
+    merged = {"requests": 0, "latency": {}, "errors": [], "checks": 0, "stale_reads": 0}
+    for stats in results:
+        merged["requests"] += stats["requests"]
+        merged["checks"] += stats["checks"]
+        merged["stale_reads"] += stats["stale_reads"]
+        merged["errors"] += stats["errors"]
+        for kind, samples in stats["latency"].items():
+            merged["latency"].setdefault(kind, []).extend(samples)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API throughput as the number of worker processes grows.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure")
+    parser.add_argument("--users", type=int, default=32, help="Concurrent virtual users")
+    parser.add_argument("--clients", type=int, default=2, help="Client processes driving the users")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per worker count")
+    parser.add_argument("--mix", type=float, nargs=3, default=[6, 3, 1], metavar=("CHAT", "AVAILABILITY", "BOOKING"),
+                        help="Relative weights of the user actions")
+    parser.add_argument("--days", type=int, default=10, help="Distinct dates the users ask about")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Latency of the scripted model, when it is called")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="Hospital database to copy for each run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-efficiency", type=float, help="Fail if throughput per worker drops below this fraction of one worker's")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    doctors, dates = load_roster(args.db, args.days)
+    if not doctors or not dates:
+        raise SystemExit(f"No doctors or free slots in {args.db}")
+
+    runs = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            server = Server(args, workers, workdir)
+            try:
+                server.wait_ready(workers)
+                stats = run_load(server, args, doctors, dates)
+            finally:
+                server.stop()
+        latency = {
+            kind: {"n": len(samples), "p50": round(percentile(samples, 50), 1), "p95": round(percentile(samples, 95), 1)}
+            for kind, samples in sorted(stats["latency"].items())
+        }
+        runs.append({
+            "workers": workers,
+            "requests": stats["requests"],
+            "rps": round(stats["requests"] / args.duration, 1),
+            "latency_ms": latency,
+            "errors": len(stats["errors"]),
+            "error_samples": sorted(set(stats["errors"]))[:5],
+            "consistency_checks": stats["checks"],
+            "stale_reads": stats["stale_reads"],
+        })
+        print(f"{workers} worker(s): {runs[-1]['rps']} req/s, {runs[-1]['errors']} errors, "
+              f"{stats['stale_reads']}/{stats['checks']} stale reads")
+
+    baseline = next((run for run in runs if run["workers"] == 1), None)
+    print(f"\n{'workers':>7} {'req/s':>9} {'speedup':>8} {'efficiency':>10}   p50/p95 ms per request kind  (cores: {os.cpu_count()})")
+    for run in runs:
+        speedup = run["rps"] / baseline["rps"] if baseline and baseline["rps"] else None
+        run["speedup"] = round(speedup, 2) if speedup else None
+        run["efficiency"] = round(speedup / run["workers"], 2) if speedup else None
+        kinds = "  ".join(f"{kind} {v['p50']}/{v['p95']}" for kind, v in run["latency_ms"].items())
+        print(f"{run['workers']:>7} {run['rps']:>9} {run['speedup'] or '-':>8} {run['efficiency'] or '-':>10}   {kinds}")
+        for sample in run["error_samples"]:
+            print(f"        error: {sample}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cores": os.cpu_count(), "users": args.users, "clients": args.clients,
+                       "duration": args.duration, "runs": runs}, f, indent=2)
+
+    failed = any(run["errors"] or run["stale_reads"] for run in runs)
+    if args.min_efficiency is not None:
+        failed |= any(run["efficiency"] is not None and run["efficiency"] < args.min_efficiency for run in runs)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# The assistant a bound model belongs to is recognised by one of its tools
+ROLE_TOOLS = {
+    "primary": "ToGetInfo",
+    "info": "check_availability_by_doctor",
+    "booking": "set_appointment",
+}
+
+FALLBACK_TEXT = "Is there anything else I can help you with?"
+
+
+def _tool_calls_this_turn(messages):
+    """(name, args) of the tool calls made since the last user message"""
+    made = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            made.append((tool_call["name"], tool_call["args"]))
+    return made
+
+
+class Script:
+    """
+    Scripted LLM responses for one conversation turn at a time.
+
+    A turn lists the responses of each assistant ("primary", "info" and
+    "booking") in the order that assistant is called. Responses are queued
+    per role, so a call skipped by a fast path (e.g. the rule-based router
+    answering for the primary assistant) leaves its response unused instead
+    of shifting every later response onto the wrong assistant.
+    """
+
+    def __init__(self):
+        self._queues = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._call_ids = 0
+        self.calls = defaultdict(int)
+        self.unscripted = 0
+        self.skipped = 0
+
+    def start_turn(self, steps):
+        """Load a turn's responses and return how many of the previous turn's were never used."""
+        with self._lock:
+            unused = sum(len(queue) for queue in self._queues.values())
+            self._queues.clear()
+            for step in steps:
+                self._queues[step["role"]].append(step)
+            return unused
+
+    def next_message(self, role, messages=()) -> AIMessage:
+        """
+        The role's next scripted response. Scripted tool calls the graph has
+        already made this turn without the LLM (e.g. the handoff shortcut
+        running the availability tool) are skipped.
+        """
+        made = _tool_calls_this_turn(messages)
+        with self._lock:
+            self.calls[role] += 1
+            queue = self._queues.get(role)
+            while queue and "tool" in queue[0] and (queue[0]["tool"], queue[0].get("args", {})) in made:
+                queue.popleft()
+                self.skipped += 1
+            if not queue:
+                self.unscripted += 1
+                return AIMessage(content=FALLBACK_TEXT)
+            step = queue.popleft()
+            if "tool" not in step:
+                return AIMessage(content=step["text"])
+            self._call_ids += 1
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": step["tool"], "args": step.get("args", {}), "id": f"call_{self._call_ids}"}],
+            )
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Gemini chat model. `bind_tools` returns a
+    copy tagged with the assistant role and sharing the same `Script`, and
+    every call optionally sleeps for `latency_ms` to mimic the network.
+    """
+
+    script: Any
+    role: Optional[str] = None
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        names = {getattr(tool, "name", None) or getattr(tool, "__name__", "") for tool in tools}
+        role = next((role for role, tool_name in ROLE_TOOLS.items() if tool_name in names), None)
+        return self.model_copy(update={"role": role})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self.script.next_message(self.role, messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self.script.next_message(self.role, messages))])
@@ -0,0 +1,146 @@
+"""
+Prompt-size benchmark for the availability tools.
+
+Generates synthetic rosters of increasing size with `database/generate_db.py`
+and counts the tokens of `check_availability_by_specialization` output in each
+TOOL_OUTPUT_FORMAT, so a change to the encoder that makes tool results grow
+with the roster again shows up before it reaches the prompt. Each roster is
+also encoded with one doctor working a single slot that day, who has no slot
+interval, an edge case the output must render without placeholders such as "None":
+
+    python -m benchmarks.tool_output_tokens --doctors 10 100 1000 --max-tokens 400
+
+Tokens are counted with tiktoken's cl100k_base encoding when it is available,
+otherwise estimated as characters / 4.
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from database.generate_db import SPECIALIZATIONS, generate
+from toolkit.slot_encoding import OUTPUT_FORMATS, encode_availability
+from toolkit.tools import day_schedules
+from utils.schema import from_iso_date
+
+DAY = date(2025, 8, 4)
+
+
+def token_counter():
+    """(name, count) of the best available tokenizer"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or its vocabulary cannot be downloaded
+        return "chars/4", lambda text: math.ceil(len(text) / 4)
+    return "cl100k_base", lambda text: len(encoding.encode(text))
+
+
+def build_database(path, doctors, args):
+    generator_args = argparse.Namespace(
+        doctors=doctors, specializations=args.specializations, start=DAY, days=1, weekends=False,
+        day_start=args.day_start, day_end=args.day_end, slot_minutes=args.slot_minutes,
+        booking_density=args.booking_density, seed=args.seed, batch_rows=500_000, demo_roster=False,
+    )
+    conn = sqlite3.connect(path)
+    try:
+        generate(conn, generator_args)
+    finally:
+        conn.close()
+
+
+def measure(path, specialization, count_tokens, max_groups):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        schedules = day_schedules(conn, DAY.isoformat(), specialization=specialization)
+    finally:
+        conn.close()
+    result = {"doctors": len(schedules)}
+    for output_format in OUTPUT_FORMATS:
+        output = encode_availability(schedules, from_iso_date(DAY.isoformat()), specialization=specialization,
+                                     output_format=output_format, max_groups=max_groups)
+        result[output_format] = count_tokens(output)
+    return result
+
+
+def single_slot_outputs(path, specialization, max_groups):
+    """Outputs of each format with the first doctor with free slots cut down to one free slot that day"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        schedules = day_schedules(conn, DAY.isoformat(), specialization=specialization)
+    finally:
+        conn.close()
+    doctor = next((name for name, day in schedules.items() if any(available for _, available in day)), None)
+    if doctor is None:
+        return {}
+    kept = next(slot for slot, available in schedules[doctor] if available)
+    schedules[doctor] = [(kept, True)]
+    outputs = {}
+    for output_format in OUTPUT_FORMATS:
+        outputs[output_format] = encode_availability(schedules, from_iso_date(DAY.isoformat()), specialization=specialization,
+                                                     output_format=output_format, max_groups=max_groups)
+    outputs["compact (doctor)"] = encode_availability({doctor: schedules[doctor]}, from_iso_date(DAY.isoformat()),
+                                                      doctor_name=doctor, max_groups=max_groups)
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count availability tool output tokens as the roster grows.")
+    parser.add_argument("--doctors", type=int, nargs="+", default=[10, 50, 200, 1000], help="Roster sizes to measure")
+    parser.add_argument("--specializations", type=int, default=len(SPECIALIZATIONS))
+    parser.add_argument("--day-start", default="09:00")
+    parser.add_argument("--day-end", default="16:00")
+    parser.add_argument("--slot-minutes", type=int, default=60)
+    parser.add_argument("--booking-density", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-groups", type=int, default=int(os.getenv("TOOL_OUTPUT_MAX_GROUPS", 12)),
+                        help="Schedules listed before the output is cut off (0 = no limit)")
+    parser.add_argument("--max-tokens", type=int, help="Fail if the compact output of any roster exceeds this")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    tokenizer, count_tokens = token_counter()
+    specialization = SPECIALIZATIONS[0]
+    rows = []
+    broken = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for doctors in sorted(args.doctors):
+            path = os.path.join(scratch, f"roster_{doctors}.db")
+            build_database(path, doctors, args)
+            rows.append({"roster": doctors, **measure(path, specialization, count_tokens, args.max_groups)})
+            for name, output in single_slot_outputs(path, specialization, args.max_groups).items():
+                if "None" in output or "null" in output:
+                    broken.append((doctors, name, output))
+
+    print(f"Tokens ({tokenizer}) of check_availability_by_specialization('{specialization}') output")
+    print(f"{'roster':>8} {'doctors':>8} " + " ".join(f"{f:>8}" for f in OUTPUT_FORMATS))
+    for row in rows:
+        print(f"{row['roster']:>8} {row['doctors']:>8} " + " ".join(f"{row[f]:>8}" for f in OUTPUT_FORMATS))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"tokenizer": tokenizer, "specialization": specialization, "results": rows}, f, indent=2)
+
+    for doctors, name, output in broken:
+        print(f"FAIL: {name} output for a roster of {doctors} with a single-slot doctor has a placeholder:\n{output}")
+    over = []
+    if args.max_tokens is not None:
+        over = [row for row in rows if row["compact"] > args.max_tokens]
+        for row in over:
+            print(f"FAIL: compact output for a roster of {row['roster']} is {row['compact']} tokens (limit {args.max_tokens})")
+    sys.exit(1 if over or broken else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Synthetic scheduling data for performance tests.
+
+Generates a roster of doctors and their slots straight into the normalized
+schema. Slot rows are produced by SQLite itself (doctors x dates x times), one
+transaction per batch of doctors, so nothing is materialized in Python and a
+multi-million-slot database builds in seconds. Bookings are spread with a
+seeded hash of each slot, so the same arguments always produce the same data,
+and re-running is idempotent: existing slots and bookings are left untouched.
+
+    python database/generate_db.py database/load_test.db --doctors 500 --days 365 --slot-minutes 30
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Allow running as `python database/generate_db.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from toolkit.availability_index import MAX_SLOTS_PER_DAY
+from utils.schema import create_indexes, ensure_schema
+
+# The demo roster the assistants' tools know by name
+DEMO_ROSTER = [
+    ("general_dentist", "john doe"),
+    ("cosmetic_dentist", "jane smith"),
+    ("prosthodontist", "emily johnson"),
+    ("pediatric_dentist", "michael green"),
+    ("emergency_dentist", "lisa brown"),
+    ("oral_surgeon", "kevin anderson"),
+    ("orthodontist", "robert martinez"),
+    ("general_dentist", "susan davis"),
+    ("general_dentist", "daniel miller"),
+    ("general_dentist", "sarah wilson"),
+    ("general_medicine", "alex turner"),
+]
+SPECIALIZATIONS = ["general_dentist", "cosmetic_dentist", "prosthodontist", "pediatric_dentist",
+                   "emergency_dentist", "oral_surgeon", "orthodontist", "general_medicine"]
+
+FIRST_NAMES = ["james", "mary", "robert", "patricia", "john", "jennifer", "michael", "linda", "david", "elizabeth",
+               "william", "barbara", "richard", "susan", "joseph", "jessica", "thomas", "sarah", "charles", "karen"]
+LAST_NAMES = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez",
+              "hernandez", "lopez", "gonzalez", "wilson", "anderson", "thomas", "taylor", "moore", "jackson", "martin"]
+
+# Secondary indexes on slots; dropped while bulk loading an empty table and rebuilt afterwards
+SLOT_INDEXES = ["idx_slots_date_doctor", "idx_slots_patient"]
+
+
+def _xor(a, b):
+    # SQLite has no XOR operator
+    return f"(({a}) | ({b})) - (({a}) & ({b}))"
+
+
+# Rows for the doctors in gen_doctors. Each doctor, date and time has a random 48-bit key and a slot's
+# hash is their XOR (tabulation hashing): uniform, seeded, and cheap enough to evaluate per row.
+GENERATE_SLOTS_SQL = f"""
+INSERT INTO slots (doctor_id, date, time_slot, is_available, patient_id)
+SELECT doctor_id, date, time_slot,
+       CASE WHEN h % 1000000 < :booked_per_million THEN 0 ELSE 1 END,
+       CASE WHEN h % 1000000 < :booked_per_million THEN 1000000 + (h >> 20) % 9000000 END
+FROM (
+    SELECT d.id AS doctor_id, dt.date, t.time_slot, {_xor(_xor('d.r', 'dt.r'), 't.r')} AS h
+    FROM gen_doctors d CROSS JOIN gen_dates dt CROSS JOIN gen_times t
+)
+WHERE true
+ON CONFLICT (doctor_id, date, time_slot) DO NOTHING
+"""
+
+
+def doctor_names(count):
+    """Deterministic unique 'first last' names, numbered once the combinations run out"""
+    combinations = len(FIRST_NAMES) * len(LAST_NAMES)
+    for i in range(count):
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        yield name if i < combinations else f"{name} {i // combinations + 1}"
+
+
+def time_slots(day_start, day_end, slot_minutes):
+    current = datetime.strptime(day_start, "%H:%M")
+    end = datetime.strptime(day_end, "%H:%M")
+    while current < end:
+        yield current.strftime("%H:%M")
+        current += timedelta(minutes=slot_minutes)
+
+
+def slot_key(seed, kind, value):
+    """Random 48-bit key of one doctor, date or time; the same seed and value always give the same key"""
+    return random.Random(f"{seed}:{kind}:{value}").getrandbits(48)
+
+
+def working_days(start, days, weekends):
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if weekends or day.weekday() < 5:
+            yield day.isoformat()
+
+
+def build_roster(conn, args):
+    """Upsert specializations and doctors; returns the roster as (specialization, doctor) pairs"""
+    rng = random.Random(args.seed)
+    specializations = SPECIALIZATIONS[:args.specializations] + [
+        f"specialization_{i + 1:02d}" for i in range(len(SPECIALIZATIONS), args.specializations)
+    ]
+    roster = [entry for entry in DEMO_ROSTER if entry[0] in specializations] if args.demo_roster else []
+    taken = {doctor for _, doctor in roster}
+    for name in doctor_names(args.doctors + len(taken)):
+        if len(roster) >= args.doctors:
+            break
+        if name not in taken:
+            roster.append((rng.choice(specializations), name))
+
+    conn.executemany("INSERT INTO specializations (name) VALUES (?) ON CONFLICT (name) DO NOTHING",
+                     [(s,) for s in specializations])
+    conn.executemany("""
+    INSERT INTO doctors (name, specialization_id)
+    SELECT ?, id FROM specializations WHERE name = ?
+    ON CONFLICT (name) DO NOTHING
+    """, [(doctor, specialization) for specialization, doctor in roster])
+    conn.commit()
+    return roster
+
+
+def generate(conn, args):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")
+    ensure_schema(conn)
+
+    roster = build_roster(conn, args)
+    names = [doctor for _, doctor in roster]
+    doctor_ids = sorted(
+        row[0] for row in conn.execute(
+            "SELECT id FROM doctors WHERE name IN (SELECT value FROM json_each(?))", [json.dumps(names)]
+        )
+    )
+
+    dates = list(working_days(args.start, args.days, args.weekends))
+    times = list(time_slots(args.day_start, args.day_end, args.slot_minutes))
+    if len(times) > MAX_SLOTS_PER_DAY:
+        print(f"Warning: {len(times)} slots per day exceeds the in-memory index limit of {MAX_SLOTS_PER_DAY}; "
+              "set AVAILABILITY_INDEX_ENABLED=false when serving this database")
+    conn.execute("CREATE TEMP TABLE gen_doctors (id INTEGER PRIMARY KEY, r INTEGER NOT NULL)")
+    conn.execute("CREATE TEMP TABLE gen_dates (date TEXT NOT NULL, r INTEGER NOT NULL)")
+    conn.execute("CREATE TEMP TABLE gen_times (time_slot TEXT NOT NULL, r INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO gen_dates VALUES (?, ?)", [(d, slot_key(args.seed, "date", d)) for d in dates])
+    conn.executemany("INSERT INTO gen_times VALUES (?, ?)", [(t, slot_key(args.seed, "time", t)) for t in times])
+
+    # Maintaining secondary indexes row by row is the slowest part of a bulk load
+    bulk_load = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM slots)").fetchone()[0]
+    if bulk_load:
+        for index in SLOT_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    doctors_per_batch = max(1, args.batch_rows // max(1, len(dates) * len(times)))
+    booked_per_million = int(args.booking_density * 1_000_000)
+    inserted = 0
+    try:
+        for i in range(0, len(doctor_ids), doctors_per_batch):
+            with conn:
+                conn.execute("DELETE FROM gen_doctors")
+                conn.executemany("INSERT INTO gen_doctors VALUES (?, ?)", [
+                    (doctor_id, slot_key(args.seed, "doctor", doctor_id))
+                    for doctor_id in doctor_ids[i:i + doctors_per_batch]
+                ])
+                changes = conn.total_changes
+                conn.execute(GENERATE_SLOTS_SQL, {"booked_per_million": booked_per_million})
+                inserted += conn.total_changes - changes
+    finally:
+        # Also when a batch fails or the run is interrupted: the batches already committed stay
+        if bulk_load:
+            create_indexes(conn, "slots")
+            conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return len(roster), len(dates), len(times), inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic scheduling database for load and performance tests.")
+    parser.add_argument("db_path", help="SQLite database to create or extend")
+    parser.add_argument("--doctors", type=int, default=200, help="Number of doctors (the demo roster counts towards it)")
+    parser.add_argument("--specializations", type=int, default=len(SPECIALIZATIONS))
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today(), help="First date (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=90, help="Number of calendar days from --start")
+    parser.add_argument("--weekends", action="store_true", help="Also generate slots on Saturdays and Sundays")
+    parser.add_argument("--day-start", default="09:00", help="First slot of the day (HH:MM)")
+    parser.add_argument("--day-end", default="16:00", help="End of the working day (HH:MM, exclusive)")
+    parser.add_argument("--slot-minutes", type=int, default=60, help="Slot granularity in minutes")
+    parser.add_argument("--booking-density", type=float, default=0.3, help="Fraction of slots already booked (0-1)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-rows", type=int, default=500_000, help="Approximate slot rows per transaction")
+    parser.add_argument("--no-demo-roster", dest="demo_roster", action="store_false",
+                        help="Do not include the 11 demo doctors the assistants know by name")
+    args = parser.parse_args()
+
+    if not 0 <= args.booking_density <= 1:
+        parser.error("--booking-density must be between 0 and 1")
+    if min(args.doctors, args.specializations, args.days, args.slot_minutes) < 1:
+        parser.error("--doctors, --specializations, --days and --slot-minutes must be positive")
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.db_path)
+    doctors, days, slots_per_day, inserted = generate(conn, args)
+    total, booked = conn.execute("SELECT count(*), sum(is_available = 0) FROM slots").fetchone()
+    conn.close()
+    print(f"{doctors} doctors x {days} days x {slots_per_day} slots/day: inserted {inserted} slots "
+          f"in {time.perf_counter() - started:.1f}s; database now has {total} slots ({booked or 0} booked)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+
+# Allow running as `python database/migrate_db.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.schema import SCHEMA_VERSION, ensure_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate hospital.db from the flat doctor_availability table to the normalized schema.")
+    parser.add_argument("db_path", nargs="?", default="database/hospital.db", help="Path to the SQLite database")
+    parser.add_argument("--backup", action="store_true", help="Copy the database to <db_path>.bak before migrating")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        parser.error(f"Database not found: {args.db_path}")
+
+    if args.backup:
+        shutil.copy2(args.db_path, args.db_path + ".bak")
+        print(f"Backup written to {args.db_path}.bak")
+
+    conn = sqlite3.connect(args.db_path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        print(f"Database already at schema version {version}, nothing to do")
+        conn.close()
+        return
+
+    ensure_schema(conn)
+    slots, booked = conn.execute("SELECT count(*), sum(is_available = 0) FROM slots").fetchone()
+    doctors = conn.execute("SELECT count(*) FROM doctors").fetchone()[0]
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Migrated to schema version {SCHEMA_VERSION}: {doctors} doctors, {slots} slots ({booked or 0} booked)")
+
+
+if __name__ == "__main__":
+    main()
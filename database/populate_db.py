@@ -1,21 +1,19 @@
+import os
 import sqlite3
+import sys
 from datetime import datetime, timedelta
 
+# Allow running as `python database/populate_db.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.schema import ensure_schema
+
 # Connect to the SQLite database (adjust path as needed)
 conn = sqlite3.connect('database/hospital.db')
 cursor = conn.cursor()
 
-# Create the table if it doesn't exist
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS doctor_availability (
-    date TEXT,
-    time_slot TEXT,
-    specialization TEXT,
-    doctor_name TEXT,
-    is_available BOOLEAN,
-    patient_id INT
-)
-''')
+# Create the tables if they don't exist (older flat databases are migrated)
+ensure_schema(conn)
 
 # Doctor and specialization mapping
 entries = [
@@ -37,23 +35,28 @@ start_date = datetime(2025, 7, 31)
 end_date = datetime(2025, 8, 15)
 time_slots = [f"{hour:02d}:00" for hour in range(9, 16)]  # 09:00 to 15:00
 
+cursor.executemany('INSERT OR IGNORE INTO specializations (name) VALUES (?)',
+                   [(specialization,) for specialization in sorted({s for s, _ in entries})])
+cursor.executemany('''
+INSERT OR IGNORE INTO doctors (name, specialization_id)
+SELECT ?, id FROM specializations WHERE name = ?
+''', [(doctor, specialization) for specialization, doctor in entries])
+doctor_ids = dict(cursor.execute('SELECT name, id FROM doctors'))
+
 rows = []
 current_date = start_date
 while current_date <= end_date:
     if current_date.weekday() < 5:  # 0=Monday, ..., 4=Friday
-        date_str = current_date.strftime("%d-%m-%Y")
+        date_str = current_date.strftime("%Y-%m-%d")
         for specialization, doctor in entries:
             for slot in time_slots:
-                rows.append((date_str, slot, specialization, doctor, True, None))
+                rows.append((doctor_ids[doctor], date_str, slot, True, None))
     current_date += timedelta(days=1)
 
-# Clear previous data for a clean slate (optional, uncomment if needed)
-# cursor.execute('DELETE FROM doctor_availability')
-
-# Insert data
+# Insert data; existing slots (and their bookings) are left untouched on re-runs
 cursor.executemany('''
-INSERT INTO doctor_availability (date, time_slot, specialization, doctor_name, is_available, patient_id)
-VALUES (?, ?, ?, ?, ?, ?)
+INSERT OR IGNORE INTO slots (doctor_id, date, time_slot, is_available, patient_id)
+VALUES (?, ?, ?, ?, ?)
 ''', rows)
 
 conn.commit()
@@ -1,8 +1,33 @@
 from fastapi import HTTPException, FastAPI, Header
-from models.model import GenerationResponse, GenerationRequest, ErrorResponse
-from fastapi.responses import JSONResponse
-from langchain_core.messages import HumanMessage
+from typing import Optional
+from models.model import (
+    AppointmentRequest, AppointmentResponse, AvailabilityResponse, BatchRequest, BatchResponse, DateModel,
+    ErrorResponse, GenerationRequest, GenerationResponse, IdentificationNumberModel, PatientAppointmentsResponse,
+    RescheduleRequest,
+)
+from pydantic import ValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager, contextmanager
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
 from agent import build_graph
+from toolkit.availability_cache import availability_cache
+from toolkit.availability_index import availability_index_stats, get_availability_index
+from toolkit.booking import RescheduleResult, book_slot, cancel_slot, doctor_specialization, reschedule_slot
+from toolkit.slot_changes import slot_change_stats, sync_slot_changes
+from toolkit.tools import available_slots, convert_datetime_format, get_db_connection, patient_appointments
+from utils.admission import PRIORITY_BOOKING, PRIORITY_DEFAULT, AdmissionRejected, get_admission_controller
+from utils.compaction import compaction_stats
+from utils.db_pool import get_pool, run_in_db_executor
+from utils.intent_router import fast_router_stats, handoff_shortcut_stats
+from utils.llm_cache import get_llm_cache
+from utils.llm_governor import get_llm_governor
+from utils.metrics import REQUEST_SECONDS, MetricsCallbackHandler, register_stats, render_metrics, server_timing_enabled
+from utils.schema import from_iso_date, to_iso_date
+from utils.shared_state import shared_state_enabled, worker_count
+from utils.thread_coordinator import IdempotencyConflictError, ThreadBusyError, get_thread_coordinator
+import asyncio
+import json
+import time
 import logging
 import uvicorn
 import os
@@ -14,65 +39,522 @@ dotenv.load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Built in the background after startup, so the server answers /health right away
+graph = None
+startup_error = None
+
+
+def warm_up():
+    """Open the pooled connection, the checkpointer and the slot index before the first request"""
+    with get_pool().connection() as conn:
+        conn.execute("SELECT 1 FROM slots LIMIT 1").fetchall()
+        # Start following other workers' bookings before the index snapshot is taken
+        sync_slot_changes(conn)
+        get_availability_index(conn)
+    graph.checkpointer.get_tuple({"configurable": {"thread_id": "__warmup__", "checkpoint_ns": ""}})
+
+
+def load_graph():
+    global graph
+    started = time.perf_counter()
+    graph = build_graph()
+    warm_up()
+
+    # Component counters exported as gauges on /metrics
+    register_stats("db_pool", lambda: get_pool().stats())
+    register_stats("availability_cache", availability_cache.stats)
+    register_stats("availability_index", availability_index_stats)
+    register_stats("slot_changes", slot_change_stats)
+    register_stats("fast_router", fast_router_stats)
+    register_stats("handoff_shortcut", handoff_shortcut_stats)
+    register_stats("compaction", compaction_stats)
+    register_stats("llm_governor", lambda: get_llm_governor().stats())
+    register_stats("thread_coordinator", get_thread_coordinator().stats)
+    register_stats("admission", get_admission_controller().stats)
+    if get_llm_cache() is not None:
+        register_stats("llm_cache", get_llm_cache().stats)
+    if hasattr(graph.checkpointer, "stats"):
+        register_stats("checkpointer", graph.checkpointer.stats)
+    logging.info(f'Loaded graph in {time.perf_counter() - started:.2f}s')
+
+
+async def start_graph():
+    global startup_error
+    try:
+        await asyncio.to_thread(load_graph)
+    except Exception as e:
+        startup_error = e
+        logging.exception(f"Could not load the graph: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loader = asyncio.create_task(start_graph())
+    yield
+    loader.cancel()
+    if graph is not None and hasattr(graph.checkpointer, "close"):
+        graph.checkpointer.close()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Hospital Appointment Booking System",
     description="A comprehensive hospital appointment booking system with AI assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Build graph on startup
-graph = build_graph()
-logging.info('Loaded graph')
 
-@app.post("/generate-stream/", response_model=GenerationResponse, responses={500: {"model": ErrorResponse}})
-async def generation_streaming(request: GenerationRequest, thread_id: str = Header('111222', alias="X-THREAD-ID")):
+def require_graph():
+    """Fail fast with 503 while the graph is still loading (or failed to load)"""
+    if graph is None:
+        detail = f"Assistant failed to start: {startup_error}" if startup_error else "Assistant is starting, try again shortly"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+# Nodes whose LLM tokens are forwarded to streaming clients
+ASSISTANT_NODES = {"primary_assistant", "get_info", "appointment_info"}
+
+# Upper bounds for /generate-batch/; LLM calls are additionally capped by the LLM governor
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
+
+
+def message_text(content) -> str:
+    """Flatten message content, which may be a string or a list of content parts"""
+    if isinstance(content, str):
+        return content
+    return ''.join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+def build_answer(values: dict) -> dict:
+    """Extract the dialog state and final answer from the graph state"""
+    dialog_states = values.get('dialog_state', [])
+    dialog_state = dialog_states[-1] if dialog_states else 'primary_assistant'
+    
+    messages = values.get('messages', [])
+    answer = messages[-1].content if messages else ''
+    
+    return {
+        'dialog_state': dialog_state if dialog_state else '',
+        'answer': answer if answer else ''
+    }
+
+
+def turn_input(query: str, thread_id: str, callbacks=None):
+    """Graph input and config for one user message on a thread"""
+    state = {'messages': [HumanMessage(content=query)]}
+    config = {"configurable": {"thread_id": thread_id, "recursion_limit": 10}, "callbacks": callbacks or []}
+    return state, config
+
+
+async def run_turn(query: str, thread_id: str, callbacks=None, idempotency_key=None):
+    """
+    Run one user message through the graph without blocking the event loop.
+    Turns on the same thread run one at a time; an identical request already
+    running, or answered under the same idempotency key, is not run again.
+
+    Returns:
+        (answer, replayed) where `replayed` means the answer was remembered for the key
+    """
+    async def turn():
+        state, config = turn_input(query, thread_id, callbacks)
+        response = await graph.ainvoke(input=state, config=config)
+        logging.info('Generated Answer from Graph')
+        logging.info(f'Graph Response: {response}')
+        answer = build_answer(response)
+        remember_priority(thread_id, answer)
+        return answer
+
+    return await get_thread_coordinator().run(thread_id, query, turn, idempotency_key)
+
+
+async def stream_graph_events(state: dict, config: dict, idempotency_key=None):
+    """
+    Run the graph and yield NDJSON lines as work happens: node transitions,
+    tool results and LLM tokens, followed by a final event with the answer.
+    The thread's turn lock is held until the stream ends. A request identical
+    to a turn already running on the thread (streamed or not) does not run the
+    graph again; it only gets that turn's final event.
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    thread_id = config["configurable"]["thread_id"]
+    query = state["messages"][-1].content
+    coordinator = get_thread_coordinator()
+    flight = coordinator.join(thread_id, query, idempotency_key)
+    leading = flight is None
+    if leading:
+        flight = coordinator.lead(thread_id, query, idempotency_key)
+    try:
+        if not leading:
+            answer = await coordinator.follow(flight)
+            yield json.dumps({"type": "final", **answer}) + "\n"
+            outcome = "ok"
+            return
+        async with coordinator.serialized(thread_id):
+            async for mode, chunk in graph.astream(state, config=config, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    message, metadata = chunk
+                    node = metadata.get("langgraph_node")
+                    if isinstance(message, AIMessageChunk) and node in ASSISTANT_NODES:
+                        text = message_text(message.content)
+                        if text:
+                            yield json.dumps({"type": "token", "node": node, "content": text}) + "\n"
+                    continue
+
+                for node, update in chunk.items():
+                    yield json.dumps({"type": "node", "node": node}) + "\n"
+                    messages = (update or {}).get("messages", []) if isinstance(update, dict) else []
+                    if not isinstance(messages, list):
+                        messages = [messages]
+                    for message in messages:
+                        if isinstance(message, ToolMessage) and message.name:
+                            yield json.dumps({"type": "tool", "node": node, "name": message.name, "content": message_text(message.content)}) + "\n"
+
+            snapshot = await graph.aget_state(config)
+        logging.info('Generated Answer from Graph')
+        answer = build_answer(snapshot.values)
+        remember_priority(thread_id, answer)
+        await coordinator.finish(flight, answer)
+        yield json.dumps({"type": "final", **answer}) + "\n"
+        outcome = "ok"
+    except Exception as e:
+        if leading:
+            coordinator.abandon(flight, e)
+        logging.error(f"Error streaming request: {str(e)}")
+        yield json.dumps({"type": "error", "detail": f"Error processing request: {str(e)}"}) + "\n"
+    finally:
+        if leading:
+            # The client went away mid-stream, which stops the run for the requests that joined it too
+            coordinator.abandon(flight, RuntimeError("The identical request this one joined was stopped before it finished"))
+        REQUEST_SECONDS.labels(endpoint="generate-stream", outcome=outcome).observe(time.perf_counter() - started)
+
+
+async def replay_final(answer: dict):
+    yield json.dumps({"type": "final", **answer}) + "\n"
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Streams an admitted run and frees its admission slot however the response ends"""
+
+    def __init__(self, content, ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+
+def remember_priority(thread_id: str, answer: dict):
+    """Threads left in the middle of a booking are admitted before new conversations on their next turn"""
+    priority = PRIORITY_BOOKING if answer.get("dialog_state") == "appointment_info" else PRIORITY_DEFAULT
+    get_admission_controller().remember_priority(thread_id, priority)
+
+
+@app.post("/generate-stream/", response_model=GenerationResponse,
+          responses={409: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 429: {"model": ErrorResponse},
+                     500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def generation_streaming(
+    request: GenerationRequest,
+    thread_id: str = Header('111222', alias="X-THREAD-ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     """
     Generate response for hospital appointment queries using the AI assistant.
     
     Args:
         request: The generation request containing the user query
         thread_id: Thread ID for session management (passed in X-THREAD-ID header)
+        idempotency_key: Optional key for safe retries; a retry with the same key
+            and query gets the first answer back (`Idempotent-Replayed: true`)
     
     Returns:
-        JSON response with the assistant's answer and dialog state
+        JSON response with the assistant's answer and dialog state, or an
+        NDJSON event stream when `stream` is set in the request. Under load
+        the request is queued; it gets 429 when the queue is full and 503 when
+        it waited too long, both with Retry-After. Threads in the middle of a
+        booking are admitted first.
     """
+    require_graph()
+    started = time.perf_counter()
     try:
         query = request.query
         logging.info(f'Received the Query - {query} & thread_id - {thread_id}')
-        
-        # Prepare input for the graph
-        inputs = [
-            HumanMessage(content=query)
-        ]
-        state = {'messages': inputs}
-        config = {"configurable": {"thread_id": thread_id, "recursion_limit": 10}}
-        
-        # Invoke the graph
-        response = graph.invoke(input=state, config=config)
-        
-        logging.info('Generated Answer from Graph')
-        logging.info(f'Graph Response: {response}')
-        
-        # Extract dialog state and messages
-        dialog_states = response.get('dialog_state', [])
-        dialog_state = dialog_states[-1] if dialog_states else 'primary_assistant'
-        
-        messages = response.get('messages', [])
-        answer = messages[-1].content if messages else ''
-        
-        return JSONResponse({
-            'dialog_state': dialog_state if dialog_state else '',
-            'answer': answer if answer else ''
-        })
-        
+
+        timer = MetricsCallbackHandler()
+        answer = await get_thread_coordinator().remembered(thread_id, query, idempotency_key)
+        if answer is not None:
+            # Replays never touch the graph, so they skip admission
+            if request.stream:
+                return StreamingResponse(replay_final(answer), media_type="application/x-ndjson",
+                                         headers={"Idempotent-Replayed": "true"})
+            REQUEST_SECONDS.labels(endpoint="generate", outcome="ok").observe(time.perf_counter() - started)
+            return JSONResponse(answer, headers={"Idempotent-Replayed": "true"})
+
+        # Wait for a run slot (or be turned away) before any response byte is sent
+        admission = get_admission_controller()
+        ticket = await admission.acquire(admission.priority_of(thread_id))
+        if request.stream:
+            try:
+                state, config = turn_input(query, thread_id, [timer])
+                return AdmittedStreamingResponse(stream_graph_events(state, config, idempotency_key), ticket,
+                                                 media_type="application/x-ndjson")
+            except BaseException:
+                # The response never started, so it will not release the ticket itself
+                ticket.release()
+                raise
+
+        try:
+            answer, replayed = await run_turn(query, thread_id, [timer], idempotency_key)
+        finally:
+            ticket.release()
+
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.labels(endpoint="generate", outcome="ok").observe(elapsed)
+        headers = {"Server-Timing": timer.server_timing(elapsed)} if server_timing_enabled() else {}
+        if replayed:
+            headers["Idempotent-Replayed"] = "true"
+        return JSONResponse(answer, headers=headers)
+
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except AdmissionRejected as e:
+        REQUEST_SECONDS.labels(endpoint="generate", outcome="rejected").observe(time.perf_counter() - started)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ThreadBusyError as e:
+        REQUEST_SECONDS.labels(endpoint="generate", outcome="busy").observe(time.perf_counter() - started)
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
+        REQUEST_SECONDS.labels(endpoint="generate", outcome="error").observe(time.perf_counter() - started)
         logging.error(f"Error processing request: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing request: {str(e)}"
         )
 
+async def run_batch_item(index: int, item, semaphore: asyncio.Semaphore) -> dict:
+    """Run one batch item; failures are reported in its result instead of failing the batch"""
+    thread_id = item.thread_id
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            # Items queue for run slots like chat requests, so a batch cannot crowd them out
+            ticket = await get_admission_controller().acquire(PRIORITY_DEFAULT)
+            try:
+                answer, _ = await run_turn(item.query, thread_id, [MetricsCallbackHandler()], item.idempotency_key)
+            finally:
+                ticket.release()
+            result = {"status": "ok", **answer, "error": None}
+        except AdmissionRejected as e:
+            result = {"status": "error", "answer": "", "dialog_state": "", "error": f"{e} (retry after {e.retry_after} seconds)"}
+        except Exception as e:
+            logging.error(f"Error processing batch item {index} on thread {thread_id}: {str(e)}")
+            result = {"status": "error", "answer": "", "dialog_state": "", "error": f"Error processing request: {str(e)}"}
+        elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.labels(endpoint="generate-batch", outcome=result["status"]).observe(elapsed)
+    return {"index": index, "thread_id": thread_id, **result, "duration_ms": round(elapsed * 1000, 1)}
+
+
+def start_batch(items, concurrency: int):
+    """
+    Start the batch in the background and return (tasks, queue of results in
+    completion order). Items of the same thread run one after another, in
+    request order, so two turns never write the same checkpoint at once.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results = asyncio.Queue()
+    threads = {}
+    for index, item in enumerate(items):
+        threads.setdefault(item.thread_id, []).append((index, item))
+
+    async def run_thread(entries):
+        for index, item in entries:
+            await results.put(await run_batch_item(index, item, semaphore))
+
+    return [asyncio.create_task(run_thread(entries)) for entries in threads.values()], results
+
+
+async def stream_batch_results(tasks, results, total: int):
+    """Yield one NDJSON line per item as it finishes, then a summary line"""
+    failed = 0
+    try:
+        for _ in range(total):
+            result = await results.get()
+            failed += result["status"] == "error"
+            yield json.dumps({"type": "result", **result}) + "\n"
+        yield json.dumps({"type": "summary", "succeeded": total - failed, "failed": failed}) + "\n"
+    finally:
+        # The client went away: stop the items that have not finished
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/generate-batch/", response_model=BatchResponse, responses={413: {"model": ErrorResponse}})
+async def generation_batch(request: BatchRequest):
+    """
+    Run many independent queries concurrently, at most `BATCH_MAX_CONCURRENCY`
+    at a time (or the request's lower `max_concurrency`). Each item also
+    waits for an admission slot like a chat request; an item turned away
+    under load is reported as failed with a retry hint.
+
+    Returns:
+        Per-item results in request order with success and failure counts, or
+        an NDJSON stream of results in completion order when `stream` is set
+    """
+    require_graph()
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} items")
+
+    concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    logging.info(f'Received a batch of {len(request.items)} queries, concurrency {concurrency}')
+    tasks, results = start_batch(request.items, concurrency)
+    if request.stream:
+        return StreamingResponse(stream_batch_results(tasks, results, len(request.items)), media_type="application/x-ndjson")
+
+    await asyncio.gather(*tasks)
+    ordered = sorted((results.get_nowait() for _ in range(len(request.items))), key=lambda result: result["index"])
+    failed = sum(result["status"] == "error" for result in ordered)
+    return {"results": ordered, "succeeded": len(ordered) - failed, "failed": failed}
+
+# Structured endpoints for machine clients: same validation and booking logic as the tools, no LLM involved
+
+@contextmanager
+def timed_request(endpoint: str):
+    """Record the request duration with its outcome: ok, rejected (4xx) or error"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except HTTPException as e:
+        outcome = "rejected" if e.status_code < 500 else "error"
+        raise
+    finally:
+        REQUEST_SECONDS.labels(endpoint=endpoint, outcome=outcome).observe(time.perf_counter() - started)
+
+
+def unknown_doctor(conn, doctor_name: str) -> bool:
+    return doctor_specialization(conn, doctor_name) is None
+
+
+def load_availability(iso_date, doctor_name, specialization):
+    """Free slots as dicts, or None if the doctor or specialization does not exist"""
+    with get_db_connection() as conn:
+        if doctor_name and unknown_doctor(conn, doctor_name):
+            return None
+        if specialization and conn.execute("SELECT 1 FROM specializations WHERE name = ?", [specialization]).fetchone() is None:
+            return None
+        return [dict(row) for row in available_slots(conn, iso_date, doctor_name, specialization)]
+
+
+def write_appointment(write, doctor_name, *args):
+    """Run a booking function on a pooled connection; None if the doctor does not exist"""
+    with get_db_connection() as conn:
+        if unknown_doctor(conn, doctor_name):
+            return None
+        return write(conn, doctor_name, *args)
+
+
+def appointment_response(status: str, request, date) -> dict:
+    return {"status": status, "doctor_name": request.doctor_name, "date": date.date, "patient_id": request.id_number.id}
+
+
+@app.get("/availability", response_model=AvailabilityResponse, responses={404: {"model": ErrorResponse}})
+async def get_availability(date: str, doctor_name: Optional[str] = None, specialization: Optional[str] = None):
+    """
+    Free slots on one day (`date` as DD-MM-YYYY) for a doctor or for every
+    doctor of a specialization, read straight from the database.
+    """
+    with timed_request("availability"):
+        if bool(doctor_name) == bool(specialization):
+            raise HTTPException(status_code=422, detail="Provide either doctor_name or specialization")
+        try:
+            desired_date = DateModel(date=date)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+        doctor_name = " ".join(doctor_name.lower().split()) if doctor_name else None
+
+        slots = await run_in_db_executor(load_availability, to_iso_date(desired_date.date), doctor_name, specialization)
+        if slots is None:
+            raise HTTPException(status_code=404, detail=f"Unknown doctor or specialization: {doctor_name or specialization}")
+        return {"date": desired_date.date, "doctor_name": doctor_name, "specialization": specialization, "slots": slots}
+
+
+def load_patient_appointments(patient_id, start_iso):
+    with get_db_connection() as conn:
+        return [
+            {"doctor_name": row["doctor_name"], "specialization": row["specialization"],
+             "date": f"{from_iso_date(row['date'])} {row['time_slot']}"}
+            for row in patient_appointments(conn, patient_id, start_iso, limit=100)
+        ]
+
+
+@app.get("/appointments", response_model=PatientAppointmentsResponse)
+async def list_appointments(patient_id: int, from_date: Optional[str] = None):
+    """The patient's booked appointments on or after `from_date` (DD-MM-YYYY, today by default)"""
+    with timed_request("appointments"):
+        try:
+            patient = IdentificationNumberModel(id=patient_id)
+            start = DateModel(date=from_date).date if from_date else time.strftime("%d-%m-%Y")
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+        appointments = await run_in_db_executor(load_patient_appointments, patient.id, to_iso_date(start))
+        return {"patient_id": patient.id, "appointments": appointments}
+
+
+@app.post("/appointments", status_code=201, response_model=AppointmentResponse,
+          responses={404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}})
+async def create_appointment(request: AppointmentRequest):
+    """Book a free slot for the patient; 409 if the slot is taken or does not exist"""
+    with timed_request("appointments"):
+        date_part, time_part = convert_datetime_format(request.date.date)
+        booked = await run_in_db_executor(write_appointment, book_slot, request.doctor_name, date_part, time_part, request.id_number.id)
+        if booked is None:
+            raise HTTPException(status_code=404, detail=f"Unknown doctor: {request.doctor_name}")
+        if not booked:
+            raise HTTPException(status_code=409, detail="No available appointments for that particular case")
+        return appointment_response("booked", request, request.date)
+
+
+@app.delete("/appointments", response_model=AppointmentResponse, responses={404: {"model": ErrorResponse}})
+async def delete_appointment(doctor_name: str, date: str, patient_id: int):
+    """
+    Cancel the patient's appointment, identified by query parameters (`date`
+    as DD-MM-YYYY HH:MM) since clients and proxies may drop DELETE bodies;
+    404 if the patient holds no such booking
+    """
+    with timed_request("appointments"):
+        try:
+            request = AppointmentRequest(doctor_name=doctor_name, date={"date": date}, id_number={"id": patient_id})
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+        date_part, time_part = convert_datetime_format(request.date.date)
+        cancelled = await run_in_db_executor(write_appointment, cancel_slot, request.doctor_name, date_part, time_part, request.id_number.id)
+        if not cancelled:
+            raise HTTPException(status_code=404, detail="You don't have any appointment with that specifications")
+        return appointment_response("cancelled", request, request.date)
+
+
+@app.patch("/appointments", response_model=AppointmentResponse,
+           responses={404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}})
+async def update_appointment(request: RescheduleRequest):
+    """Move the patient's appointment to a new slot of the same doctor, atomically"""
+    with timed_request("appointments"):
+        old_date_part, old_time_part = convert_datetime_format(request.old_date.date)
+        new_date_part, new_time_part = convert_datetime_format(request.new_date.date)
+        result = await run_in_db_executor(
+            write_appointment, reschedule_slot, request.doctor_name,
+            old_date_part, old_time_part, new_date_part, new_time_part, request.id_number.id,
+        )
+        if result is None or result == RescheduleResult.NO_APPOINTMENT:
+            raise HTTPException(status_code=404, detail="You don't have any appointment with that specifications")
+        if result == RescheduleResult.SLOT_UNAVAILABLE:
+            raise HTTPException(status_code=409, detail="No available slots in the desired period")
+        return appointment_response("rescheduled", request, request.new_date)
+
 # @app.post("/execute", response_model=GenerationResponse, responses={500: {"model": ErrorResponse}})
 # async def execute_query(request: GenerationRequest, thread_id: str = Header('111222', alias="X-THREAD-ID")):
 #     """
@@ -86,6 +568,21 @@ async def health_check():
     """Health check endpoint for Docker containers"""
     return {"status": "healthy", "service": "hospital_booking_backend"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the graph is built and warmed up, 503 before that or if startup failed"""
+    if graph is not None:
+        return {"status": "ready"}
+    status = "failed" if startup_error else "starting"
+    return JSONResponse(status_code=503, content={"status": status, "detail": str(startup_error or "")})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: node, tool and LLM latencies, token counts, errors and component stats"""
+    # Stats providers query SQLite and wait on the checkpointer lock, so keep them off the event loop
+    body, content_type = await asyncio.to_thread(render_metrics)
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -94,8 +591,13 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "generate_stream": "/generate-stream/",
+            "generate_batch": "/generate-batch/",
+            "availability": "/availability",
+            "appointments": "/appointments",
             "execute": "/execute",
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
@@ -116,11 +618,22 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
     
-    logging.info(f"Starting Hospital Appointment System on {host}:{port}")
+    # WEB_CONCURRENCY > 1 is the production mode: several worker processes sharing the SQLite
+    # stores (checkpoints, thread leases, idempotent answers, slot change log); reload is for development
+    workers = worker_count()
+    reload = os.getenv("RELOAD", "true" if workers == 1 else "false").lower() in ("1", "true", "yes")
+    if reload and workers > 1:
+        logging.warning("RELOAD runs a single process; ignoring WEB_CONCURRENCY")
+        workers = 1
+    if workers > 1 and not shared_state_enabled():
+        logging.warning("SHARED_STATE is off: thread locks, idempotent answers and caches are per worker")
+
+    logging.info(f"Starting Hospital Appointment System on {host}:{port} with {workers} worker(s)")
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=True,
-        log_level="debug"
+        reload=reload,
+        workers=workers,
+        log_level=os.getenv("LOG_LEVEL", "debug" if reload else "info")
     )
\ No newline at end of file
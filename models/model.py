@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import List, Literal, Optional
+from datetime import datetime
 import re
 
 class ErrorResponse(BaseModel):  
@@ -9,12 +10,41 @@ class ErrorResponse(BaseModel):
 
 class GenerationRequest(BaseModel):
     query: str
+    stream: bool = Field(default=False, description="Stream NDJSON events (node transitions, tool results, tokens) instead of one JSON response")
 
 
 class GenerationResponse(BaseModel):
     answer: str
     dialog_state: str
 
+
+class BatchItem(BaseModel):
+    thread_id: str = Field(..., description="Thread ID for session management, as in the X-THREAD-ID header")
+    query: str
+    idempotency_key: Optional[str] = Field(default=None, description="Retries with the same key return the first answer")
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="Lower the server's concurrency cap for this batch")
+    stream: bool = Field(default=False, description="Stream NDJSON results as items finish instead of one JSON response")
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    thread_id: str
+    status: Literal["ok", "error"]
+    answer: str = ""
+    dialog_state: str = ""
+    error: Optional[str] = None
+    duration_ms: float
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
 class DateTimeModel(BaseModel):
     """
     The way the date should be structured and formatted
@@ -25,6 +55,11 @@ class DateTimeModel(BaseModel):
     def check_format_date(cls, v):
         if not re.match(r'^\d{2}-\d{2}-\d{4} \d{2}:\d{2}$', v):
             raise ValueError("The date should be in format 'DD-MM-YYYY HH:MM'")
+        # The pattern alone lets through dates like 32-08-2025 10:00
+        try:
+            datetime.strptime(v, "%d-%m-%Y %H:%M")
+        except ValueError:
+            raise ValueError(f"{v} is not a valid date and time")
         return v
     
 class DateModel(BaseModel):
@@ -37,6 +72,23 @@ class DateModel(BaseModel):
     def check_format_date(cls, v):
         if not re.match(r'^\d{2}-\d{2}-\d{4}$', v):
             raise ValueError("The date must be in the format 'DD-MM-YYYY'")
+        try:
+            datetime.strptime(v, "%d-%m-%Y")
+        except ValueError:
+            raise ValueError(f"{v} is not a valid date")
+        return v
+
+
+class TimeModel(BaseModel):
+    """
+    The way the time of day should be structured and formatted
+    """
+    time: str = Field(..., description="Properly formatted 24-hour time", pattern=r'^\d{2}:\d{2}$')
+
+    @field_validator("time")
+    def check_format_time(cls, v):
+        if not re.match(r'^([01]\d|2[0-3]):[0-5]\d$', v):
+            raise ValueError("The time must be in the format 'HH:MM'")
         return v
 
     
@@ -54,6 +106,58 @@ class IdentificationNumberModel(BaseModel):
             raise ValueError("The ID number should be a 7 or 8 digit integer")
         return v
 
+# REST API (same validation as the tools)
+class AppointmentRequest(BaseModel):
+    doctor_name: str = Field(..., description="The doctor's full name, e.g. 'john doe'")
+    date: DateTimeModel = Field(..., description="The appointment date and time")
+    id_number: IdentificationNumberModel = Field(..., description="The patient's identification number")
+
+    @field_validator("doctor_name")
+    def normalize_doctor_name(cls, v):
+        return " ".join(v.lower().split())
+
+
+class RescheduleRequest(BaseModel):
+    doctor_name: str = Field(..., description="The doctor's full name, e.g. 'john doe'")
+    old_date: DateTimeModel = Field(..., description="The date and time of the current appointment")
+    new_date: DateTimeModel = Field(..., description="The new date and time, with the same doctor")
+    id_number: IdentificationNumberModel = Field(..., description="The patient's identification number")
+
+    @field_validator("doctor_name")
+    def normalize_doctor_name(cls, v):
+        return " ".join(v.lower().split())
+
+
+class AppointmentResponse(BaseModel):
+    status: Literal["booked", "cancelled", "rescheduled"]
+    doctor_name: str
+    date: str
+    patient_id: int
+
+
+class PatientAppointment(BaseModel):
+    doctor_name: str
+    specialization: str
+    date: str = Field(..., description="DD-MM-YYYY HH:MM, as accepted by the appointment endpoints")
+
+
+class PatientAppointmentsResponse(BaseModel):
+    patient_id: int
+    appointments: List[PatientAppointment]
+
+
+class AvailableSlot(BaseModel):
+    doctor_name: str
+    time_slot: str
+
+
+class AvailabilityResponse(BaseModel):
+    date: str
+    doctor_name: Optional[str] = None
+    specialization: Optional[str] = None
+    slots: List[AvailableSlot]
+
+
 # Primary Assistant
 class ToPrimaryBookingAssistant(BaseModel):
     """Transfers work to a specialized assistant to handle patient appointment booking, updates and cancellations."""
@@ -83,14 +187,14 @@ class ToGetInfo(BaseModel):
 class ToAppointmentBookingAssistant(BaseModel):
     """Transfer work to a specialized assistant to handle hotel bookings."""
 
-    date:DateTimeModel = Field(
-        description="The date for setting, cancel or rescheduling appointment"
+    date: Optional[DateTimeModel] = Field(
+        default=None, description="The date for setting, cancel or rescheduling appointment, if the user gave it"
     )
     identification_number: IdentificationNumberModel = Field(
         description="The id number of user."
     )
-    doctor_number: str = Field(
-        description="The name of the doctor"
+    doctor_number: Optional[str] = Field(
+        default=None, description="The name of the doctor, if the user gave it"
     )
     request: str = Field(
         description="Any additional information or requests from the user regarding the hotel booking."
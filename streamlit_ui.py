@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import uuid
+import json
 import os
 
 # Configure Streamlit page
@@ -23,24 +24,32 @@ def generate_uuid() -> str:
     """Generate a unique UUID for session management"""
     return str(uuid.uuid4())
 
-def make_api_call(prompt: str) -> dict:
-    """Calls the API and returns the response as a dictionary."""
+def stream_api_call(prompt: str):
+    """Calls the API in streaming mode and yields the NDJSON events as they arrive."""
     # Get backend URL from environment variable, fallback to localhost for development
     BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:8000')
-    API_URL = f"{BACKEND_URL}/generate-stream"
+    API_URL = f"{BACKEND_URL}/generate-stream/"
     thread_id = st.session_state.thread_id
 
     try:
-        response = requests.post(
+        with requests.post(
             API_URL, 
-            json={"query": prompt}, 
+            json={"query": prompt, "stream": True}, 
             headers={"X-THREAD-ID": thread_id}, 
-            timeout=60.0
-        )
-        response.raise_for_status()  # Raise an error for HTTP errors
-        return response.json()  # Parse response JSON
+            stream=True,
+            timeout=(5.0, 60.0)  # connect timeout, max gap between streamed events
+        ) as response:
+            response.raise_for_status()  # Raise an error for HTTP errors
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+        return
     except requests.exceptions.HTTPError as e:
-        st.error(f"API returned an error: {e.response.status_code}")
+        if e.response.status_code in (429, 503):
+            retry_after = e.response.headers.get("Retry-After", "a few")
+            st.warning(f"The assistant is busy right now. Please try again in {retry_after} seconds.")
+        else:
+            st.error(f"API returned an error: {e.response.status_code}")
     except requests.exceptions.ConnectionError:
         st.error(f"Cannot connect to the server at {BACKEND_URL}. Please make sure the FastAPI server is running.")
     except requests.exceptions.Timeout:
@@ -48,7 +57,7 @@ def make_api_call(prompt: str) -> dict:
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
     
-    return {"answer": "Error retrieving response"}  # Fallback response
+    yield {"type": "final", "answer": "Error retrieving response"}  # Fallback response
 
 # Initialize session state
 if "messages" not in st.session_state:
@@ -85,20 +94,44 @@ if prompt := st.chat_input("Ask about appointments, check availability, or book/
         st.markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    # Call API and display response
+    # Call API and render the response as it streams in
     with st.chat_message("assistant"):
-        response_data = make_api_call(prompt)  # Get API response
+        agent_placeholder = st.empty()
+        answer_placeholder = st.empty()
+        agent_placeholder.markdown(f'**:red[{agent_dict["primary_assistant"]}]**')
+
+        response_data = {}
+        streamed_text = ""
+        streaming_node = None
+        for event in stream_api_call(prompt):
+            event_type = event.get("type")
+            if event_type == "node" and event.get("node") in agent_dict:
+                agent_placeholder.markdown(f'**:red[{agent_dict[event["node"]]}]**')
+            elif event_type == "tool":
+                answer_placeholder.markdown(f'_Running {event.get("name")}..._')
+            elif event_type == "token":
+                # Each assistant streams its own reply; only show the latest one
+                if event.get("node") != streaming_node:
+                    streaming_node = event.get("node")
+                    streamed_text = ""
+                streamed_text += event.get("content", "")
+                answer_placeholder.markdown(streamed_text + "▌")
+            elif event_type == "error":
+                st.error(event.get("detail", "An error occurred"))
+            elif event_type == "final":
+                response_data = event
+
         dialog_state = response_data.get('dialog_state')
         if not dialog_state:
             dialog_state = 'primary_assistant'
-        answer = response_data.get("answer", "No response from API")
+        answer = response_data.get("answer") or streamed_text or "No response from API"
         
         # Display agent type
         agent_name = agent_dict.get(dialog_state, 'supervisor_agent')
-        st.markdown(f'**:red[{agent_name}]**')
+        agent_placeholder.markdown(f'**:red[{agent_name}]**')
         
         # Display answer
-        st.markdown(answer)
+        answer_placeholder.markdown(answer)
         st.session_state.messages.append({"role": "assistant", "content": answer})
         
         # Mark as interacted after first response
@@ -113,6 +146,7 @@ if not st.session_state.has_interacted:
    - "Check availability for Dr. John Doe on 01-08-2025"
    - "Book an appointment with a general dentist"
    - "What slots are available for orthodontist on 05-08-2025?"
+   - "What appointments do I have? My patient ID is 1234567"
 2. **Follow the prompts** to provide any missing information like patient ID when booking
 
 ### Available Services:
@@ -120,5 +154,5 @@ if not st.session_state.has_interacted:
 - 📅 Book appointments  
 - ❌ Cancel appointments
 - 🔄 Reschedule appointments
-- **Fetch appointments details (Not implemented yet)** ❌
+- 📋 List your appointments by patient ID
 """)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class AvailabilityCache:
+    """
+    Size-bounded LRU read-through cache for availability lookups.
+
+    Keys are ("doctor", date, doctor_name) and ("specialization", date,
+    specialization). Writers call `invalidate` after committing; a lookup that
+    was loading while an invalidation happened is returned but not stored, so
+    a stale result can never be cached.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        # Stats
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._discarded = 0
+
+    def get_or_load(self, key, loader):
+        if self.max_entries <= 0:
+            return loader()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation != self._generation:
+                # A booking changed the data while we were reading it
+                self._discarded += 1
+                return value
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value
+
+    def invalidate(self, date, doctor_name, specialization=None):
+        """Drop the cached lookups that include this doctor's slots on `date` (ISO)."""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            self._entries.pop(("doctor", date, doctor_name), None)
+            if specialization:
+                self._entries.pop(("specialization", date, specialization), None)
+            else:
+                # Unknown doctor: be safe and drop every specialization lookup for that date
+                for key in [k for k in self._entries if k[0] == "specialization" and k[1] == date]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "discarded_loads": self._discarded,
+            }
+
+
+availability_cache = AvailabilityCache(max_entries=int(os.getenv("AVAILABILITY_CACHE_SIZE", 1024)))
@@ -0,0 +1,300 @@
+import logging
+import os
+import threading
+import time
+from datetime import date as Date, timedelta
+
+import numpy as np
+
+from toolkit.availability_cache import availability_cache
+
+# One bit per slot of the day, so a doctor-day fits in one machine word
+MAX_SLOTS_PER_DAY = 64
+
+# Summary of what the slots table holds; a change means slots or doctors were added or
+# removed outside the app and the index has to be rebuilt. min/max are index lookups,
+# count(*) walks the smallest index (~15 ms for 3.6M slots), hence the check interval.
+FINGERPRINT_QUERY = """
+SELECT (SELECT min(date) FROM slots), (SELECT max(date) FROM slots), (SELECT count(*) FROM slots),
+       (SELECT count(*) FROM doctors)
+"""
+
+
+def data_fingerprint(conn):
+    return tuple(conn.execute(FINGERPRINT_QUERY).fetchone())
+
+
+class AvailabilityIndex:
+    """
+    In-memory bitmap of free slots: one uint64 per (doctor, day), bit i set
+    when the i-th time slot of the day is free, and a second bitmap of the
+    slots that exist, so a day's booked slots are known too.
+
+    Rows are doctors sorted by name and columns are consecutive days, so
+    range and roster queries are numpy operations over a dense matrix instead
+    of SQLite scans. The booking engine keeps it in sync through `mark`;
+    dates, doctors and slots added outside the app are picked up by comparing
+    `fingerprint` with the database (see `get_availability_index`).
+    """
+
+    def __init__(self, doctors, specializations, start_date, n_days, slot_times):
+        if len(slot_times) > MAX_SLOTS_PER_DAY:
+            raise ValueError(f"At most {MAX_SLOTS_PER_DAY} slots per day are supported, got {len(slot_times)}.")
+        self.doctors = list(doctors)
+        self.doctor_rows = {name: row for row, name in enumerate(self.doctors)}
+        self.specialization_names = sorted(set(specializations))
+        codes = {name: code for code, name in enumerate(self.specialization_names)}
+        self.doctor_specializations = np.array([codes[s] for s in specializations], dtype=np.int32)
+        self.start_date = start_date
+        self.n_days = n_days
+        self.slot_times = list(slot_times)
+        self.slot_bits = {time_slot: bit for bit, time_slot in enumerate(self.slot_times)}
+        self.weekdays = np.array([(start_date + timedelta(days=d)).weekday() for d in range(n_days)], dtype=np.int8)
+        self.fingerprint = None
+        self.checked_at = time.monotonic()
+        self.bits = np.zeros((len(self.doctors), n_days), dtype=np.uint64)
+        self.slots = np.zeros((len(self.doctors), n_days), dtype=np.uint64)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, conn):
+        """Build the index from the slots table in one pass."""
+        fingerprint = data_fingerprint(conn)
+        roster = conn.execute(
+            """SELECT d.name, sp.name FROM doctors d
+            JOIN specializations sp ON sp.id = d.specialization_id ORDER BY d.name"""
+        ).fetchall()
+        slot_times = [row[0] for row in conn.execute("SELECT DISTINCT time_slot FROM slots ORDER BY time_slot")]
+        first, last = fingerprint[:2]
+        start = Date.fromisoformat(first) if first else Date.today()
+        n_days = (Date.fromisoformat(last) - start).days + 1 if last else 0
+
+        index = cls([r[0] for r in roster], [r[1] for r in roster], start, n_days, slot_times)
+        index.fingerprint = fingerprint
+        cursor = conn.execute(
+            """SELECT d.name, s.date, s.time_slot, s.is_available FROM slots s
+            JOIN doctors d ON d.id = s.doctor_id"""
+        )
+        while rows := cursor.fetchmany(10000):
+            rows_idx = np.fromiter((index.doctor_rows[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+            days_idx = np.fromiter(((Date.fromisoformat(r[1]) - start).days for r in rows), dtype=np.int64, count=len(rows))
+            masks = np.fromiter((1 << index.slot_bits[r[2]] for r in rows), dtype=np.uint64, count=len(rows))
+            free = np.fromiter((bool(r[3]) for r in rows), dtype=bool, count=len(rows))
+            np.bitwise_or.at(index.slots, (rows_idx, days_idx), masks)
+            np.bitwise_or.at(index.bits, (rows_idx[free], days_idx[free]), masks[free])
+        return index
+
+    # Coordinates
+
+    def _day(self, iso_date):
+        day = (Date.fromisoformat(iso_date) - self.start_date).days
+        return day if 0 <= day < self.n_days else None
+
+    def covers(self, iso_date):
+        """Whether `iso_date` is within the dates the index was loaded with."""
+        return self._day(iso_date) is not None
+
+    def _day_range(self, start_iso, end_iso):
+        start = max((Date.fromisoformat(start_iso) - self.start_date).days, 0)
+        end = min((Date.fromisoformat(end_iso) - self.start_date).days + 1, self.n_days)
+        return start, max(start, end)
+
+    def _time_mask(self, earliest="00:00", latest="23:59"):
+        mask = 0
+        for time_slot, bit in self.slot_bits.items():
+            if earliest <= time_slot <= latest:
+                mask |= 1 << bit
+        return np.uint64(mask)
+
+    def _rows(self, doctor_name=None, specialization=None):
+        if doctor_name:
+            row = self.doctor_rows.get(doctor_name)
+            return np.array([] if row is None else [row], dtype=np.int64)
+        if specialization not in self.specialization_names:
+            return np.array([], dtype=np.int64)
+        code = self.specialization_names.index(specialization)
+        return np.flatnonzero(self.doctor_specializations == code)
+
+    def _date(self, day):
+        return (self.start_date + timedelta(days=int(day))).isoformat()
+
+    # Updates
+
+    def mark(self, doctor_name, iso_date, time_slot, available):
+        """
+        Record a booking (available=False) or a cancellation (available=True).
+        Returns False when the slot is outside the index, which is then out of date.
+        """
+        row, day, bit = self.doctor_rows.get(doctor_name), self._day(iso_date), self.slot_bits.get(time_slot)
+        if row is None or day is None or bit is None or not int(self.slots[row, day]) >> bit & 1:
+            return False
+        with self._lock:
+            if available:
+                self.bits[row, day] |= np.uint64(1 << bit)
+            else:
+                self.bits[row, day] &= ~np.uint64(1 << bit)
+        return True
+
+    # Queries
+
+    def free_slots(self, doctor_name, iso_date):
+        """Free time slots of one doctor on one day."""
+        row, day = self.doctor_rows.get(doctor_name), self._day(iso_date)
+        if row is None or day is None:
+            return []
+        word = int(self.bits[row, day])
+        return [time_slot for time_slot, bit in self.slot_bits.items() if word >> bit & 1]
+
+    def day_schedules(self, iso_date, doctor_name=None, specialization=None):
+        """
+        {doctor_name: [(time_slot, is_available), ...]} for one day, like
+        `toolkit.tools.day_schedules`: doctors by name, slots by time, booked ones included.
+        """
+        rows, day = self._rows(doctor_name, specialization), self._day(iso_date)
+        if day is None:
+            return {}
+        schedules = {}
+        for row in rows:
+            existing, free = int(self.slots[row, day]), int(self.bits[row, day])
+            if existing:
+                schedules[self.doctors[row]] = [
+                    (time_slot, bool(free >> bit & 1)) for time_slot, bit in self.slot_bits.items() if existing >> bit & 1
+                ]
+        return schedules
+
+    def doctors_free_at(self, time_slot, start_iso, end_iso, specialization=None, weekdays=None):
+        """
+        Doctors (optionally of one specialization) free at `time_slot`, with the
+        dates they are free on, e.g. every orthodontist free at 10:00 on a weekday next month.
+        `weekdays` are Python weekday numbers (Monday is 0).
+        """
+        bit = self.slot_bits.get(time_slot)
+        rows = self._rows(specialization=specialization) if specialization else np.arange(len(self.doctors))
+        start, end = self._day_range(start_iso, end_iso)
+        if bit is None or len(rows) == 0 or start >= end:
+            return {}
+        free = (self.bits[rows, start:end] >> np.uint64(bit)) & np.uint64(1)
+        if weekdays is not None:
+            free = free & np.isin(self.weekdays[start:end], list(weekdays))
+        result = {}
+        for position, day_offset in zip(*np.nonzero(free)):
+            result.setdefault(self.doctors[rows[position]], []).append(self._date(start + day_offset))
+        return result
+
+    def first_free_after(self, doctor_name, iso_date):
+        """The next free (iso_date, time_slot) of a doctor on or after `iso_date`, or None."""
+        row = self.doctor_rows.get(doctor_name)
+        start, end = self._day_range(iso_date, self._date(self.n_days))
+        if row is None or start >= end:
+            return None
+        free_days = np.flatnonzero(self.bits[row, start:end])
+        if len(free_days) == 0:
+            return None
+        day = start + int(free_days[0])
+        value = int(self.bits[row, day])
+        # Bits follow the time order, so the lowest set bit is the earliest free time
+        return self._date(day), self.slot_times[(value & -value).bit_length() - 1]
+
+    def earliest_free(self, start_iso, end_iso, doctor_name=None, specialization=None,
+                      earliest="00:00", latest="23:59", limit=5):
+        """
+        First `limit` free (iso_date, time_slot, doctor_name) tuples in the window,
+        ordered by date, time and doctor name like the SQL search.
+        """
+        rows = self._rows(doctor_name, specialization)
+        start, end = self._day_range(start_iso, end_iso)
+        if len(rows) == 0 or start >= end:
+            return []
+        words = self.bits[rows, start:end] & self._time_mask(earliest, latest)
+        results = []
+        for day_offset in np.flatnonzero(words.any(axis=0)):
+            column = words[:, day_offset]
+            for time_slot, bit in self.slot_bits.items():
+                for position in np.flatnonzero((column >> np.uint64(bit)) & np.uint64(1)):
+                    results.append((self._date(start + day_offset), time_slot, self.doctors[rows[position]]))
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def memory_bytes(self):
+        return self.bits.nbytes + self.slots.nbytes + self.weekdays.nbytes + self.doctor_specializations.nbytes
+
+    def stats(self):
+        return {
+            "doctors": len(self.doctors),
+            "days": self.n_days,
+            "slots_per_day": len(self.slot_times),
+            "free_slots": int(np.unpackbits(self.bits.view(np.uint8)).sum()),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def availability_index_enabled() -> bool:
+    return os.getenv("AVAILABILITY_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def index_check_interval() -> float:
+    return float(os.getenv("AVAILABILITY_INDEX_CHECK_SECONDS", 5))
+
+
+def get_availability_index(conn=None):
+    """
+    Return the process-wide index, loading it on first use when enabled and a
+    connection is given. With a connection the index is also compared with the
+    database, at most every AVAILABILITY_INDEX_CHECK_SECONDS, and rebuilt if
+    slots or doctors were added or removed outside the app since it was loaded.
+    An edit that inserts exactly as many slots as it deletes is not seen;
+    call `reload_availability_index` after one.
+    """
+    global _index
+    if conn is None or not availability_index_enabled():
+        return _index
+    index = _index
+    if index is not None:
+        if time.monotonic() - index.checked_at < index_check_interval():
+            return index
+        fingerprint = data_fingerprint(conn)
+        index.checked_at = time.monotonic()
+        if index.fingerprint == fingerprint:
+            return index
+    with _index_lock:
+        if _index is index:
+            if index is not None:
+                logging.info("Slots or doctors changed outside the app; rebuilding the availability index")
+                # Cached tool output was rendered from the old data too
+                availability_cache.clear()
+            _index = AvailabilityIndex.load(conn)
+        return _index
+
+
+def availability_index_stats():
+    """Stats of the loaded index, or None before it is first used"""
+    index = _index
+    return index.stats() if index is not None else None
+
+
+def reload_availability_index(conn):
+    """Rebuild the index, e.g. after new slots were generated outside the app."""
+    global _index
+    with _index_lock:
+        _index = AvailabilityIndex.load(conn) if availability_index_enabled() else None
+    return _index
+
+
+def mark_slot(doctor_name, iso_date, time_slot, available):
+    """
+    Apply a committed booking change to the index if it is loaded. Waits for a
+    load in progress, so a change is never lost between the load's read and its publication.
+    """
+    global _index
+    with _index_lock:
+        index = _index
+    if index is not None and not index.mark(doctor_name, iso_date, time_slot, available):
+        # A slot the index has never seen: drop it so the next search rebuilds it
+        with _index_lock:
+            if _index is index:
+                _index = None
@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+from enum import Enum
+from toolkit.availability_cache import availability_cache
+from toolkit.availability_index import mark_slot
+from toolkit.slot_changes import slot_change_feed
+from utils.shared_state import shared_state_enabled
+
+
+class RescheduleResult(str, Enum):
+    RESCHEDULED = "rescheduled"
+    SLOT_UNAVAILABLE = "slot_unavailable"
+    NO_APPOINTMENT = "no_appointment"
+
+
+@contextmanager
+def transaction(conn):
+    """
+    Run the block in a write transaction taken with BEGIN IMMEDIATE, so the
+    write lock is held from the start and concurrent writers queue on busy_timeout.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+# Each statement both checks and claims the slot, so two patients can never
+# book the same row: the loser's UPDATE matches nothing and rowcount is 0.
+BOOK_QUERY = """
+UPDATE slots
+SET is_available = 0, patient_id = ?
+WHERE doctor_id = (SELECT id FROM doctors WHERE name = ?) AND date = ? AND time_slot = ? AND is_available = 1
+"""
+
+HELD_QUERY = """
+SELECT 1 FROM slots
+WHERE doctor_id = (SELECT id FROM doctors WHERE name = ?) AND date = ? AND time_slot = ? AND patient_id = ? AND is_available = 0
+"""
+
+CANCEL_QUERY = """
+UPDATE slots
+SET is_available = 1, patient_id = NULL
+WHERE doctor_id = (SELECT id FROM doctors WHERE name = ?) AND date = ? AND time_slot = ? AND patient_id = ? AND is_available = 0
+"""
+
+
+# Doctors never change specialization at runtime, so the lookup is cached per process
+_doctor_specializations = {}
+
+
+def doctor_specialization(conn, doctor_name):
+    if doctor_name not in _doctor_specializations:
+        row = conn.execute(
+            "SELECT sp.name FROM doctors d JOIN specializations sp ON sp.id = d.specialization_id WHERE d.name = ?",
+            [doctor_name],
+        ).fetchone()
+        _doctor_specializations[doctor_name] = row[0] if row else None
+    return _doctor_specializations[doctor_name]
+
+
+def invalidate_availability(conn, doctor_name, *dates):
+    """Drop cached availability for the doctor on the given dates; call after the write commits."""
+    specialization = doctor_specialization(conn, doctor_name)
+    for date in dates:
+        availability_cache.invalidate(date, doctor_name, specialization)
+
+
+def apply_committed(conn, doctor_name, changes):
+    """
+    Bring this process's cache and index up to date after a write commits.
+    `changes` are (date, time_slot, available). With several workers, the
+    change log is replayed instead, so our changes and the other workers'
+    are applied in commit order.
+    """
+    slot_change_feed.prune(conn)
+    if shared_state_enabled():
+        slot_change_feed.sync(conn)
+        return
+    invalidate_availability(conn, doctor_name, *dict.fromkeys(date for date, _, _ in changes))
+    for date, time_slot, available in changes:
+        mark_slot(doctor_name, date, time_slot, available=available)
+
+
+def book_slot(conn, doctor_name, date, time_slot, patient_id):
+    """Book a free slot for the patient. Returns False if the slot is taken or does not exist."""
+    with transaction(conn):
+        booked = conn.execute(BOOK_QUERY, [patient_id, doctor_name, date, time_slot]).rowcount == 1
+    if booked:
+        apply_committed(conn, doctor_name, [(date, time_slot, False)])
+    return booked
+
+
+def cancel_slot(conn, doctor_name, date, time_slot, patient_id):
+    """Release a slot booked by the patient. Returns False if the patient holds no such booking."""
+    with transaction(conn):
+        cancelled = conn.execute(CANCEL_QUERY, [doctor_name, date, time_slot, patient_id]).rowcount == 1
+    if cancelled:
+        apply_committed(conn, doctor_name, [(date, time_slot, True)])
+    return cancelled
+
+
+def reschedule_slot(conn, doctor_name, old_date, old_time_slot, new_date, new_time_slot, patient_id):
+    """
+    Move a booking to a new slot of the same doctor in one transaction.
+
+    The new slot is claimed before the old one is released; if either step
+    fails everything is rolled back, so the patient never ends up without a booking.
+    Moving a booking to the slot it already has succeeds without writing.
+    """
+    if (old_date, old_time_slot) == (new_date, new_time_slot):
+        held = conn.execute(HELD_QUERY, [doctor_name, old_date, old_time_slot, patient_id]).fetchone() is not None
+        return RescheduleResult.RESCHEDULED if held else RescheduleResult.NO_APPOINTMENT
+    with transaction(conn):
+        if conn.execute(BOOK_QUERY, [patient_id, doctor_name, new_date, new_time_slot]).rowcount != 1:
+            conn.rollback()
+            return RescheduleResult.SLOT_UNAVAILABLE
+        if conn.execute(CANCEL_QUERY, [doctor_name, old_date, old_time_slot, patient_id]).rowcount != 1:
+            conn.rollback()
+            return RescheduleResult.NO_APPOINTMENT
+    apply_committed(conn, doctor_name, [(new_date, new_time_slot, False), (old_date, old_time_slot, True)])
+    return RescheduleResult.RESCHEDULED
@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+import time
+
+from toolkit.availability_cache import availability_cache
+from toolkit.availability_index import mark_slot, reload_availability_index
+from utils.db_pool import get_pool
+from utils.shared_state import shared_state_enabled
+
+CHANGES_QUERY = """
+SELECT c.id, d.name, sp.name, c.date, c.time_slot, c.is_available FROM slot_changes c
+JOIN doctors d ON d.id = c.doctor_id
+JOIN specializations sp ON sp.id = d.specialization_id
+WHERE c.id > ?
+ORDER BY c.id
+"""
+
+
+class SlotChangeFeed:
+    """
+    Keeps this process's availability cache and index in step with bookings
+    made by other worker processes.
+
+    The `slot_changes` log is filled by a trigger in every writer's own
+    transaction; `sync` applies the entries after the last one seen, in commit
+    order, so readers call it before serving anything from memory. A process
+    that fell behind the log's retention starts over from an empty cache and a
+    reloaded index.
+    """
+
+    def __init__(self, retention_seconds=24 * 3600, prune_interval=600):
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self.last_id = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        # Stats
+        self._syncs = 0
+        self._applied = 0
+        self._resets = 0
+
+    def sync(self, conn):
+        """Apply the changes committed since the last sync; returns how many were applied"""
+        with self._lock:
+            self._syncs += 1
+            if self.last_id is None:
+                # First use: the cache is empty and the index is loaded after this point
+                self.last_id = conn.execute("SELECT coalesce(max(id), 0) FROM slot_changes").fetchone()[0]
+                return 0
+            rows = conn.execute(CHANGES_QUERY, [self.last_id]).fetchall()
+            if not rows:
+                return 0
+            if rows[0][0] != self.last_id + 1 and self.last_id + 1 < self._first_id(conn):
+                self._reset(conn, rows[-1][0])
+                return len(rows)
+            for change_id, doctor_name, specialization, date, time_slot, is_available in rows:
+                availability_cache.invalidate(date, doctor_name, specialization)
+                mark_slot(doctor_name, date, time_slot, available=bool(is_available))
+            self.last_id = rows[-1][0]
+            self._applied += len(rows)
+            return len(rows)
+
+    def _first_id(self, conn):
+        return conn.execute("SELECT coalesce(min(id), 0) FROM slot_changes").fetchone()[0]
+
+    def _reset(self, conn, last_id):
+        logging.info(f"Slot change log was pruned past entry {self.last_id}; reloading availability")
+        availability_cache.clear()
+        reload_availability_index(conn)
+        self.last_id = last_id
+        self._resets += 1
+
+    def prune(self, conn):
+        """Drop log entries older than the retention, at most once per `prune_interval` seconds"""
+        now = time.time()
+        if now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        with conn:
+            conn.execute("DELETE FROM slot_changes WHERE changed_at < ?", [int(now - self.retention_seconds)])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "last_change_id": self.last_id,
+                "syncs": self._syncs,
+                "applied": self._applied,
+                "resets": self._resets,
+            }
+
+
+slot_change_feed = SlotChangeFeed(retention_seconds=float(os.getenv("SLOT_CHANGES_RETENTION_SECONDS", 24 * 3600)))
+
+
+def sync_slot_changes(conn=None):
+    """Catch up with other workers' bookings before reading availability from memory (no-op with one process)"""
+    if not shared_state_enabled():
+        return
+    if conn is not None:
+        slot_change_feed.sync(conn)
+        return
+    with get_pool().connection() as conn:
+        slot_change_feed.sync(conn)
+
+
+def slot_change_stats():
+    return slot_change_feed.stats() if shared_state_enabled() else None
@@ -0,0 +1,148 @@
+import json
+import os
+from collections import Counter
+
+# compact: slot ranges, doctors with identical schedules grouped; json: the same as structured JSON;
+# verbose: every free slot listed per doctor
+OUTPUT_FORMATS = ("compact", "json", "verbose")
+
+# Doctors named per shared schedule; the rest are only counted
+NAMES_PER_GROUP = 5
+
+
+def tool_output_format() -> str:
+    output_format = os.getenv("TOOL_OUTPUT_FORMAT", "compact").lower()
+    return output_format if output_format in OUTPUT_FORMATS else "compact"
+
+
+def tool_output_max_groups() -> int:
+    return int(os.getenv("TOOL_OUTPUT_MAX_GROUPS", 12))
+
+
+def _minutes(time_slot):
+    hours, minutes = map(int, time_slot.split(":"))
+    return hours * 60 + minutes
+
+
+def convert_to_am_pm(time_str):
+    """Convert 24-hour time format to 12-hour AM/PM format"""
+    hours, minutes = map(int, time_str.split(":"))
+    period = "AM" if hours < 12 else "PM"
+    return f"{hours % 12 or 12}:{minutes:02d} {period}"
+
+
+def slot_step(day):
+    """The most common gap in minutes between a doctor's consecutive slots, free or booked"""
+    gaps = Counter(_minutes(b) - _minutes(a) for (a, _), (b, _) in zip(day, day[1:]))
+    return gaps.most_common(1)[0][0] if gaps else None
+
+
+def free_ranges(day, step):
+    """
+    Collapse a doctor's free slots into (first, last) runs. A run only spans
+    consecutive slots of the doctor's own schedule that are all free and
+    `step` minutes apart, so it never hides a booked slot or a gap in the day.
+    """
+    ranges = []
+    previous = None
+    for time_slot, available in day:
+        if not available:
+            previous = None
+            continue
+        if previous is not None and _minutes(time_slot) - _minutes(previous) == step:
+            ranges[-1][1] = time_slot
+        else:
+            ranges.append([time_slot, time_slot])
+        previous = time_slot
+    return [tuple(r) for r in ranges]
+
+
+def _group_schedules(schedules):
+    """
+    [(doctor names, ranges, step)] for doctors with any free slot, doctors
+    with identical free ranges sharing one entry, most shared schedules first
+    """
+    groups = {}
+    for doctor_name in sorted(schedules):
+        day = schedules[doctor_name]
+        step = slot_step(day)
+        ranges = tuple(free_ranges(day, step))
+        if ranges:
+            groups.setdefault((ranges, step), []).append(doctor_name)
+    grouped = [(doctors, ranges, step) for (ranges, step), doctors in groups.items()]
+    return sorted(grouped, key=lambda group: (-len(group[0]), group[0][0]))
+
+
+def _named(doctors):
+    return doctors[:NAMES_PER_GROUP], len(doctors) - NAMES_PER_GROUP if len(doctors) > NAMES_PER_GROUP else 0
+
+
+def _format_range(first, last):
+    return convert_to_am_pm(first) if first == last else f"{convert_to_am_pm(first)}-{convert_to_am_pm(last)}"
+
+
+def encode_availability(schedules, date, doctor_name=None, specialization=None, output_format=None, max_groups=None):
+    """
+    Render one day of availability for the LLM.
+
+    `schedules` maps each doctor to their ordered (time_slot, is_available)
+    slots for the day. The compact and JSON forms list each distinct schedule
+    once with up to NAMES_PER_GROUP of its doctors, and at most `max_groups`
+    schedules, followed by how many doctors were left out, so their size is
+    bounded however large the roster is.
+    """
+    output_format = output_format or tool_output_format()
+    max_groups = tool_output_max_groups() if max_groups is None else max_groups
+    target = doctor_name or specialization
+
+    if output_format == "verbose":
+        free = {name: [slot for slot, available in day if available] for name, day in sorted(schedules.items())}
+        free = {name: slots for name, slots in free.items() if slots}
+        if not free:
+            return "No availability in the entire day"
+        output = f'Availability for {target} on {date}:\n'
+        if doctor_name:
+            return output + "Available slots: " + ', '.join(convert_to_am_pm(slot) for slot in free[doctor_name])
+        for name, slots in free.items():
+            output += f"{name.title()}: " + ', '.join(convert_to_am_pm(slot) for slot in slots) + '\n'
+        return output
+
+    groups = _group_schedules(schedules)
+    shown = groups[:max_groups] if max_groups > 0 else groups
+    hidden_doctors = sum(len(doctors) for doctors, _, _ in groups[len(shown):])
+    steps = Counter(step for doctors, _, step in groups for _ in doctors if step)
+    common_step = steps.most_common(1)[0][0] if steps else None
+
+    if output_format == "json":
+        result = {"date": date, "doctor_name" if doctor_name else "specialization": target}
+        if common_step:
+            result["slot_minutes"] = common_step
+        result["available"] = []
+        for doctors, ranges, step in shown:
+            names, unnamed = _named(doctors)
+            group = {"doctors": names, "free": [first if first == last else f"{first}-{last}" for first, last in ranges]}
+            if unnamed:
+                group["other_doctors"] = unnamed
+            # A doctor with a single slot that day has no step to report
+            if step and step != common_step:
+                group["slot_minutes"] = step
+            result["available"].append(group)
+        if hidden_doctors:
+            result["more_doctors"] = hidden_doctors
+        return json.dumps(result, separators=(",", ":"))
+
+    if not groups:
+        return "No availability in the entire day"
+    note = f" (slots every {common_step} min; a range includes every slot from its first to its last start time)" if common_step else ""
+    output = f'Availability for {target} on {date}{note}:\n'
+    if doctor_name:
+        _, ranges, _ = groups[0]
+        return output + "Available slots: " + ', '.join(_format_range(first, last) for first, last in ranges)
+    for doctors, ranges, step in shown:
+        names, unnamed = _named(doctors)
+        every = f" (every {step} min)" if step and step != common_step else ""
+        others = f" and {unnamed} other(s)" if unnamed else ""
+        output += ', '.join(name.title() for name in names) + others + ": " + ', '.join(_format_range(f, l) for f, l in ranges) + every + '\n'
+    if hidden_doctors:
+        output += f"...and {hidden_doctors} more doctor(s) with other free slots; ask about a specific doctor to see theirs\n"
+    return output
@@ -1,18 +1,30 @@
-from models.model import DateModel, DateTimeModel, IdentificationNumberModel
-from typing import  Literal
+from models.model import DateModel, DateTimeModel, IdentificationNumberModel, TimeModel
+from typing import  Literal, Optional, get_args
 from langchain_core.tools import tool
-from datetime import datetime
-import sqlite3
-import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from utils.db_pool import get_pool, run_in_db_executor
+from utils.schema import from_iso_date, to_iso_date
+from toolkit.availability_cache import availability_cache
+from toolkit.availability_index import get_availability_index
+from toolkit.booking import RescheduleResult, book_slot, cancel_slot, reschedule_slot
+from toolkit.slot_changes import sync_slot_changes
+from toolkit.slot_encoding import convert_to_am_pm, encode_availability
+from utils.metrics import DB_CONNECTION_SECONDS
 
-# Use absolute path for database
-DB_URL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'hospital.db')
+DoctorName = Literal['kevin anderson','robert martinez','susan davis','daniel miller','sarah wilson','michael green','lisa brown','jane smith','emily johnson','john doe','alex turner']
+Specialization = Literal["general_dentist", "cosmetic_dentist", "prosthodontist", "pediatric_dentist","emergency_dentist","oral_surgeon","orthodontist","general_medicine"]
 
+# Plain tuples of the values above, for code that matches user text against the roster
+DOCTOR_NAMES = get_args(DoctorName)
+SPECIALIZATIONS = get_args(Specialization)
+
+
+@contextmanager
 def get_db_connection():
-    """Get database connection with row factory for better data access"""
-    conn = sqlite3.connect(DB_URL)
-    conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
-    return conn
+    """Borrow a pooled database connection; the time it is held is recorded in the metrics"""
+    with get_pool().connection() as conn, DB_CONNECTION_SECONDS.time():
+        yield conn
 
 
 def convert_datetime_format(dt_str):
@@ -20,206 +32,367 @@ def convert_datetime_format(dt_str):
     # Parse the input datetime string in DD-MM-YYYY HH:MM format
     dt = datetime.strptime(dt_str, "%d-%m-%Y %H:%M")
     
-    # Extract date and time components for separate database columns
-    date_part = dt.strftime("%d-%m-%Y")
+    # Extract date and time components for separate database columns (date is stored as ISO)
+    date_part = dt.strftime("%Y-%m-%d")
     time_part = dt.strftime("%H:%M")
     
     return date_part, time_part
 
 
-def convert_to_am_pm(time_str):
-    """Convert 24-hour time format to 12-hour AM/PM format"""
-    # Split the time string into hours and minutes
-    hours, minutes = map(int, time_str.split(":"))
-    
-    # Determine AM or PM
-    period = "AM" if hours < 12 else "PM"
-    
-    # Convert hours to 12-hour format
-    hours = hours % 12 or 12
-    
-    # Format the output
-    return f"{hours}:{minutes:02d} {period}"
+AVAILABLE_BY_DOCTOR_QUERY = """
+SELECT d.name AS doctor_name, s.time_slot FROM slots s
+JOIN doctors d ON d.id = s.doctor_id
+WHERE d.name = ? AND s.date = ? AND s.is_available = 1
+ORDER BY s.time_slot
+"""
+
+AVAILABLE_BY_SPECIALIZATION_QUERY = """
+SELECT d.name AS doctor_name, s.time_slot FROM specializations sp
+JOIN doctors d ON d.specialization_id = sp.id
+JOIN slots s ON s.doctor_id = d.id
+WHERE sp.name = ? AND s.date = ? AND s.is_available = 1
+ORDER BY d.name, s.time_slot
+"""
+
+
+def available_slots(conn, iso_date, doctor_name=None, specialization=None):
+    """Free (doctor_name, time_slot) rows on one day for a doctor or for every doctor of a specialization"""
+    if doctor_name:
+        return conn.execute(AVAILABLE_BY_DOCTOR_QUERY, [doctor_name, iso_date]).fetchall()
+    return conn.execute(AVAILABLE_BY_SPECIALIZATION_QUERY, [specialization, iso_date]).fetchall()
+
+
+DAY_SCHEDULE_BY_DOCTOR_QUERY = """
+SELECT d.name AS doctor_name, s.time_slot, s.is_available FROM slots s
+JOIN doctors d ON d.id = s.doctor_id
+WHERE d.name = ? AND s.date = ?
+ORDER BY s.time_slot
+"""
+
+DAY_SCHEDULE_BY_SPECIALIZATION_QUERY = """
+SELECT d.name AS doctor_name, s.time_slot, s.is_available FROM specializations sp
+JOIN doctors d ON d.specialization_id = sp.id
+JOIN slots s ON s.doctor_id = d.id
+WHERE sp.name = ? AND s.date = ?
+ORDER BY d.name, s.time_slot
+"""
+
+
+def day_schedules(conn, iso_date, doctor_name=None, specialization=None):
+    """{doctor_name: [(time_slot, is_available), ...]} for one day, booked slots included so free runs can be told apart"""
+    if doctor_name:
+        rows = conn.execute(DAY_SCHEDULE_BY_DOCTOR_QUERY, [doctor_name, iso_date]).fetchall()
+    else:
+        rows = conn.execute(DAY_SCHEDULE_BY_SPECIALIZATION_QUERY, [specialization, iso_date]).fetchall()
+    schedules = {}
+    for row in rows:
+        schedules.setdefault(row['doctor_name'], []).append((row['time_slot'], bool(row['is_available'])))
+    return schedules
+
+
+# Served by idx_slots_patient (patient_id, date, time_slot) without scanning the slots table
+PATIENT_APPOINTMENTS_QUERY = """
+SELECT d.name AS doctor_name, sp.name AS specialization, s.date, s.time_slot FROM slots s
+JOIN doctors d ON d.id = s.doctor_id
+JOIN specializations sp ON sp.id = d.specialization_id
+WHERE s.patient_id = ? AND s.date >= ? AND s.is_available = 0
+ORDER BY s.date, s.time_slot
+LIMIT ?
+"""
+
+
+def patient_appointments(conn, patient_id, start_iso, limit=20):
+    """The patient's booked (doctor_name, specialization, date, time_slot) rows from `start_iso` on"""
+    return conn.execute(PATIENT_APPOINTMENTS_QUERY, [patient_id, start_iso, limit]).fetchall()
+
+
+def with_async_variant(db_tool):
+    """Give a tool a coroutine that runs its body on the database executor, for `ainvoke` callers"""
+    func = db_tool.func
+
+    async def coroutine(*args, **kwargs):
+        return await run_in_db_executor(func, *args, **kwargs)
 
+    db_tool.coroutine = coroutine
+    return db_tool
+
+@with_async_variant
 @tool
-def check_availability_by_doctor(desired_date:DateModel, doctor_name:Literal['kevin anderson','robert martinez','susan davis','daniel miller','sarah wilson','michael green','lisa brown','jane smith','emily johnson','john doe','alex turner']):
+def check_availability_by_doctor(desired_date:DateModel, doctor_name:DoctorName):
     """
     Checking the database if we have availability for the specific doctor.
     The parameters should be mentioned by the user in the query
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    date = to_iso_date(desired_date.date)
     
-    # Query the database for available slots for the specific doctor on the desired date
-    query = """
-    SELECT time_slot FROM doctor_availability 
-    WHERE date = ? AND doctor_name = ? AND is_available = 1
-    ORDER BY time_slot
+    def load():
+        # The doctor's slots on the desired date, from the in-memory index when it is loaded
+        with get_db_connection() as conn:
+            index = get_availability_index(conn)
+            source = index if index is not None and index.covers(date) else None
+            schedules = (source.day_schedules(date, doctor_name=doctor_name) if source
+                         else day_schedules(conn, date, doctor_name=doctor_name))
+        return encode_availability(schedules, desired_date.date, doctor_name=doctor_name)
+
+    # Repeated lookups are served from memory until a booking (in any worker) touches this doctor and date
+    sync_slot_changes()
+    return availability_cache.get_or_load(("doctor", date, doctor_name), load)
+
+@with_async_variant
+@tool
+def check_availability_by_specialization(desired_date:DateModel, specialization:Specialization):
     """
+    Checking the database if we have availability for the specific specialization.
+    The parameters should be mentioned by the user in the query
+    """
+    date = to_iso_date(desired_date.date)
     
-    cursor.execute(query, [desired_date.date, doctor_name])
-    results = cursor.fetchall()
-    conn.close()
-    
-    if len(results) == 0:
-        output = "No availability in the entire day"
+    def load():
+        # The slots of every doctor of the specialization on the desired date
+        with get_db_connection() as conn:
+            index = get_availability_index(conn)
+            source = index if index is not None and index.covers(date) else None
+            schedules = (source.day_schedules(date, specialization=specialization) if source
+                         else day_schedules(conn, date, specialization=specialization))
+        # Doctors sharing a schedule are listed together and the list is capped, so the output stays small on large rosters
+        return encode_availability(schedules, desired_date.date, specialization=specialization)
+
+    sync_slot_changes()
+    return availability_cache.get_or_load(("specialization", date, specialization), load)
+
+
+EARLIEST_SLOTS_QUERY = """
+SELECT d.name AS doctor_name, s.date, s.time_slot FROM slots s
+JOIN doctors d ON d.id = s.doctor_id
+JOIN specializations sp ON sp.id = d.specialization_id
+WHERE s.is_available = 1 AND s.date BETWEEN ? AND ? AND s.time_slot BETWEEN ? AND ?
+"""
+
+
+def earliest_slots(conn, start_iso, end_iso, doctor_name=None, specialization=None, earliest="00:00", latest="23:59", limit=5):
+    """First free slots in a date window, by date, time and doctor name; the SQL counterpart of the availability index"""
+    # One indexed query: slots are walked by the (doctor_id, date, time_slot) primary key and sorted
+    query = EARLIEST_SLOTS_QUERY
+    params = [start_iso, end_iso, earliest, latest]
+    if doctor_name:
+        query += " AND d.name = ?"
+        params.append(doctor_name)
     else:
-        time_slots = [row['time_slot'] for row in results]
-        formatted_slots = [convert_to_am_pm(slot) for slot in time_slots]
-        output = f'Availability for {doctor_name} on {desired_date.date}:\n'
-        output += "Available slots: " + ', '.join(formatted_slots)
+        query += " AND sp.name = ?"
+        params.append(specialization)
+    query += " ORDER BY s.date, s.time_slot, d.name LIMIT ?"
+    params.append(limit)
+    return conn.execute(query, params).fetchall()
+
 
+@with_async_variant
+@tool
+def find_earliest_available_slots(start_date:DateModel, doctor_name:Optional[DoctorName]=None, specialization:Optional[Specialization]=None, end_date:Optional[DateModel]=None, earliest_time:Optional[TimeModel]=None, latest_time:Optional[TimeModel]=None, limit:int=5):
+    """
+    Finding the earliest free slots for a doctor or a specialization across a range of dates.
+    Use it for questions like "when is the next free orthodontist?" instead of checking one date at a time.
+    Either doctor_name or specialization must be given. The search covers 30 days from start_date unless
+    end_date is given, and can be limited to a time of day with earliest_time and latest_time.
+    """
+    if not doctor_name and not specialization:
+        return "Please provide either a doctor name or a specialization"
+    
+    start = datetime.strptime(start_date.date, "%d-%m-%Y")
+    end = datetime.strptime(end_date.date, "%d-%m-%Y") if end_date else start + timedelta(days=30)
+    if end < start:
+        return "The end date must not be before the start date"
+    limit = max(1, min(limit, 20))
+    
+    start_iso, end_iso = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    earliest = earliest_time.time if earliest_time else "00:00"
+    latest = latest_time.time if latest_time else "23:59"
+    
+    with get_db_connection() as conn:
+        sync_slot_changes(conn)
+        index = get_availability_index(conn)
+        if index is not None:
+            # Answered from the in-memory bitmap without touching SQLite
+            results = [
+                {'date': date, 'time_slot': time_slot, 'doctor_name': name}
+                for date, time_slot, name in index.earliest_free(start_iso, end_iso, doctor_name, specialization, earliest, latest, limit)
+            ]
+        else:
+            results = earliest_slots(conn, start_iso, end_iso, doctor_name, specialization, earliest, latest, limit)
+    
+    target = doctor_name if doctor_name else specialization
+    period = f"between {start.strftime('%d-%m-%Y')} and {end.strftime('%d-%m-%Y')}"
+    if len(results) == 0:
+        return f"No availability for {target} {period}"
+    
+    output = f"Earliest available slots for {target} {period}:\n"
+    for row in results:
+        weekday = datetime.strptime(row['date'], "%Y-%m-%d").strftime("%A")
+        output += f"{from_iso_date(row['date'])} ({weekday}) {convert_to_am_pm(row['time_slot'])}: {row['doctor_name'].title()}\n"
     return output
 
+
+FREE_AT_QUERY = """
+SELECT d.name AS doctor_name, s.date FROM slots s
+JOIN doctors d ON d.id = s.doctor_id
+JOIN specializations sp ON sp.id = d.specialization_id
+WHERE s.is_available = 1 AND s.time_slot = ? AND s.date BETWEEN ? AND ?
+"""
+
+
+def free_at_slots(conn, time_slot, start_iso, end_iso, specialization=None, weekdays=None):
+    """{doctor_name: [iso_date, ...]} of doctors free at `time_slot`; the SQL counterpart of `AvailabilityIndex.doctors_free_at`"""
+    query = FREE_AT_QUERY
+    params = [time_slot, start_iso, end_iso]
+    if specialization:
+        query += " AND sp.name = ?"
+        params.append(specialization)
+    if weekdays is not None:
+        # strftime('%w') counts from Sunday; shifted to Python's Monday = 0
+        query += f" AND (CAST(strftime('%w', s.date) AS INTEGER) + 6) % 7 IN ({','.join('?' * len(weekdays))})"
+        params.extend(weekdays)
+    query += " ORDER BY d.name, s.date"
+    result = {}
+    for row in conn.execute(query, params):
+        result.setdefault(row['doctor_name'], []).append(row['date'])
+    return result
+
+
+def next_free_slot(conn, doctor_name, iso_date):
+    """The doctor's next free (iso_date, time_slot) on or after `iso_date`, or None"""
+    index = get_availability_index(conn)
+    if index is not None:
+        return index.first_free_after(doctor_name, iso_date)
+    found = earliest_slots(conn, iso_date, "9999-12-31", doctor_name=doctor_name, limit=1)
+    return (found[0]['date'], found[0]['time_slot']) if found else None
+
+
+# Dates listed per doctor by find_doctors_free_at before the rest are summarised as a count
+FREE_AT_MAX_DATES = 8
+
+
+@with_async_variant
 @tool
-def check_availability_by_specialization(desired_date:DateModel, specialization:Literal["general_dentist", "cosmetic_dentist", "prosthodontist", "pediatric_dentist","emergency_dentist","oral_surgeon","orthodontist","general_medicine"]):
+def find_doctors_free_at(time:TimeModel, start_date:DateModel, specialization:Optional[Specialization]=None, end_date:Optional[DateModel]=None, weekdays_only:bool=False):
     """
-    Checking the database if we have availability for the specific specialization.
-    The parameters should be mentioned by the user in the query
+    Finding every doctor (optionally of one specialization) who is free at one time of day across a range of dates.
+    Use it for questions like "which orthodontists are free at 10:00 on weekdays next month?".
+    The search covers 30 days from start_date unless end_date is given; weekdays_only skips Saturdays and Sundays.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    start = datetime.strptime(start_date.date, "%d-%m-%Y")
+    end = datetime.strptime(end_date.date, "%d-%m-%Y") if end_date else start + timedelta(days=30)
+    if end < start:
+        return "The end date must not be before the start date"
     
-    # Query the database for available slots for the specific specialization on the desired date
-    query = """
-    SELECT doctor_name, time_slot FROM doctor_availability 
-    WHERE date = ? AND specialization = ? AND is_available = 1
-    ORDER BY doctor_name, time_slot
+    start_iso, end_iso = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    weekdays = range(5) if weekdays_only else None
+    
+    with get_db_connection() as conn:
+        sync_slot_changes(conn)
+        index = get_availability_index(conn)
+        if index is not None:
+            free = index.doctors_free_at(time.time, start_iso, end_iso, specialization, weekdays)
+        else:
+            free = free_at_slots(conn, time.time, start_iso, end_iso, specialization, weekdays)
+    
+    target = specialization if specialization else "any doctor"
+    period = f"between {start.strftime('%d-%m-%Y')} and {end.strftime('%d-%m-%Y')}"
+    if weekdays_only:
+        period += " on weekdays"
+    if len(free) == 0:
+        return f"No {target} is free at {convert_to_am_pm(time.time)} {period}"
+    
+    output = f"Free at {convert_to_am_pm(time.time)} {period} ({target}):\n"
+    for name in sorted(free):
+        dates = free[name]
+        listed = ", ".join(from_iso_date(date) for date in dates[:FREE_AT_MAX_DATES])
+        more = f" and {len(dates) - FREE_AT_MAX_DATES} more dates" if len(dates) > FREE_AT_MAX_DATES else ""
+        output += f"{name.title()}: {listed}{more}\n"
+    return output
+
+
+@with_async_variant
+@tool
+def get_patient_appointments(id_number:IdentificationNumberModel, from_date:Optional[DateModel]=None):
     """
+    Listing the patient's booked appointments, with the exact doctor name and DD-MM-YYYY HH:MM of each.
+    Use it before cancelling or rescheduling when the patient does not remember the exact doctor, date or time.
+    Only appointments on or after from_date are listed (today unless given).
+    """
+    start = datetime.strptime(from_date.date, "%d-%m-%Y") if from_date else datetime.now()
+    start_iso = start.strftime("%Y-%m-%d")
     
-    cursor.execute(query, [desired_date.date, specialization])
-    results = cursor.fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        results = patient_appointments(conn, id_number.id, start_iso)
     
     if len(results) == 0:
-        output = "No availability in the entire day"
-    else:
-        # Group results by doctor
-        doctors_slots = {}
-        for row in results:
-            doctor_name = row['doctor_name']
-            time_slot = row['time_slot']
-            if doctor_name not in doctors_slots:
-                doctors_slots[doctor_name] = []
-            doctors_slots[doctor_name].append(time_slot)
-        
-        output = f'Availability for {specialization} on {desired_date.date}:\n'
-        for doctor_name, time_slots in doctors_slots.items():
-            formatted_slots = [convert_to_am_pm(slot) for slot in time_slots]
-            output += f"{doctor_name.title()}: " + ', '.join(formatted_slots) + '\n'
-
+        return f"No appointments found for patient ID {id_number.id} from {start.strftime('%d-%m-%Y')}"
+    
+    output = f"Appointments for patient ID {id_number.id} from {start.strftime('%d-%m-%Y')}:\n"
+    for row in results:
+        weekday = datetime.strptime(row['date'], "%Y-%m-%d").strftime("%A")
+        output += f"{from_iso_date(row['date'])} {row['time_slot']} ({weekday} {convert_to_am_pm(row['time_slot'])}): {row['doctor_name']} ({row['specialization']})\n"
     return output
 
 
+@with_async_variant
 @tool
-def reschedule_appointment(old_date:DateTimeModel, new_date:DateTimeModel, id_number:IdentificationNumberModel, doctor_name:Literal['kevin anderson','robert martinez','susan davis','daniel miller','sarah wilson','michael green','lisa brown','jane smith','emily johnson','john doe','alex turner']):
+def reschedule_appointment(old_date:DateTimeModel, new_date:DateTimeModel, id_number:IdentificationNumberModel, doctor_name:DoctorName):
     """
     Rescheduling an appointment.
     The parameters MUST be mentioned by the user in the query.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Convert datetime formats to separate date and time components
+    old_date_part, old_time_part = convert_datetime_format(old_date.date)
     new_date_part, new_time_part = convert_datetime_format(new_date.date)
     
-    # Check if the new slot is available
-    query = """
-    SELECT * FROM doctor_availability 
-    WHERE date = ? AND time_slot = ? AND doctor_name = ? AND is_available = 1
-    """
-    
-    cursor.execute(query, [new_date_part, new_time_part, doctor_name])
-    result = cursor.fetchone()
-    conn.close()
+    # Claim the new slot and release the old one atomically
+    with get_db_connection() as conn:
+        result = reschedule_slot(conn, doctor_name, old_date_part, old_time_part, new_date_part, new_time_part, id_number.id)
     
-    if result is None:
+    if result == RescheduleResult.SLOT_UNAVAILABLE:
         return "No available slots in the desired period"
+    elif result == RescheduleResult.NO_APPOINTMENT:
+        return "You don´t have any appointment with that specifications"
     else:
-        # Cancel the old appointment and set the new one
-        cancel_result = cancel_appointment.invoke({'date': old_date, 'id_number': id_number, 'doctor_name': doctor_name})
-        if "don´t have any appointment" in cancel_result:
-            return cancel_result
-        
-        set_result = set_appointment.invoke({'desired_date': new_date, 'id_number': id_number, 'doctor_name': doctor_name})
-        if "Successfully done" in set_result:
-            return "Successfully rescheduled for the desired time"
-        else:
-            return set_result
+        return "Successfully rescheduled for the desired time"
 
+@with_async_variant
 @tool
-def cancel_appointment(date:DateTimeModel, id_number:IdentificationNumberModel, doctor_name:Literal['kevin anderson','robert martinez','susan davis','daniel miller','sarah wilson','michael green','lisa brown','jane smith','emily johnson','john doe','alex turner']):
+def cancel_appointment(date:DateTimeModel, id_number:IdentificationNumberModel, doctor_name:DoctorName):
     """
     Canceling an appointment.
     The parameters MUST be mentioned by the user in the query.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Convert datetime format to separate date and time components
     date_part, time_part = convert_datetime_format(date.date)
     
-    # Check if the appointment exists
-    query = """
-    SELECT * FROM doctor_availability 
-    WHERE date = ? AND time_slot = ? AND doctor_name = ? AND patient_id = ? AND is_available = 0
-    """
-    
-    cursor.execute(query, [date_part, time_part, doctor_name, id_number.id])
-    result = cursor.fetchone()
+    # Release the slot only if this patient holds it
+    with get_db_connection() as conn:
+        cancelled = cancel_slot(conn, doctor_name, date_part, time_part, id_number.id)
     
-    if result is None:
-        conn.close()
+    if not cancelled:
         return "You don´t have any appointment with that specifications"
-    else:
-        # Cancel the appointment by setting is_available to True and patient_id to None
-        update_query = """
-        UPDATE doctor_availability 
-        SET is_available = 1, patient_id = NULL 
-        WHERE date = ? AND time_slot = ? AND doctor_name = ? AND patient_id = ?
-        """
-        
-        cursor.execute(update_query, [date_part, time_part, doctor_name, id_number.id])
-        conn.commit()
-        conn.close()
-        
-        return "Successfully cancelled"
+    return "Successfully cancelled"
     
 
+@with_async_variant
 @tool
-def set_appointment(desired_date:DateTimeModel, id_number:IdentificationNumberModel, doctor_name:Literal['kevin anderson','robert martinez','susan davis','daniel miller','sarah wilson','michael green','lisa brown','jane smith','emily johnson','john doe','alex turner']):
+def set_appointment(desired_date:DateTimeModel, id_number:IdentificationNumberModel, doctor_name:DoctorName):
     """
     Set appointment or slot with the doctor.
     The parameters MUST be mentioned by the user in the query.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Convert datetime format to separate date and time components
     date_part, time_part = convert_datetime_format(desired_date.date)
     
-    # Check if the slot is available
-    query = """
-    SELECT * FROM doctor_availability 
-    WHERE date = ? AND time_slot = ? AND doctor_name = ? AND is_available = 1
-    """
+    # Book the slot only if it is still free; otherwise offer the doctor's next free slot
+    with get_db_connection() as conn:
+        booked = book_slot(conn, doctor_name, date_part, time_part, id_number.id)
+        next_free = None if booked else next_free_slot(conn, doctor_name, date_part)
     
-    cursor.execute(query, [date_part, time_part, doctor_name])
-    result = cursor.fetchone()
-    
-    if result is None:
-        conn.close()
+    if not booked:
+        if next_free:
+            next_date, next_time = next_free
+            return f"No available appointments for that particular case. The first free slot with {doctor_name} from that date is {from_iso_date(next_date)} {next_time}"
         return "No available appointments for that particular case"
-    else:
-        # Book the appointment by setting is_available to False and patient_id to the user's ID
-        update_query = """
-        UPDATE doctor_availability 
-        SET is_available = 0, patient_id = ? 
-        WHERE date = ? AND time_slot = ? AND doctor_name = ? AND is_available = 1
-        """
-        
-        cursor.execute(update_query, [id_number.id, date_part, time_part, doctor_name])
-        conn.commit()
-        conn.close()
-        
-        return "Successfully done"
\ No newline at end of file
+    return "Successfully done"
\ No newline at end of file
@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Lower runs first: threads in the middle of a booking, then everything else
+PRIORITY_BOOKING = 0
+PRIORITY_DEFAULT = 1
+
+
+class AdmissionRejected(RuntimeError):
+    """A request turned away instead of queued: 429 when the queue is full, 503 when its wait timed out."""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One admitted graph run; `release` is idempotent"""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        if self._controller is not None:
+            self._controller._finished(time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """
+    Bounds the graph runs in flight so that a spike queues briefly or is
+    turned away early instead of piling onto the LLM and timing out for
+    everyone.
+
+    Up to `max_in_flight` runs are admitted at once. Later requests wait in a
+    queue of at most `max_queue`, served by priority and then arrival, for at
+    most `queue_timeout` seconds. A full queue rejects the request (429),
+    unless it outranks a waiter, in which case the newest lowest-priority
+    waiter is rejected in its place; a request that waits too long gets 503.
+    Both carry a Retry-After estimated from recent run times and the backlog.
+
+    A thread's priority comes from how its last turn in this worker ended
+    (`remember_priority`), so admission itself never reads the checkpoint.
+
+    State belongs to the server's event loop and is per worker process.
+    `max_in_flight` <= 0 disables admission control.
+    """
+
+    def __init__(self, max_in_flight=16, max_queue=32, queue_timeout=15, max_threads=10000):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_threads = max_threads
+        self._priorities = OrderedDict()  # thread_id -> priority, only threads above the default
+        self._in_flight = 0
+        self._waiters = []  # heap of [priority, arrival, future]
+        self._arrivals = itertools.count()
+        self._average_run = None  # seconds, exponentially weighted
+
+        # Stats
+        self._admitted = 0
+        self._queued = 0
+        self._queue_full = 0
+        self._timed_out = 0
+        self._displaced = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def priority_of(self, thread_id) -> int:
+        return self._priorities.get(thread_id, PRIORITY_DEFAULT)
+
+    def remember_priority(self, thread_id, priority):
+        """Priority of the thread's next turn; threads not seen recently get the default"""
+        if priority == PRIORITY_DEFAULT:
+            self._priorities.pop(thread_id, None)
+            return
+        self._priorities[thread_id] = priority
+        self._priorities.move_to_end(thread_id)
+        while len(self._priorities) > self.max_threads:
+            self._priorities.popitem(last=False)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is likely to have drained"""
+        average_run = self._average_run or self.queue_timeout
+        waves = (self._in_flight + len(self._waiters)) / self.max_in_flight
+        return max(1, math.ceil(average_run * max(1.0, waves)))
+
+    async def acquire(self, priority=PRIORITY_DEFAULT) -> Ticket:
+        """Wait for a run slot; raises AdmissionRejected instead of waiting past the limits"""
+        if self.max_in_flight <= 0:
+            return Ticket(None)
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            self._admitted += 1
+            return Ticket(self)
+
+        if len(self._waiters) >= self.max_queue:
+            victim = max(self._waiters, default=None)
+            if victim is None or victim[0] <= priority:
+                self._queue_full += 1
+                raise AdmissionRejected("The assistant is busy, please retry shortly", 429, self.retry_after())
+            self._remove(victim)
+            self._displaced += 1
+            victim[2].set_exception(AdmissionRejected("The assistant is busy, please retry shortly", 429, self.retry_after()))
+
+        entry = [priority, next(self._arrivals), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self._waiters, entry)
+        self._queued += 1
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(entry[2], self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            self._timed_out += 1
+            raise AdmissionRejected(
+                f"No capacity within {self.queue_timeout:g} seconds, please retry later", 503, self.retry_after()
+            ) from None
+        except asyncio.CancelledError:
+            future = entry[2]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # A slot was handed over just as the client went away
+                self._hand_over()
+            else:
+                self._remove(entry)
+            raise
+        waited = time.monotonic() - queued_at
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._admitted += 1
+        return Ticket(self)
+
+    def _remove(self, entry):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _hand_over(self):
+        """Give a finished run's slot to the next waiter, or free it"""
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def _finished(self, elapsed):
+        self._average_run = elapsed if self._average_run is None else 0.8 * self._average_run + 0.2 * elapsed
+        self._hand_over()
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "queued_now": len(self._waiters),
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "rejected_queue_full": self._queue_full,
+            "rejected_timeout": self._timed_out,
+            "displaced": self._displaced,
+            "priority_threads": len(self._priorities),
+            "wait_avg_seconds": self._wait_total / self._queued if self._queued else 0.0,
+            "wait_max_seconds": self._wait_max,
+            "run_avg_seconds": self._average_run or 0.0,
+        }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Return the process-wide controller, configured from the environment."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 16)),
+                    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", 32)),
+                    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 15)),
+                )
+    return _controller
@@ -0,0 +1,460 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from utils.metrics import CHECKPOINT_BYTES
+from utils.shared_state import shared_state_enabled
+
+CHECKPOINT_DB_URL = os.getenv(
+    "CHECKPOINT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'checkpoints.db'),
+)
+
+CHECKPOINT_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+
+-- Last activity per thread, used to expire idle conversations
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_threads_last_seen ON threads (last_seen);
+"""
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer persisted in a local SQLite file, so conversations survive
+    restarts and are visible to every worker process sharing the file.
+
+    Memory stays bounded: only the latest checkpoint of the `hot_threads` most
+    recently used threads is kept in an LRU cache (as serialized bytes), and a
+    background janitor expires threads idle for longer than `ttl_seconds`,
+    trims old checkpoints of live threads and gives free pages back to the OS.
+
+    With `shared` set, other processes write to the same file, so a cached
+    checkpoint is only used after checking that it is still the thread's
+    latest one, with the same pending writes.
+    """
+
+    def __init__(self, db_path=CHECKPOINT_DB_URL, ttl_seconds=7 * 24 * 3600, hot_threads=256,
+                 keep_checkpoints=20, vacuum_interval=600, shared=False, serde=None):
+        super().__init__(serde=serde)
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.hot_threads = hot_threads
+        self.keep_checkpoints = keep_checkpoints
+        self.vacuum_interval = vacuum_interval
+        self.shared = shared
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        # auto_vacuum only takes effect on a new database, so it must precede the schema
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(CHECKPOINT_SCHEMA_SQL)
+        self.conn.commit()
+        self._lock = threading.RLock()
+
+        # thread_id -> (checkpoint row, write rows) of its latest root-namespace checkpoint
+        self._hot = OrderedDict()
+        self._hot_hits = 0
+        self._hot_misses = 0
+        self._hot_stale = 0
+        self._expired_threads = 0
+
+        self._stop = threading.Event()
+        self._janitor = None
+        if vacuum_interval:
+            self._janitor = threading.Thread(target=self._run_janitor, name="checkpoint-janitor", daemon=True)
+            self._janitor.start()
+
+    # Reading
+
+    def _load_row(self, thread_id, checkpoint_ns, checkpoint_id):
+        if checkpoint_id:
+            row = self.conn.execute(
+                """SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata
+                FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?""",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                """SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata
+                FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                ORDER BY checkpoint_id DESC LIMIT 1""",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        if row is None:
+            return None
+        writes = self.conn.execute(
+            """SELECT task_id, channel, type, value FROM writes
+            WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+            ORDER BY task_path, task_id, idx""",
+            (thread_id, checkpoint_ns, row[0]),
+        ).fetchall()
+        return row, writes
+
+    def _to_tuple(self, thread_id, checkpoint_ns, row, writes):
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        cacheable = not checkpoint_id and checkpoint_ns == ""
+
+        with self._lock:
+            if cacheable and thread_id in self._hot and self.shared and not self._is_latest(thread_id, *self._hot[thread_id]):
+                # Another worker moved the thread on
+                del self._hot[thread_id]
+                self._hot_stale += 1
+            if cacheable and thread_id in self._hot:
+                self._hot.move_to_end(thread_id)
+                self._hot_hits += 1
+                row, writes = self._hot[thread_id]
+            else:
+                loaded = self._load_row(thread_id, checkpoint_ns, checkpoint_id)
+                if loaded is None:
+                    return None
+                row, writes = loaded
+                if cacheable:
+                    self._hot_misses += 1
+                    self._remember(thread_id, row, writes)
+
+        return self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints"
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            keys = self.conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, checkpoint_id in keys:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                loaded = self._load_row(thread_id, checkpoint_ns, checkpoint_id)
+            if loaded is None:
+                continue
+            checkpoint_tuple = self._to_tuple(thread_id, checkpoint_ns, *loaded)
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    def _is_latest(self, thread_id, row, writes):
+        latest = self.conn.execute(
+            """SELECT c.checkpoint_id, (SELECT count(*) FROM writes w WHERE w.thread_id = c.thread_id
+                AND w.checkpoint_ns = c.checkpoint_ns AND w.checkpoint_id = c.checkpoint_id)
+            FROM checkpoints c WHERE c.thread_id = ? AND c.checkpoint_ns = ''
+            ORDER BY c.checkpoint_id DESC LIMIT 1""",
+            (thread_id,),
+        ).fetchone()
+        return latest == (row[0], len(writes))
+
+    # Writing
+
+    def _remember(self, thread_id, row, writes):
+        self._hot[thread_id] = (row, writes)
+        self._hot.move_to_end(thread_id)
+        while len(self._hot) > self.hot_threads:
+            self._hot.popitem(last=False)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        row = (checkpoint["id"], parent_checkpoint_id, type_, serialized_checkpoint, metadata_type, serialized_metadata)
+        CHECKPOINT_BYTES.labels(kind="checkpoint").observe(len(serialized_checkpoint) + len(serialized_metadata))
+
+        with self._lock:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO checkpoints
+                (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (thread_id, checkpoint_ns, *row),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, last_seen) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            self.conn.commit()
+            if checkpoint_ns == "":
+                self._remember(thread_id, row, [])
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+             channel, *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        CHECKPOINT_BYTES.labels(kind="writes").observe(sum(len(row[7]) for row in rows))
+
+        with self._lock:
+            self.conn.executemany(
+                f"""INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            self.conn.commit()
+            # Pending writes changed, reload on next read
+            self._hot.pop(thread_id, None)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+            self._hot.pop(thread_id, None)
+
+    # Async variants run the SQLite work off the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # Housekeeping
+
+    def vacuum(self):
+        """Expire idle threads, trim old checkpoints and release free pages."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM threads WHERE last_seen < ?", (cutoff,)
+            )]
+            for thread_id in expired:
+                self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                self.conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+                self._hot.pop(thread_id, None)
+            self._expired_threads += len(expired)
+
+            if self.keep_checkpoints:
+                # Older checkpoints are only needed for time travel, which the app does not use
+                self.conn.execute(
+                    """DELETE FROM checkpoints WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (
+                                PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                            ) AS position FROM checkpoints
+                        ) WHERE position > ?
+                    )""",
+                    (self.keep_checkpoints,),
+                )
+                self.conn.execute(
+                    """DELETE FROM writes WHERE NOT EXISTS (
+                        SELECT 1 FROM checkpoints c
+                        WHERE c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns
+                        AND c.checkpoint_id = writes.checkpoint_id
+                    )"""
+                )
+            self.conn.commit()
+            self.conn.execute("PRAGMA incremental_vacuum")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if expired:
+            logging.info(f"Expired {len(expired)} idle checkpoint threads")
+        return len(expired)
+
+    def _run_janitor(self):
+        while not self._stop.wait(self.vacuum_interval):
+            try:
+                self.vacuum()
+            except sqlite3.Error as e:
+                logging.error(f"Checkpoint vacuum failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            threads = self.conn.execute("SELECT count(*) FROM threads").fetchone()[0]
+            lookups = self._hot_hits + self._hot_misses
+            return {
+                "threads": threads,
+                "hot_threads": len(self._hot),
+                "hot_hits": self._hot_hits,
+                "hot_misses": self._hot_misses,
+                "hot_hit_rate": self._hot_hits / lookups if lookups else 0.0,
+                "hot_stale": self._hot_stale,
+                "expired_threads": self._expired_threads,
+            }
+
+    def close(self):
+        self._stop.set()
+        if self._janitor is not None:
+            self._janitor.join(timeout=5)
+        with self._lock:
+            self.conn.close()
+
+
+def get_checkpointer():
+    """Build the checkpointer selected by CHECKPOINT_BACKEND ('sqlite' or 'memory')."""
+    backend = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+    if backend == "memory":
+        if shared_state_enabled():
+            raise ValueError("CHECKPOINT_BACKEND=memory keeps threads in one process; use sqlite with several workers")
+        return InMemorySaver()
+    if backend == "sqlite":
+        return SqliteCheckpointSaver(
+            db_path=CHECKPOINT_DB_URL,
+            ttl_seconds=float(os.getenv("CHECKPOINT_TTL_SECONDS", 7 * 24 * 3600)),
+            hot_threads=int(os.getenv("CHECKPOINT_HOT_THREADS", 256)),
+            keep_checkpoints=int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", 20)),
+            vacuum_interval=float(os.getenv("CHECKPOINT_VACUUM_INTERVAL", 600)),
+            shared=shared_state_enabled(),
+        )
+    raise ValueError(f"Unknown checkpoint backend: {backend}")
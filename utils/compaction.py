@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Tool calls that hand the dialog to another assistant rather than doing work
+HANDOFF_TOOLS = {"ToGetInfo", "ToAppointmentBookingAssistant", "ToPrimaryBookingAssistant", "CompleteOrEscalate"}
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "compacted_calls": 0, "tokens_before": 0, "tokens_after": 0}
+
+
+def approx_tokens(messages) -> int:
+    """Cheap token estimate (~4 characters per token) used to report savings"""
+    chars = 0
+    for message in messages:
+        content = message.content
+        chars += len(content) if isinstance(content, str) else len(str(content))
+        if isinstance(message, AIMessage) and message.tool_calls:
+            chars += len(str(message.tool_calls))
+    return chars // 4
+
+
+def _arg(value):
+    """Tool arguments arrive either flat or wrapped in their pydantic model, e.g. {'date': '01-08-2025'}"""
+    if isinstance(value, dict):
+        for key in ("date", "id"):
+            if key in value:
+                return value[key]
+    return value
+
+
+def summarize_messages(messages) -> str:
+    """Collapse a run of messages into the facts the assistants need to continue the dialog"""
+    facts = {}
+    actions = []
+    results = {m.tool_call_id: m.content for m in messages if isinstance(m, ToolMessage)}
+
+    for message in messages:
+        if not isinstance(message, AIMessage):
+            continue
+        for tool_call in message.tool_calls:
+            args = tool_call.get("args", {})
+            name = tool_call["name"]
+            for key, fact in (("doctor_name", "doctor"), ("doctor_number", "doctor"),
+                              ("specialization", "specialization"), ("desired_date", "date"),
+                              ("date", "date"), ("new_date", "date"),
+                              ("id_number", "patient id"), ("identification_number", "patient id")):
+                if args.get(key):
+                    facts[fact] = _arg(args[key])
+
+            result = results.get(tool_call["id"], "")
+            if name in ("set_appointment", "cancel_appointment", "reschedule_appointment") and str(result).startswith("Successfully"):
+                when = _arg(args.get("desired_date") or args.get("new_date") or args.get("date"))
+                verb = {"set_appointment": "booked", "cancel_appointment": "cancelled", "reschedule_appointment": "rescheduled to"}[name]
+                actions.append(f"{verb} {args.get('doctor_name')} at {when}")
+
+    user_requests = [m.content for m in messages if isinstance(m, HumanMessage) and isinstance(m.content, str)]
+
+    summary = f"Summary of the {len(user_requests)} earlier turn(s) of this conversation."
+    if facts:
+        summary += " Known details: " + "; ".join(f"{key}: {value}" for key, value in facts.items()) + "."
+    if actions:
+        summary += " Completed: " + "; ".join(actions) + "."
+    if user_requests:
+        summary += f' Last earlier request: "{user_requests[-1][:200]}".'
+    return summary
+
+
+def compact_messages(messages, keep_turns=None):
+    """
+    Keep the last `keep_turns` user turns verbatim and replace everything
+    before them with one summary message. A `keep_turns` of 0 disables compaction.
+
+    Turns are cut at user messages so tool calls are never separated from
+    their results. Handoff instructions injected by the entry nodes are
+    shortened in all but the latest turn.
+    """
+    if keep_turns is None:
+        keep_turns = int(os.getenv("COMPACTION_KEEP_TURNS", 4))
+
+    if keep_turns <= 0:
+        return list(messages)
+
+    human_positions = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if len(human_positions) <= keep_turns:
+        older, recent = [], list(messages)
+    else:
+        cut = human_positions[-keep_turns]
+        older, recent = messages[:cut], list(messages[cut:])
+
+    # Completed handoffs outside the current turn only need a marker
+    handoff_ids = {
+        tc["id"] for m in recent if isinstance(m, AIMessage) for tc in m.tool_calls if tc["name"] in HANDOFF_TOOLS
+    }
+    current_turn = human_positions[-1] - (len(messages) - len(recent)) if human_positions else 0
+    for i, message in enumerate(recent[:max(current_turn, 0)]):
+        if isinstance(message, ToolMessage) and message.tool_call_id in handoff_ids:
+            recent[i] = ToolMessage(content="Handoff completed.", tool_call_id=message.tool_call_id, name=message.name)
+
+    compacted = ([SystemMessage(content=summarize_messages(older))] if older else []) + recent
+
+    before, after = approx_tokens(messages), approx_tokens(compacted)
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["tokens_before"] += before
+        _stats["tokens_after"] += after
+        if before > after:
+            _stats["compacted_calls"] += 1
+    if before > after:
+        logging.info(f"Compacted prompt messages: ~{before} -> ~{after} tokens (saved ~{before - after})")
+
+    return compacted
+
+
+def compaction_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+    return stats
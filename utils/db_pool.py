@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from utils.schema import ensure_schema
+
+# Use absolute path for database, overridable for benchmarks and containers
+DB_URL = os.getenv(
+    "HOSPITAL_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'hospital.db'),
+)
+
+
+class ConnectionPool:
+    """
+    Thread-safe, bounded pool of SQLite connections.
+
+    Connections are opened lazily up to `max_size`, tuned once (WAL journal,
+    busy timeout, synchronous level) and then handed out again, so the
+    per-connection statement cache keeps prepared statements warm across calls.
+    """
+
+    def __init__(self, db_path=DB_URL, max_size=8, timeout=30.0, busy_timeout_ms=5000,
+                 synchronous="NORMAL", cached_statements=256):
+        if max_size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Invalid synchronous level: {synchronous}")
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+        # Stats
+        self._checkouts = 0
+        self._hits = 0
+        self._misses = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is rolled back if left mid-transaction and returned to the pool."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed.")
+
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"Timed out after {self.timeout}s waiting for a database connection.")
+        waited = time.perf_counter() - started
+
+        try:
+            conn = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except BaseException:
+                self._slots.release()
+                raise
+            hit = False
+
+        with self._lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+                self._opened += 1
+
+        try:
+            yield conn
+        finally:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                # A broken connection is dropped instead of going back to the pool
+                conn.close()
+                with self._lock:
+                    self._opened -= 1
+            else:
+                if self._closed:
+                    conn.close()
+                    with self._lock:
+                        self._opened -= 1
+                else:
+                    self._idle.put_nowait(conn)
+            self._slots.release()
+
+    def stats(self):
+        """Return pool counters: hit rate of reused connections and time spent waiting for a slot."""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "max_size": self.max_size,
+                "open_connections": self._opened,
+                "idle_connections": self._idle.qsize(),
+                "checkouts": checkouts,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / checkouts if checkouts else 0.0,
+                "timeouts": self._timeouts,
+                "wait_time_total_s": self._wait_total,
+                "wait_time_avg_s": self._wait_total / checkouts if checkouts else 0.0,
+                "wait_time_max_s": self._wait_max,
+            }
+
+    def close(self):
+        """Close idle connections; connections still borrowed are closed on return."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    db_path=DB_URL,
+                    max_size=int(os.getenv("DB_POOL_SIZE", 8)),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+                    busy_timeout_ms=int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000)),
+                    synchronous=os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+                )
+                # Databases created by older versions are migrated on first use
+                with pool.connection() as conn:
+                    ensure_schema(conn)
+                _pool = pool
+    return _pool
+
+
+_executor = None
+
+
+def get_db_executor():
+    """Return the thread pool that runs blocking database work for async callers."""
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                # Sized like the connection pool, so async callers queue here rather than on the pool
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("DB_POOL_SIZE", 8)),
+                    thread_name_prefix="db",
+                )
+    return _executor
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """Run a blocking database function without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
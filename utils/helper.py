@@ -5,6 +5,7 @@ from langgraph.graph import END
 from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableLambda
 from typing import Callable, Literal
+from utils.metrics import TOOL_ERRORS
 
 class RouteUpdater:
     def __init__(self, tools,update_tool):
@@ -47,6 +48,8 @@ def create_entry_node(assistant_name: str, new_dialog_state: str) -> Callable:
 def handle_tool_error(state) -> dict:
     error = state.get("error")
     tool_calls = state["messages"][-1].tool_calls
+    for tc in tool_calls:
+        TOOL_ERRORS.labels(tool=tc["name"]).inc()
     return {
         "messages": [
             ToolMessage(
@@ -0,0 +1,226 @@
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Literal, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
+from agents.agent_base import State
+from models.model import ToGetInfo
+from toolkit.tools import DOCTOR_NAMES, SPECIALIZATIONS, check_availability_by_doctor, check_availability_by_specialization
+from utils.helper import create_entry_node, route_to_workflow
+
+AVAILABILITY_WORDS = ("availab", "free", "slot", "open", "opening", "when can")
+# Anything that smells like a write or a multi-step request goes to the LLM router
+BOOKING_WORDS = ("book", "cancel", "reschedul", "move my", "change my", "my appointment", "confirm")
+
+# Searches across dates or times of day need find_earliest_available_slots, not one day's availability
+SEARCH_WORDS = ("next", "earliest", "soonest", "first available", "after", "before", "between", "until",
+                "week", "month", "morning", "afternoon", "evening")
+
+DATE_PATTERN = re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b')
+
+# Lexicon of surface forms -> canonical value, built from the tool Literals
+SPECIALIZATION_LEXICON = {}
+for _specialization in SPECIALIZATIONS:
+    SPECIALIZATION_LEXICON[_specialization] = _specialization
+    SPECIALIZATION_LEXICON[_specialization.replace('_', ' ')] = _specialization
+
+DOCTOR_LEXICON = {name: name for name in DOCTOR_NAMES}
+_surnames = [name.split()[-1] for name in DOCTOR_NAMES]
+for _name in DOCTOR_NAMES:
+    _surname = _name.split()[-1]
+    if _surnames.count(_surname) == 1:
+        DOCTOR_LEXICON[f"dr {_surname}"] = _name
+        DOCTOR_LEXICON[f"dr. {_surname}"] = _name
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "fallbacks": 0}
+_shortcut_stats = {"hits": 0, "fallbacks": 0}
+
+# off: the info assistant derives the tool call itself; info: the availability tool runs at the
+# handoff and the info assistant only phrases the answer; direct: the tool output is the answer
+HANDOFF_SHORTCUT_MODES = ("off", "info", "direct")
+
+
+def _find_all(text, lexicon):
+    found = set()
+    for surface, canonical in lexicon.items():
+        if re.search(rf'(?<![\w]){re.escape(surface)}(?![\w])', text):
+            found.add(canonical)
+    return found
+
+
+def extract_availability_request(query: str) -> Optional[dict]:
+    """
+    Return `ToGetInfo` arguments when the query is plainly an availability
+    question with one date and one doctor or specialization, else None.
+    """
+    text = query.lower()
+    if not any(word in text for word in AVAILABILITY_WORDS):
+        return None
+    if any(word in text for word in BOOKING_WORDS):
+        return None
+
+    dates = DATE_PATTERN.findall(text)
+    if len(dates) != 1:
+        return None
+    day, month, year = dates[0]
+    try:
+        desired_date = datetime(int(year), int(month), int(day)).strftime("%d-%m-%Y")
+    except ValueError:
+        return None
+
+    doctors = _find_all(text, DOCTOR_LEXICON)
+    specializations = _find_all(text, SPECIALIZATION_LEXICON)
+    args = {"desired_date": {"date": desired_date}, "request": query}
+    if len(doctors) == 1:
+        args["doctor_name"] = doctors.pop()
+    elif not doctors and len(specializations) == 1:
+        args["specialization"] = specializations.pop()
+    else:
+        return None
+    return args
+
+
+def fast_router(state: State) -> dict:
+    """
+    Route plain availability questions to the info assistant without an LLM call.
+
+    On a confident match this emits the same `ToGetInfo` handoff the primary
+    assistant would have produced; otherwise it leaves the state untouched.
+    """
+    last_message = state["messages"][-1]
+    args = None
+    if isinstance(last_message, HumanMessage) and isinstance(last_message.content, str):
+        args = extract_availability_request(last_message.content)
+
+    with _stats_lock:
+        _stats["hits" if args else "fallbacks"] += 1
+    if args is None:
+        return {}
+
+    return {
+        "messages": [
+            AIMessage(
+                content="",
+                tool_calls=[{"name": ToGetInfo.__name__, "args": args, "id": f"fast_{uuid.uuid4().hex}"}],
+            )
+        ]
+    }
+
+
+def route_fast_router(state: State) -> Literal["enter_get_info", "primary_assistant"]:
+    last_message = state["messages"][-1]
+    if isinstance(last_message, AIMessage) and last_message.tool_calls:
+        return "enter_get_info"
+    return "primary_assistant"
+
+
+def route_to_workflow_with_fast_path(state: State) -> Literal[
+    "fast_router",
+    "appointment_info",
+    "get_info",
+]:
+    """Same as `route_to_workflow`, but new conversations go through the fast router first."""
+    route = route_to_workflow(state)
+    return "fast_router" if route == "primary_assistant" else route
+
+
+def fast_router_enabled() -> bool:
+    return os.getenv("FAST_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def fast_router_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["fallbacks"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
+
+
+def handoff_shortcut_mode() -> str:
+    mode = os.getenv("HANDOFF_SHORTCUT", "off").lower()
+    return mode if mode in HANDOFF_SHORTCUT_MODES else "off"
+
+
+def availability_call(args: dict, query: str = ""):
+    """
+    The availability tool and its arguments for a fully specified `ToGetInfo`
+    handoff about a single day, else None
+    """
+    desired_date = args.get("desired_date")
+    doctor_name, specialization = args.get("doctor_name"), args.get("specialization")
+    if not desired_date or bool(doctor_name) == bool(specialization):
+        return None
+    text = f"{query} {args.get('request', '')}".lower()
+    if any(re.search(rf'\b{word}\b', text) for word in SEARCH_WORDS):
+        return None
+    if doctor_name:
+        return check_availability_by_doctor, {"desired_date": desired_date, "doctor_name": doctor_name}
+    return check_availability_by_specialization, {"desired_date": desired_date, "specialization": specialization}
+
+
+def create_info_shortcut_entry_node(mode: str):
+    """
+    Entry node for the info assistant that runs the availability tool straight
+    from the `ToGetInfo` arguments, saving the LLM call that would re-derive them.
+
+    The tool call and its result are added to the history as if the info
+    assistant had made them. In "direct" mode the result is also the answer
+    and the turn ends. Handoffs that are not fully specified, that look like a
+    search across dates, or whose arguments the tool rejects fall back to the
+    regular entry node.
+    """
+    entry_node = create_entry_node("Get Information Assistant", "get_info")
+
+    def info_shortcut_entry_node(state: State, config: RunnableConfig) -> dict:
+        update = entry_node(state)
+        handoff = state["messages"][-1].tool_calls[0]
+        query = next((m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
+        call = None
+        if handoff["name"] == ToGetInfo.__name__ and isinstance(query, str):
+            call = availability_call(handoff["args"], query)
+        result = None
+        if call is not None:
+            availability_tool, args = call
+            try:
+                result = availability_tool.invoke(args, config)
+            except Exception as e:
+                logging.info(f"Handoff shortcut fell back to the info assistant: {e}")
+
+        with _stats_lock:
+            _shortcut_stats["hits" if result is not None else "fallbacks"] += 1
+        if result is None:
+            return update
+
+        call_id = f"shortcut_{uuid.uuid4().hex}"
+        update["messages"] += [
+            AIMessage(content="", tool_calls=[{"name": availability_tool.name, "args": args, "id": call_id}]),
+            ToolMessage(content=str(result), name=availability_tool.name, tool_call_id=call_id),
+        ]
+        if mode == "direct":
+            update["messages"].append(AIMessage(content=str(result)))
+        return update
+
+    return info_shortcut_entry_node
+
+
+def route_info_shortcut(state: State) -> Literal["get_info", "__end__"]:
+    """End the turn when the shortcut already answered, otherwise let the info assistant reply"""
+    last_message = state["messages"][-1]
+    if isinstance(last_message, AIMessage) and not last_message.tool_calls:
+        return END
+    return "get_info"
+
+
+def handoff_shortcut_stats():
+    with _stats_lock:
+        stats = dict(_shortcut_stats)
+    total = stats["hits"] + stats["fallbacks"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
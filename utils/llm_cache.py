@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+LLM_CACHE_DB_URL = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'llm_cache.db'),
+)
+
+# Responses calling these tools change the database and must always come from the model
+WRITE_TOOLS = {"set_appointment", "cancel_appointment", "reschedule_appointment"}
+
+# Serialized message fields that vary between identical requests
+VOLATILE_FIELDS = {"id", "tool_call_id", "response_metadata", "usage_metadata", "additional_kwargs", "invalid_tool_calls"}
+
+LLM_CACHE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_hit ON llm_cache (last_hit);
+"""
+
+
+def _normalize_text(text, is_user):
+    text = " ".join(text.split())
+    # Users type the same question with different casing and trailing punctuation
+    return text.lower().rstrip("?!. ") if is_user else text
+
+
+def _canonical_message(message):
+    kind = message["id"][-1]
+    kwargs = {k: v for k, v in message.get("kwargs", {}).items() if k not in VOLATILE_FIELDS}
+    content = kwargs.get("content")
+    if isinstance(content, str):
+        kwargs["content"] = _normalize_text(content, kind == "HumanMessage")
+    if kwargs.get("tool_calls"):
+        kwargs["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in kwargs["tool_calls"]]
+    return [kind, kwargs]
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Hash of the model settings (which include the bound tool schemas) and the
+    prompt messages with ids, metadata and whitespace stripped, so the same
+    question asked in different threads maps to the same entry.
+    """
+    try:
+        messages = [_canonical_message(m) for m in json.loads(prompt)]
+        canonical = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    except (ValueError, KeyError, TypeError, IndexError):
+        canonical = prompt
+    return hashlib.sha256(f"{llm_string}\x00{canonical}".encode()).hexdigest()
+
+
+def _writes(tool_calls):
+    return any(tc["name"] in WRITE_TOOLS for tc in tool_calls)
+
+
+class SqliteLLMCache(BaseCache):
+    """
+    LangChain LLM cache stored in a local SQLite file, shared by every
+    assistant and worker process.
+
+    Entries expire after `ttl_seconds` and the least recently used ones are
+    evicted above `max_entries`. Responses that are empty or call a booking
+    tool are never stored or replayed, and replayed tool calls get fresh ids.
+    """
+
+    def __init__(self, db_path=LLM_CACHE_DB_URL, ttl_seconds=3600, max_entries=5000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(LLM_CACHE_SCHEMA_SQL)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+        # Stats
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._skipped = 0
+        self._evictions = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self._misses += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_hit = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.conn.commit()
+
+        generations = []
+        for stored in json.loads(row[0]):
+            if _writes(stored["tool_calls"]):
+                # Never replay a write, whatever ended up in the file
+                with self._lock:
+                    self._misses += 1
+                return None
+            message = AIMessage(
+                content=stored["content"],
+                tool_calls=[{"name": tc["name"], "args": tc["args"], "id": str(uuid.uuid4())} for tc in stored["tool_calls"]],
+                response_metadata={"cache_hit": True},
+            )
+            generations.append(ChatGeneration(message=message))
+        with self._lock:
+            self._hits += 1
+        return generations
+
+    def contains(self, prompt: str, llm_string: str) -> bool:
+        """Whether `lookup` would replay a response; counted as neither a hit nor a miss"""
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            row = self.conn.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return False
+        return not any(_writes(stored["tool_calls"]) for stored in json.loads(row[0]))
+
+    def update(self, prompt: str, llm_string: str, return_val: list) -> None:
+        stored = []
+        for generation in return_val:
+            message = getattr(generation, "message", None)
+            tool_calls = getattr(message, "tool_calls", None) or []
+            if message is None or _writes(tool_calls) or not (tool_calls or message.content):
+                with self._lock:
+                    self._skipped += 1
+                return
+            stored.append({
+                "content": message.content,
+                "tool_calls": [{"name": tc["name"], "args": tc["args"]} for tc in tool_calls],
+            })
+
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created, last_hit, hits) VALUES (?, ?, ?, ?, 0)",
+                (key, json.dumps(stored), now, now),
+            )
+            self._stores += 1
+            self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then the least recently used ones above `max_entries` (lock held)."""
+        evicted = self.conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+        excess = self.conn.execute("SELECT count(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            evicted += self.conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_hit LIMIT ?)", (excess,)
+            ).rowcount
+        self._evictions += evicted
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_cache")
+            self.conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "stores": self._stores,
+                "skipped_responses": self._skipped,
+                "evictions": self._evictions,
+            }
+
+
+def cache_probe(prompt_template, chat_model, bound_kwargs):
+    """
+    Callable telling whether `prompt_template | chat_model.bind(**bound_kwargs)`
+    would answer an input from the response cache, keyed exactly as the chat
+    model looks it up, so the LLM governor can let replays through without
+    taking a slot. None when the model has no SqliteLLMCache.
+    """
+    cache = getattr(chat_model, "cache", None)
+    if not isinstance(cache, SqliteLLMCache):
+        return None
+
+    def probe(input):
+        messages = prompt_template.invoke(input).to_messages()
+        normalized = [m.model_copy(update={"id": None}) if getattr(m, "id", None) is not None else m for m in messages]
+        return cache.contains(dumps(normalized), chat_model._get_llm_string(**bound_kwargs))
+
+    return probe
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def llm_cache_enabled() -> bool:
+    return os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def get_llm_cache():
+    """Return the process-wide response cache, or None unless LLM_CACHE_ENABLED is set."""
+    global _cache
+    if not llm_cache_enabled():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SqliteLLMCache(
+                    db_path=LLM_CACHE_DB_URL,
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 3600)),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000)),
+                )
+                logging.info(f"LLM response cache enabled at {LLM_CACHE_DB_URL}")
+    return _cache
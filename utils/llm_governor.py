@@ -0,0 +1,428 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from utils.metrics import LLM_GOVERNOR_EVENTS, LLM_QUEUE_SECONDS
+
+# Error class names and status codes that are worth another attempt. Generic API error
+# classes are left to their status code, since they also cover bad requests and auth errors.
+RETRYABLE_ERROR_NAMES = ("RateLimit", "ResourceExhausted", "ServiceUnavailable", "InternalServerError",
+                         "DeadlineExceeded", "Timeout", "Connection")
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(RuntimeError):
+    """The governor gave up on an LLM call; `reason` says why (queue_timeout, rate_limited, deadline, retries_exhausted)."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, FutureTimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS_CODES:
+        return True
+    return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+class TokenBucket:
+    """Request rate limiter: `rate` calls per second with bursts of up to `burst` calls."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """
+        Take a token and return how long to wait before using it, or None
+        (taking nothing) if that wait would be longer than `max_wait`.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def available(self):
+        with self._lock:
+            return min(self.burst, self._tokens + (time.monotonic() - self._updated) * self.rate)
+
+
+class _Waiter:
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.granted = False
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+
+class FairSemaphore:
+    """
+    Bounded semaphore shared by threads and coroutines that hands permits out
+    in arrival order. A released permit goes straight to the oldest waiter, so
+    a waiter that gives up (timeout or cancellation) either never got it or
+    passes it on.
+    """
+
+    def __init__(self, value):
+        self.limit = value
+        self._value = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        # Caller holds the lock
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return True
+        return False
+
+    def acquire(self, timeout=None):
+        with self._lock:
+            if self._try_take():
+                return True
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        if waiter.event.wait(timeout):
+            return True
+        return self._abandon(waiter)
+
+    async def aacquire(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_take():
+                return True
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._abandon(waiter)
+        except BaseException:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    def _abandon(self, waiter):
+        """Stop waiting; returns True if the permit was granted in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                if self._value >= self.limit:
+                    raise ValueError("FairSemaphore released too many times")
+                self._value += 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        if waiter.event is not None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+
+    def available(self):
+        with self._lock:
+            return self._value
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMGovernor:
+    """
+    Shared budget for every chat model call in the process.
+
+    A call waits for a global slot and a per-provider slot (at most
+    `queue_timeout` seconds) and for a token from the provider's rate bucket,
+    then runs with a per-attempt deadline. Transient failures are retried up
+    to `max_retries` times with full-jitter exponential backoff, and nothing
+    waits beyond `total_budget` seconds: when the budget cannot be met the call
+    fails fast with `LLMUnavailableError` instead of queueing.
+    """
+
+    def __init__(self, max_concurrency=16, provider_concurrency=8, rate_per_minute=0, burst=10,
+                 call_timeout=60.0, total_budget=120.0, queue_timeout=10.0, max_retries=2,
+                 backoff_base=0.5, backoff_max=8.0):
+        self.max_concurrency = max_concurrency
+        self.provider_concurrency = provider_concurrency
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.call_timeout = call_timeout
+        self.total_budget = total_budget
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._global = FairSemaphore(max_concurrency)
+        self._providers = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        # Sync calls run here so they can be abandoned at their deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+
+        # Stats
+        self._in_flight = 0
+        self._waiting = 0
+        self._calls = 0
+        self._retries = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._failures = 0
+        self._cache_bypasses = 0
+
+    def _provider(self, provider):
+        with self._lock:
+            if provider not in self._providers:
+                self._providers[provider] = FairSemaphore(self.provider_concurrency)
+                self._buckets[provider] = TokenBucket(self.rate_per_minute / 60, self.burst)
+            return self._providers[provider], self._buckets[provider]
+
+    def _count(self, field, provider, event):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+        LLM_GOVERNOR_EVENTS.labels(provider=provider, event=event).inc()
+
+    def _reject(self, provider, reason, message):
+        self._count("_rejected", provider, reason)
+        return LLMUnavailableError(reason, message)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # Admission
+
+    def _admit(self, provider, deadline):
+        """Block until the call may start; returns the provider semaphore to release afterwards."""
+        semaphore, bucket = self._provider(provider)
+        started = time.monotonic()
+        queue_deadline = min(deadline, started + self.queue_timeout)
+        held = []
+        with self._lock:
+            self._waiting += 1
+        try:
+            for sem in (self._global, semaphore):
+                if not sem.acquire(timeout=max(0.0, queue_deadline - time.monotonic())):
+                    raise self._reject(provider, "queue_timeout", f"Too many {provider} calls in flight.")
+                held.append(sem)
+            wait = bucket.reserve(max_wait=deadline - time.monotonic())
+            if wait is None:
+                raise self._reject(provider, "rate_limited", f"{provider} rate limit leaves no time for this call.")
+            time.sleep(wait)
+        except BaseException:
+            for acquired in held:
+                acquired.release()
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        LLM_QUEUE_SECONDS.labels(provider=provider).observe(time.monotonic() - started)
+        return semaphore
+
+    async def _aadmit(self, provider, deadline):
+        """Async `_admit`: waits in the same FIFO queues without blocking the event loop."""
+        semaphore, bucket = self._provider(provider)
+        started = time.monotonic()
+        queue_deadline = min(deadline, started + self.queue_timeout)
+        held = []
+        with self._lock:
+            self._waiting += 1
+        try:
+            for sem in (self._global, semaphore):
+                if not await sem.aacquire(timeout=max(0.0, queue_deadline - time.monotonic())):
+                    raise self._reject(provider, "queue_timeout", f"Too many {provider} calls in flight.")
+                held.append(sem)
+            wait = bucket.reserve(max_wait=deadline - time.monotonic())
+            if wait is None:
+                raise self._reject(provider, "rate_limited", f"{provider} rate limit leaves no time for this call.")
+            await asyncio.sleep(wait)
+        except BaseException:
+            # Also on cancellation: a caller that stops waiting must not keep its permits
+            for acquired in held:
+                acquired.release()
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        LLM_QUEUE_SECONDS.labels(provider=provider).observe(time.monotonic() - started)
+        return semaphore
+
+    def _release(self, semaphore):
+        with self._lock:
+            self._in_flight -= 1
+        semaphore.release()
+        self._global.release()
+
+    # Calls
+
+    def invoke(self, runnable, input, config=None, provider="llm", **kwargs):
+        deadline = time.monotonic() + self.total_budget
+        for attempt in range(self.max_retries + 1):
+            semaphore = self._admit(provider, deadline)
+            with self._lock:
+                self._in_flight += 1
+                self._calls += 1
+            timeout = min(self.call_timeout, deadline - time.monotonic())
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, runnable.invoke, input, config, **kwargs)
+            # The slot is held until the call really ends, even if we stop waiting for it
+            future.add_done_callback(lambda _, s=semaphore: self._release(s))
+            try:
+                return future.result(timeout=max(0.0, timeout))
+            except Exception as e:
+                error = e
+            if not self._should_retry(error, provider, attempt, deadline):
+                break
+            time.sleep(self._backoff(attempt))
+        raise self._give_up(error, provider)
+
+    async def ainvoke(self, runnable, input, config=None, provider="llm", **kwargs):
+        deadline = time.monotonic() + self.total_budget
+        for attempt in range(self.max_retries + 1):
+            semaphore = await self._aadmit(provider, deadline)
+            with self._lock:
+                self._in_flight += 1
+                self._calls += 1
+            timeout = min(self.call_timeout, deadline - time.monotonic())
+            try:
+                return await asyncio.wait_for(runnable.ainvoke(input, config, **kwargs), timeout=max(0.0, timeout))
+            except Exception as e:
+                error = e
+            finally:
+                self._release(semaphore)
+            if not self._should_retry(error, provider, attempt, deadline):
+                break
+            await asyncio.sleep(self._backoff(attempt))
+        raise self._give_up(error, provider)
+
+    def _should_retry(self, error, provider, attempt, deadline):
+        timed_out = isinstance(error, (TimeoutError, asyncio.TimeoutError, FutureTimeoutError))
+        if timed_out:
+            self._count("_timeouts", provider, "timeout")
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return False
+        # Only retry when the backoff still leaves a realistic amount of budget
+        if deadline - time.monotonic() < self.backoff_base * 2 ** attempt + 1:
+            return False
+        self._count("_retries", provider, "retry")
+        logging.warning(f"LLM call to {provider} failed ({type(error).__name__}), retrying (attempt {attempt + 2})")
+        return True
+
+    def _give_up(self, error, provider):
+        self._count("_failures", provider, "failure")
+        if not is_retryable(error):
+            # Bad requests, auth errors and the like are bugs, not capacity problems
+            return error
+        reason = "deadline" if isinstance(error, (TimeoutError, asyncio.TimeoutError, FutureTimeoutError)) else "retries_exhausted"
+        unavailable = LLMUnavailableError(reason, f"LLM call to {provider} failed: {type(error).__name__}: {error}")
+        unavailable.__cause__ = error
+        return unavailable
+
+    def wrap(self, runnable, provider="llm", cache_probe=None):
+        return GovernedRunnable(runnable, self, provider, cache_probe)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "calls": self._calls,
+                "retries": self._retries,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "failures": self._failures,
+                "cache_bypasses": self._cache_bypasses,
+            }
+            buckets = dict(self._buckets)
+        if self.rate_per_minute > 0:
+            for provider, bucket in buckets.items():
+                stats[f"rate_tokens_{provider}"] = bucket.available()
+        return stats
+
+
+class GovernedRunnable(Runnable):
+    """
+    A runnable whose calls go through the LLM governor. Inputs that
+    `cache_probe` says are in the response cache are run directly: they are
+    replayed without calling the provider, so they take no slot or rate token.
+    """
+
+    def __init__(self, runnable: Runnable, governor: LLMGovernor, provider: str, cache_probe=None):
+        self.runnable = runnable
+        self.governor = governor
+        self.provider = provider
+        self.cache_probe = cache_probe
+
+    def _cached(self, input):
+        try:
+            cached = self.cache_probe(input)
+        except Exception as e:
+            logging.info(f"LLM cache probe failed, calling {self.provider} through the governor: {e}")
+            return False
+        if cached:
+            self.governor._count("_cache_bypasses", self.provider, "cache_hit")
+        return cached
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs):
+        if self.cache_probe is not None and self._cached(input):
+            return self.runnable.invoke(input, config, **kwargs)
+        return self.governor.invoke(self.runnable, input, config, provider=self.provider, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs):
+        if self.cache_probe is not None and await asyncio.to_thread(self._cached, input):
+            return await self.runnable.ainvoke(input, config, **kwargs)
+        return await self.governor.ainvoke(self.runnable, input, config, provider=self.provider, **kwargs)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_llm_governor():
+    """Return the process-wide governor, configured from the LLM_* environment variables."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = LLMGovernor(
+                    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 16)),
+                    provider_concurrency=int(os.getenv("LLM_PROVIDER_CONCURRENCY", 8)),
+                    rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", 0)),
+                    burst=int(os.getenv("LLM_RATE_BURST", 10)),
+                    call_timeout=float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", 60)),
+                    total_budget=float(os.getenv("LLM_TOTAL_BUDGET_SECONDS", 120)),
+                    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 10)),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+                )
+    return _governor
@@ -1,23 +1,40 @@
+import importlib
 import os
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.llm_cache import get_llm_cache
 load_dotenv()
 
+# provider -> (module, chat model class, default model, retry options giving a single attempt)
+# Provider packages are heavy and pull in network clients, so only the configured one is imported.
+PROVIDERS = {
+    "google": ("langchain_google_genai", "ChatGoogleGenerativeAI", "gemini-2.5-flash", {"max_retries": 1}),
+    "groq": ("langchain_groq", "ChatGroq", "llama-3.3-70b-versatile", {"max_retries": 0}),
+    "openai": ("langchain_openai", "ChatOpenAI", "gpt-4o-mini", {"max_retries": 0}),
+}
+
+
 class LLMModel:
-    def __init__(self, model_name="gemini-2.5-flash"):
-        if not model_name:
+    def __init__(self, model_name=None, provider=None):
+        self.provider = (provider or os.getenv("LLM_PROVIDER", "google")).lower()
+        if self.provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {self.provider}. Choose one of {', '.join(PROVIDERS)}.")
+        module_name, class_name, default_model, single_attempt = PROVIDERS[self.provider]
+
+        self.model_name = model_name or os.getenv("LLM_MODEL", default_model)
+        if not self.model_name:
             raise ValueError("Model is not defined.")
-        self.model_name = model_name
-        self.openai_model=ChatGoogleGenerativeAI(model=self.model_name)
-        
+
+        chat_model_class = getattr(importlib.import_module(module_name), class_name)
+        # One attempt per call: retries and backoff are owned by the LLM governor.
+        # The response cache is opt-in (LLM_CACHE_ENABLED) and never replays booking writes.
+        self.openai_model = chat_model_class(model=self.model_name, cache=get_llm_cache(), **single_attempt)
+
     def get_model(self):
         return self.openai_model
 
 if __name__ == "__main__":
-    llm_instance = LLMModel()  
+    llm_instance = LLMModel()
     llm_model = llm_instance.get_model()
     response=llm_model.invoke("hi")
 
-    print(response)
\ No newline at end of file
+    print(response)
@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_SECONDS = Histogram(
+    "hospital_request_duration_seconds", "End-to-end time of assistant requests",
+    ["endpoint", "outcome"], buckets=LATENCY_BUCKETS,
+)
+NODE_SECONDS = Histogram(
+    "hospital_graph_node_duration_seconds", "Time spent in each LangGraph node",
+    ["node"], buckets=LATENCY_BUCKETS,
+)
+TOOL_SECONDS = Histogram(
+    "hospital_tool_duration_seconds", "Time spent in each tool call",
+    ["tool", "status"], buckets=LATENCY_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "hospital_llm_call_duration_seconds", "Time spent in chat model calls, by calling node",
+    ["node", "status"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "hospital_llm_tokens", "Tokens reported by the chat model, by calling node",
+    ["node", "kind"],
+)
+ASSISTANT_RETRIES = Counter(
+    "hospital_assistant_empty_retries", "Assistant calls repeated because the model returned nothing usable",
+    ["node"],
+)
+ASSISTANT_FALLBACKS = Counter(
+    "hospital_assistant_fallbacks", "Assistant turns answered with the fallback message",
+    ["node", "reason"],
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "hospital_llm_queue_seconds", "Time LLM calls wait for a concurrency slot and rate limit token",
+    ["provider"], buckets=LATENCY_BUCKETS,
+)
+LLM_GOVERNOR_EVENTS = Counter(
+    "hospital_llm_governor_events", "LLM governor retries, timeouts, rejections, failures and cache bypasses",
+    ["provider", "event"],
+)
+TOOL_ERRORS = Counter(
+    "hospital_tool_errors", "Tool calls answered by handle_tool_error",
+    ["tool"],
+)
+DB_CONNECTION_SECONDS = Histogram(
+    "hospital_db_connection_seconds", "Time a pooled SQLite connection is held by a tool",
+    buckets=LATENCY_BUCKETS,
+)
+CHECKPOINT_BYTES = Histogram(
+    "hospital_checkpoint_size_bytes", "Serialized size of stored checkpoints and pending writes",
+    ["kind"], buckets=SIZE_BUCKETS,
+)
+
+
+# component -> callable returning that component's stats() dict (or None)
+_stats_providers = {}
+
+
+def register_stats(component, provider):
+    """Expose a component's numeric stats() entries as gauges on every scrape."""
+    _stats_providers[component] = provider
+
+
+class StatsCollector:
+    def collect(self):
+        family = GaugeMetricFamily(
+            "hospital_component_stats", "Runtime counters reported by the app's components",
+            labels=["component", "stat"],
+        )
+        for component, provider in list(_stats_providers.items()):
+            try:
+                stats = provider()
+            except Exception as e:
+                logging.warning(f"Could not collect {component} stats: {e}")
+                continue
+            for key, value in (stats or {}).items():
+                if isinstance(value, (int, float)):
+                    family.add_metric([component, key], float(value))
+        yield family
+
+
+REGISTRY.register(StatsCollector())
+
+
+def render_metrics():
+    """Return the Prometheus exposition body and its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def server_timing_enabled() -> bool:
+    return os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def _token_usage(response):
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records node, tool and LLM call latencies and token counts into the
+    Prometheus metrics. One handler is created per request, so it also keeps
+    that request's time per node and per call type for the Server-Timing header.
+    """
+
+    # Timing must be taken where the event happens, not on an executor thread
+    run_inline = True
+
+    def __init__(self):
+        self._running = {}
+        self._lock = threading.Lock()
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def _start(self, run_id, kind, name):
+        with self._lock:
+            self._running[run_id] = (kind, name, time.perf_counter())
+
+    def _finish(self, run_id):
+        with self._lock:
+            started = self._running.pop(run_id, None)
+        if started is None:
+            return None
+        kind, name, start = started
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.totals[name if kind == "node" else kind] += elapsed
+            self.counts[name if kind == "node" else kind] += 1
+        return name, elapsed
+
+    # Graph nodes
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables nested inside it
+        if node and kwargs.get("name") == node:
+            self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished:
+            NODE_SECONDS.labels(node=finished[0]).observe(finished[1])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.on_chain_end(None, run_id=run_id)
+
+    # Tools
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tools", (serialized or {}).get("name") or kwargs.get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished:
+            TOOL_SECONDS.labels(tool=finished[0], status="ok").observe(finished[1])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished:
+            TOOL_SECONDS.labels(tool=finished[0], status="error").observe(finished[1])
+
+    # Chat model calls
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", (metadata or {}).get("langgraph_node", "unknown"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished:
+            node, elapsed = finished
+            LLM_SECONDS.labels(node=node, status="ok").observe(elapsed)
+            input_tokens, output_tokens = _token_usage(response)
+            LLM_TOKENS.labels(node=node, kind="prompt").inc(input_tokens)
+            LLM_TOKENS.labels(node=node, kind="completion").inc(output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished:
+            LLM_SECONDS.labels(node=finished[0], status="error").observe(finished[1])
+
+    def server_timing(self, total_seconds) -> str:
+        """Format this request's timings as a Server-Timing header value (durations in ms)"""
+        with self._lock:
+            entries = [f"total;dur={total_seconds * 1000:.1f}"]
+            entries += [
+                f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]} call(s)"'
+                for name, seconds in self.totals.items()
+            ]
+        return ", ".join(entries)
@@ -0,0 +1,161 @@
+# Bump when the layout below changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 2
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS specializations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS doctors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    specialization_id INTEGER NOT NULL REFERENCES specializations(id)
+);
+
+-- date is ISO 'YYYY-MM-DD' so it sorts chronologically, time_slot is 'HH:MM'
+CREATE TABLE IF NOT EXISTS slots (
+    doctor_id INTEGER NOT NULL REFERENCES doctors(id),
+    date TEXT NOT NULL,
+    time_slot TEXT NOT NULL,
+    is_available INTEGER NOT NULL DEFAULT 1,
+    patient_id INTEGER,
+    PRIMARY KEY (doctor_id, date, time_slot)
+) WITHOUT ROWID;
+
+-- By-doctor lookups are served by the slots primary key
+CREATE INDEX IF NOT EXISTS idx_doctors_specialization ON doctors (specialization_id, id, name);
+CREATE INDEX IF NOT EXISTS idx_slots_date_doctor ON slots (date, doctor_id, is_available, time_slot);
+CREATE INDEX IF NOT EXISTS idx_slots_patient ON slots (patient_id, date, time_slot) WHERE patient_id IS NOT NULL;
+
+-- Read-only view with the original flat layout for existing scripts and notebooks
+CREATE VIEW IF NOT EXISTS doctor_availability AS
+SELECT strftime('%d-%m-%Y', s.date) AS date,
+       s.time_slot,
+       sp.name AS specialization,
+       d.name AS doctor_name,
+       s.is_available,
+       s.patient_id
+FROM slots s
+JOIN doctors d ON d.id = s.doctor_id
+JOIN specializations sp ON sp.id = d.specialization_id;
+"""
+
+# Every availability change is appended to slot_changes by a trigger, in the writer's own
+# transaction, so each worker process can replay the other workers' bookings into its cache
+# and index (toolkit/slot_changes.py). Run statement by statement: the trigger body has semicolons.
+SLOT_CHANGES_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS slot_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doctor_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        time_slot TEXT NOT NULL,
+        is_available INTEGER NOT NULL,
+        changed_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS slots_log_changes AFTER UPDATE OF is_available ON slots
+    WHEN OLD.is_available IS NOT NEW.is_available
+    BEGIN
+        INSERT INTO slot_changes (doctor_id, date, time_slot, is_available)
+        VALUES (NEW.doctor_id, NEW.date, NEW.time_slot, NEW.is_available);
+    END
+    """,
+]
+
+
+def _has_legacy_table(conn):
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'doctor_availability'"
+    ).fetchone()
+    return row is not None and row[0] == 'table'
+
+
+def migrate_legacy_schema(conn):
+    """
+    Convert the flat `doctor_availability` table into the normalized layout in place.
+
+    Dates are rewritten from DD-MM-YYYY to ISO. Duplicate slot rows left behind by
+    re-running the old populate script are collapsed, keeping the booked copy.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("ALTER TABLE doctor_availability RENAME TO doctor_availability_legacy")
+        # executescript() would commit the open transaction, so run statements one by one
+        for statement in SCHEMA_SQL.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        for statement in SLOT_CHANGES_STATEMENTS:
+            conn.execute(statement)
+
+        conn.execute("""
+        INSERT OR IGNORE INTO specializations (name)
+        SELECT DISTINCT specialization FROM doctor_availability_legacy ORDER BY specialization
+        """)
+        conn.execute("""
+        INSERT OR IGNORE INTO doctors (name, specialization_id)
+        SELECT l.doctor_name, sp.id
+        FROM doctor_availability_legacy l
+        JOIN specializations sp ON sp.name = l.specialization
+        GROUP BY l.doctor_name
+        ORDER BY l.doctor_name
+        """)
+        conn.execute("""
+        INSERT OR IGNORE INTO slots (doctor_id, date, time_slot, is_available, patient_id)
+        SELECT d.id,
+               substr(l.date, 7, 4) || '-' || substr(l.date, 4, 2) || '-' || substr(l.date, 1, 2),
+               l.time_slot,
+               CASE WHEN l.is_available THEN 1 ELSE 0 END,
+               l.patient_id
+        FROM doctor_availability_legacy l
+        JOIN doctors d ON d.name = l.doctor_name
+        ORDER BY l.is_available ASC
+        """)
+        conn.execute("DROP TABLE doctor_availability_legacy")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def create_indexes(conn, table=None):
+    """(Re)create the secondary indexes of SCHEMA_SQL, optionally only those on `table`; a no-op for existing ones."""
+    for statement in SCHEMA_SQL.split(";"):
+        if "CREATE INDEX" in statement and (table is None or f" ON {table} " in statement):
+            conn.execute(statement)
+
+
+def ensure_schema(conn):
+    """
+    Create the normalized schema, migrating a legacy flat table if one is found.
+    Indexes are checked on every call, since a bulk load that was interrupted
+    (database/generate_db.py) can leave a current schema without them.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        create_indexes(conn)
+        conn.commit()
+        return
+    if _has_legacy_table(conn):
+        migrate_legacy_schema(conn)
+        return
+    conn.executescript(SCHEMA_SQL)
+    for statement in SLOT_CHANGES_STATEMENTS:
+        conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+def to_iso_date(date_str):
+    """Convert a DD-MM-YYYY date to the ISO YYYY-MM-DD form stored in the database"""
+    day, month, year = date_str.split('-')
+    return f"{year}-{month}-{day}"
+
+
+def from_iso_date(date_str):
+    """Convert an ISO YYYY-MM-DD date back to DD-MM-YYYY"""
+    year, month, day = date_str.split('-')
+    return f"{day}-{month}-{year}"
+
@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SHARED_STATE_DB_PATH = os.getenv(
+    "SHARED_STATE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'shared_state.db'),
+)
+
+SHARED_STATE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS thread_leases (
+    thread_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    thread_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    query TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_stored_at ON idempotency_keys (stored_at);
+"""
+
+
+def worker_count() -> int:
+    """Server worker processes; WEB_CONCURRENCY is also what uvicorn's and gunicorn's CLIs read"""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+
+
+def shared_state_enabled() -> bool:
+    """SHARED_STATE=auto (default) shares turn locks, answers and cache invalidations once there are several workers"""
+    setting = os.getenv("SHARED_STATE", "auto").lower()
+    if setting == "auto":
+        return worker_count() > 1
+    return setting in ("1", "true", "yes")
+
+
+class SharedStateStore:
+    """
+    State the worker processes of one server share through a local SQLite
+    file (WAL): a lease per thread that is running a turn, so turns of one
+    thread never run in two workers at once, and the answers remembered for
+    idempotency keys, so a retry can land on any worker.
+
+    Times are wall-clock seconds, since they are compared across processes.
+    """
+
+    def __init__(self, db_path=SHARED_STATE_DB_PATH, busy_timeout_ms=5000):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=busy_timeout_ms / 1000)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SHARED_STATE_SCHEMA_SQL)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    # Thread leases
+
+    def acquire_lease(self, thread_id, owner, ttl):
+        """Take the thread's lease unless another owner holds an unexpired one; returns whether it was taken"""
+        now = time.time()
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                """INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE thread_leases.expires_at < ?""",
+                (thread_id, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def renew_lease(self, thread_id, owner, ttl):
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE thread_leases SET expires_at = ? WHERE thread_id = ? AND owner = ?",
+                (time.time() + ttl, thread_id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def release_lease(self, thread_id, owner):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?", (thread_id, owner))
+
+    # Idempotent answers
+
+    def load_answer(self, thread_id, key):
+        """(query, answer, stored_at) remembered for the key, or None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT query, answer, stored_at FROM idempotency_keys WHERE thread_id = ? AND key = ?",
+                (thread_id, key),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def store_answer(self, thread_id, key, query, answer):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (thread_id, key, query, answer, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (thread_id, key, query, json.dumps(answer), time.time()),
+            )
+
+    def forget_answer(self, thread_id, key):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM idempotency_keys WHERE thread_id = ? AND key = ?", (thread_id, key))
+
+    def prune_answers(self, ttl, max_keys):
+        """Drop answers older than `ttl` seconds, then the oldest ones beyond `max_keys`"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM idempotency_keys WHERE stored_at < ?", (time.time() - ttl,))
+            self.conn.execute(
+                """DELETE FROM idempotency_keys WHERE stored_at < (
+                    SELECT stored_at FROM idempotency_keys ORDER BY stored_at DESC LIMIT 1 OFFSET ?)""",
+                (max_keys - 1,),
+            )
+
+    def stats(self):
+        with self._lock:
+            leases, answers = self.conn.execute(
+                "SELECT (SELECT count(*) FROM thread_leases WHERE expires_at >= ?), (SELECT count(*) FROM idempotency_keys)",
+                (time.time(),),
+            ).fetchone()
+        return {"leased_threads": leases, "remembered_answers": answers}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shared_state_store():
+    """Return the process-wide store, or None when state is per process (see `shared_state_enabled`)."""
+    global _store
+    if _store is None and shared_state_enabled():
+        with _store_lock:
+            if _store is None:
+                _store = SharedStateStore(db_path=SHARED_STATE_DB_PATH)
+    return _store
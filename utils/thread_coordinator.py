@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from utils.shared_state import get_shared_state_store
+
+
+class ThreadBusyError(RuntimeError):
+    """A turn waited longer than `wait_timeout` seconds for the earlier turns on its thread."""
+
+
+class LeaseLostError(ThreadBusyError):
+    """The thread's lease could not be renewed, so another worker may run the thread; the turn was aborted."""
+
+
+class IdempotencyConflictError(ValueError):
+    """An idempotency key was reused on the same thread for a different query."""
+
+
+class _Flight:
+    """One running turn and the idempotency keys of every request waiting on it"""
+
+    def __init__(self, thread_id, query, turn):
+        self.thread_id = thread_id
+        self.query = query
+        self.turn = turn
+        self.keys = set()
+        self.task = None
+        self.replayed = False
+
+
+class ThreadCoordinator:
+    """
+    Runs at most one turn per thread at a time, so two requests never advance
+    the same checkpoint concurrently, and avoids running a turn twice:
+
+    - identical requests (same thread and query) that arrive while it runs
+      share its execution and answer, whether it runs through `run` or is
+      streamed by its caller (`lead` ... `finish`);
+    - answers of requests sent with an idempotency key are remembered for
+      `idempotency_ttl` seconds, so a retry with the same key gets the answer
+      back, even if the original client disconnected before it was ready.
+
+    Locks and in-flight turns belong to the server's event loop. With a
+    shared `store` (several worker processes), a turn also holds the thread's
+    lease in the store, renewed every `lease_seconds` / 3 while it runs, and
+    answers are remembered in the store, so any worker can serve a retry.
+    Store calls run in worker threads, off the event loop. A turn whose lease
+    is lost is cancelled (LeaseLostError) rather than racing the other worker.
+    Failed turns are never remembered.
+    """
+
+    def __init__(self, wait_timeout=120, idempotency_ttl=600, max_idempotency_keys=10000, store=None, lease_seconds=60):
+        self.wait_timeout = wait_timeout
+        self.idempotency_ttl = idempotency_ttl
+        self.max_idempotency_keys = max_idempotency_keys
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self._locks = {}  # thread_id -> [asyncio.Lock, number of holders and waiters]
+        self._flights = {}  # (thread_id, query) -> _Flight
+        self._pending_keys = {}  # (thread_id, key) -> query of the in-flight turn
+        self._answers = OrderedDict()  # (thread_id, key) -> (query, answer, stored_at), least recently used first
+
+        # Stats
+        self._executions = 0
+        self._waits = 0
+        self._busy = 0
+        self._coalesced = 0
+        self._replays = 0
+        self._lease_waits = 0
+        self._leases_lost = 0
+        self._stored = 0
+
+    @asynccontextmanager
+    async def serialized(self, thread_id):
+        """Hold the thread's turn lock (and lease); raises ThreadBusyError after waiting `wait_timeout` seconds"""
+        deadline = time.monotonic() + self.wait_timeout
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            lock = entry[0]
+            if lock.locked():
+                self._waits += 1
+            try:
+                await asyncio.wait_for(lock.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self._busy += 1
+                raise ThreadBusyError(f"Another request on thread {thread_id} is still running") from None
+            try:
+                if self.store is None:
+                    yield
+                else:
+                    owner = await self._acquire_lease(thread_id, deadline)
+                    lost = asyncio.Event()
+                    keeper = asyncio.create_task(self._keep_lease(thread_id, owner, asyncio.current_task(), lost))
+                    try:
+                        yield
+                    except asyncio.CancelledError:
+                        if not lost.is_set():
+                            raise
+                        asyncio.current_task().uncancel()
+                        raise LeaseLostError(f"Lost the lease on thread {thread_id}; the turn was stopped") from None
+                    finally:
+                        keeper.cancel()
+                        # Runs to completion in its thread even if this task is cancelled again meanwhile
+                        await asyncio.to_thread(self.store.release_lease, thread_id, owner)
+            finally:
+                lock.release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[thread_id]
+
+    async def _acquire_lease(self, thread_id, deadline):
+        """Poll for the thread's lease, which another worker may hold, until `deadline`"""
+        owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        delay = 0.02
+        while not await asyncio.to_thread(self.store.acquire_lease, thread_id, owner, self.lease_seconds):
+            if delay == 0.02:
+                self._lease_waits += 1
+            if time.monotonic() + delay > deadline:
+                self._busy += 1
+                raise ThreadBusyError(f"Another worker is still running a request on thread {thread_id}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        return owner
+
+    async def _keep_lease(self, thread_id, owner, turn_task, lost):
+        """Renew the lease while the turn runs; cancel the turn once it cannot be held any more"""
+        renewed = time.time()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                held = await asyncio.to_thread(self.store.renew_lease, thread_id, owner, self.lease_seconds)
+            except Exception as e:
+                # e.g. the store stayed locked past its busy timeout; the lease may still be ours
+                logging.info(f"Could not renew the lease on thread {thread_id}: {e}")
+                held = time.time() - renewed < self.lease_seconds
+            else:
+                renewed = time.time()
+            if not held:
+                logging.warning(f"Lease on thread {thread_id} was lost before the turn finished; stopping the turn")
+                self._leases_lost += 1
+                lost.set()
+                turn_task.cancel()
+                return
+
+    async def _load(self, thread_id, key):
+        if self.store is not None:
+            return await asyncio.to_thread(self.store.load_answer, thread_id, key)
+        return self._answers.get((thread_id, key))
+
+    async def _forget(self, thread_id, key):
+        if self.store is not None:
+            await asyncio.to_thread(self.store.forget_answer, thread_id, key)
+        else:
+            del self._answers[(thread_id, key)]
+
+    async def remembered(self, thread_id, query, key):
+        """The stored answer for this idempotency key, or None"""
+        if not key:
+            return None
+        pending = self._pending_keys.get((thread_id, key))
+        if pending is not None and pending != query:
+            raise IdempotencyConflictError(f"Idempotency key {key} is already in use for a different query")
+        entry = await self._load(thread_id, key)
+        if entry is None:
+            return None
+        stored_query, answer, stored_at = entry
+        if time.time() - stored_at > self.idempotency_ttl:
+            await self._forget(thread_id, key)
+            return None
+        if stored_query != query:
+            raise IdempotencyConflictError(f"Idempotency key {key} was already used for a different query")
+        if self.store is None:
+            self._answers.move_to_end((thread_id, key))
+        self._replays += 1
+        return answer
+
+    async def remember(self, thread_id, query, key, answer):
+        if not key:
+            return
+        if self.store is not None:
+            await asyncio.to_thread(self.store.store_answer, thread_id, key, query, answer)
+            self._stored += 1
+            if self._stored % 100 == 0:
+                await asyncio.to_thread(self.store.prune_answers, self.idempotency_ttl, self.max_idempotency_keys)
+            return
+        self._answers[(thread_id, key)] = (query, answer, time.time())
+        self._answers.move_to_end((thread_id, key))
+        while len(self._answers) > self.max_idempotency_keys:
+            self._answers.popitem(last=False)
+
+    async def run(self, thread_id, query, turn, idempotency_key=None):
+        """
+        Return (answer, replayed): the remembered answer for `idempotency_key`,
+        the answer of an identical turn already running on this thread, or the
+        result of awaiting `turn()` once the thread's earlier turns are done.
+        """
+        answer = await self.remembered(thread_id, query, idempotency_key)
+        if answer is not None:
+            return answer, True
+
+        flight = self.join(thread_id, query, idempotency_key)
+        if flight is None:
+            flight = _Flight(thread_id, query, turn)
+            flight.task = asyncio.create_task(self._execute(flight))
+            self._register(flight, idempotency_key)
+        return await self.follow(flight), flight.replayed
+
+    def join(self, thread_id, query, idempotency_key=None):
+        """The identical turn already running on this thread, now also answering this request, or None"""
+        flight = self._flights.get((thread_id, query))
+        if flight is not None:
+            self._coalesced += 1
+            self._add_key(flight, idempotency_key)
+        return flight
+
+    def lead(self, thread_id, query, idempotency_key=None):
+        """
+        Register a turn the caller runs itself, e.g. a streamed one, so identical
+        requests can `join` it. The caller runs it under `serialized` and ends it
+        with `finish`, or `abandon` if it fails or is stopped.
+        """
+        flight = _Flight(thread_id, query, None)
+        flight.task = asyncio.get_running_loop().create_future()
+        self._register(flight, idempotency_key)
+        return flight
+
+    async def follow(self, flight):
+        """The answer of a joined or led turn"""
+        # Shielded: a disconnecting client must not cancel the turn for the others
+        return await asyncio.shield(flight.task)
+
+    async def finish(self, flight, answer):
+        """Remember the answer of a led turn for its keys and hand it to the requests that joined it"""
+        self._executions += 1
+        for key in flight.keys:
+            await self.remember(flight.thread_id, flight.query, key, answer)
+        if not flight.task.done():
+            flight.task.set_result(answer)
+
+    def abandon(self, flight, error):
+        """Fail the requests that joined a led turn which did not finish"""
+        if not flight.task.done():
+            flight.task.set_exception(error)
+
+    def _register(self, flight, idempotency_key):
+        flight.task.add_done_callback(lambda task: self._land(flight))
+        self._flights[(flight.thread_id, flight.query)] = flight
+        self._add_key(flight, idempotency_key)
+
+    def _add_key(self, flight, idempotency_key):
+        if idempotency_key:
+            flight.keys.add(idempotency_key)
+            self._pending_keys[(flight.thread_id, idempotency_key)] = flight.query
+
+    async def _execute(self, flight):
+        async with self.serialized(flight.thread_id):
+            answer = await self._answered_elsewhere(flight)
+            if answer is not None:
+                flight.replayed = True
+                return answer
+            answer = await flight.turn()
+        self._executions += 1
+        for key in flight.keys:
+            await self.remember(flight.thread_id, flight.query, key, answer)
+        return answer
+
+    async def _answered_elsewhere(self, flight):
+        """An answer another worker stored for one of the flight's keys while this one waited for the lease"""
+        if self.store is None:
+            return None
+        for key in list(flight.keys):
+            answer = await self.remembered(flight.thread_id, flight.query, key)
+            if answer is not None:
+                return answer
+        return None
+
+    def _land(self, flight):
+        self._flights.pop((flight.thread_id, flight.query), None)
+        for key in flight.keys:
+            self._pending_keys.pop((flight.thread_id, key), None)
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            # Retrieved here so a turn nobody waits for any more does not log "never retrieved"
+            logging.info(f"Turn on thread {flight.thread_id} failed: {flight.task.exception()}")
+
+    def stats(self):
+        return {
+            "shared": self.store is not None,
+            "active_threads": len(self._locks),
+            "in_flight": len(self._flights),
+            "executions": self._executions,
+            "waits": self._waits,
+            "busy_rejections": self._busy,
+            "coalesced": self._coalesced,
+            "idempotent_replays": self._replays,
+            "lease_waits": self._lease_waits,
+            "leases_lost": self._leases_lost,
+            **(self.store.stats() if self.store is not None else {"remembered_answers": len(self._answers)}),
+        }
+
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+def get_thread_coordinator():
+    """Return the process-wide coordinator, configured from the environment."""
+    global _coordinator
+    if _coordinator is None:
+        with _coordinator_lock:
+            if _coordinator is None:
+                _coordinator = ThreadCoordinator(
+                    wait_timeout=float(os.getenv("THREAD_WAIT_TIMEOUT_SECONDS", 120)),
+                    idempotency_ttl=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 600)),
+                    max_idempotency_keys=int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000)),
+                    store=get_shared_state_store(),
+                    lease_seconds=float(os.getenv("THREAD_LEASE_SECONDS", 60)),
+                )
+    return _coordinator